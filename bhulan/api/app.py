@@ -5,17 +5,24 @@ Provides REST API endpoints for webhook ingestion, job status, and health checks
 """
 
 from fastapi import FastAPI, HTTPException, Header, Query, Body, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from typing import Optional, List, Dict, Any, Union
+import logging
 import uuid
+from pymongo.errors import PyMongoError
 from bhulan.config.settings import settings
-from bhulan.models.canonical import NormalizationResult
-from bhulan.ingestion.normalize import normalize_batch, MappingPlan
+from bhulan.core import metrics
+from bhulan.models.canonical import IngestAccepted, NormalizationResult
+from bhulan.api.ingest_queue import IngestQueue, IngestQueueClosedError, IngestQueueFullError, ingest_records
 from bhulan.storage.mongo_repo import MongoTrackPointRepository, MongoJobRegistry
 from bhulan.models.vendor.generic import create_generic_mapping
 from bhulan.models.vendor.geotab import create_geotab_mapping
 from bhulan.models.vendor.samsara import create_samsara_mapping
 
+logger = logging.getLogger(__name__)
+
 
 app = FastAPI(
     title="Bhulan GPS Ingestion API",
@@ -32,7 +39,40 @@ app.add_middleware(
 )
 
 track_repo = MongoTrackPointRepository()
-job_registry = MongoJobRegistry()
+job_registry = MongoJobRegistry(buffered=True)
+ingest_queue = IngestQueue(track_repo, job_registry)
+
+# built once so each plan is compiled once, not per request
+vendor_mappings = {
+    'generic': create_generic_mapping(),
+    'geotab': create_geotab_mapping(),
+    'samsara': create_samsara_mapping(),
+}
+
+
+@app.on_event("startup")
+def warn_legacy_hashes() -> None:
+    """Warn if points of earlier versions still need rekeying, as they are not deduplicated."""
+    try:
+        legacy = track_repo.has_legacy_hashes()
+    except PyMongoError:
+        return
+    if legacy:
+        logger.warning("Track points with hex SHA-256 hashes found; run bhulan-migrate-hashes to rekey them")
+
+
+@app.on_event("shutdown")
+def drain_ingest_queue() -> None:
+    """Ingest the batches still queued, then write the buffered jobs."""
+    ingest_queue.close()
+    job_registry.close()
+
+
+@app.on_event("shutdown")
+def save_dedup_state() -> None:
+    """Save the recently written point hashes, if configured to persist."""
+    if track_repo.dedup_filter is not None:
+        track_repo.dedup_filter.save()
 
 
 def verify_api_key(x_api_key: Optional[str] = Header(None)) -> None:
@@ -49,7 +89,7 @@ async def health_check():
     Returns 200 if service is ready and database is accessible.
     """
     try:
-        track_repo.collection.database.client.server_info()
+        await run_in_threadpool(track_repo.collection.database.client.server_info)
         return {"status": "ready", "database": "connected"}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Database unavailable: {str(e)}")
@@ -71,7 +111,18 @@ async def get_config():
     }
 
 
-@app.post("/ingest/trackpoints", response_model=NormalizationResult)
+@app.post(
+    "/ingest/trackpoints",
+    response_model=NormalizationResult,
+    responses={
+        202: {"model": IngestAccepted, "description": "Batch queued for background ingestion (WEBHOOK_ASYNC)"},
+        429: {
+            "description": "Ingestion queue is full",
+            "headers": {"Retry-After": {"description": "Seconds to wait before retrying", "schema": {"type": "integer"}}}
+        },
+        503: {"description": "Ingestion queue is closed for shutdown"}
+    }
+)
 async def ingest_trackpoints(
     payload: Union[List[Dict[str, Any]], Dict[str, Any]] = Body(...),
     vendor: str = Query("generic", description="Vendor/source identifier"),
@@ -83,6 +134,9 @@ async def ingest_trackpoints(
     Ingest GPS track points via webhook.
     
     Accepts JSON payload with GPS data, normalizes it, and persists to database.
+    With settings.WEBHOOK_ASYNC the batch is queued instead and 202 is
+    returned at once with the ingest_id to poll /jobs with; 429 is returned
+    while the queue is full.
     
     Args:
         payload: JSON object or array of GPS records
@@ -91,7 +145,8 @@ async def ingest_trackpoints(
         x_bhulan_mapping: Optional custom mapping JSON in header
         
     Returns:
-        NormalizationResult with accepted/rejected counts and errors
+        NormalizationResult with accepted/rejected counts and errors, or
+        the queued ingest_id
     """
     if ingest_id is None:
         ingest_id = str(uuid.uuid4())
@@ -101,45 +156,31 @@ async def ingest_trackpoints(
     else:
         records = payload
     
-    job_registry.create_job(
-        ingest_id=ingest_id,
-        source='webhook',
-        params={'vendor': vendor, 'record_count': len(records)}
-    )
+    mapping = vendor_mappings.get(vendor, vendor_mappings['generic'])
+    params = {'vendor': vendor, 'record_count': len(records)}
     
-    try:
-        if vendor == 'geotab':
-            mapping = create_geotab_mapping()
-        elif vendor == 'samsara':
-            mapping = create_samsara_mapping()
-        else:
-            mapping = create_generic_mapping()
-        
-        
-        result, points = normalize_batch(records, mapping, ingest_id)
+    if settings.WEBHOOK_ASYNC:
+        try:
+            ingest_queue.submit(records, mapping, ingest_id, params)
+        except IngestQueueFullError:
+            raise HTTPException(
+                status_code=429,
+                detail="Ingestion queue is full",
+                headers={"Retry-After": str(settings.WEBHOOK_RETRY_AFTER_SECONDS)}
+            )
+        except IngestQueueClosedError:
+            raise HTTPException(status_code=503, detail="Ingestion queue is closed")
         
-        if points:
-            track_repo.upsert_batch(points)
-        
-        job_registry.update_job_status(
-            ingest_id=ingest_id,
-            status='succeeded' if result.rejected == 0 else 'partial',
-            stats={
-                'read': len(records),
-                'accepted': result.accepted,
-                'rejected': result.rejected
-            },
-            error_sample=dict(list(result.errors.items())[:10])
+        return JSONResponse(
+            status_code=202,
+            content=IngestAccepted(ingest_id=ingest_id, record_count=len(records)).model_dump()
         )
-        
-        return result
-        
-    except Exception as e:
-        job_registry.update_job_status(
-            ingest_id=ingest_id,
-            status='failed',
-            error_sample={0: str(e)}
+    
+    try:
+        return await run_in_threadpool(
+            ingest_records, records, mapping, ingest_id, params, track_repo, job_registry
         )
+    except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
 
 
@@ -154,12 +195,15 @@ async def get_job_status(ingest_id: str):
     Returns:
         Job information including status, stats, and errors
     """
-    job = job_registry.get_job(ingest_id)
+    job = await run_in_threadpool(job_registry.get_job, ingest_id)
     
     if job is None:
-        raise HTTPException(status_code=404, detail=f"Job {ingest_id} not found")
+        params = ingest_queue.get_pending(ingest_id)
+        if params is None:
+            raise HTTPException(status_code=404, detail=f"Job {ingest_id} not found")
+        return {"ingest_id": ingest_id, "source": "webhook", "status": "queued", "params": params}
     
-    point_count = track_repo.count_by_ingest_id(ingest_id)
+    point_count = await run_in_threadpool(track_repo.count_by_ingest_id, ingest_id)
     job['point_count_in_db'] = point_count
     
     return job
@@ -168,17 +212,14 @@ async def get_job_status(ingest_id: str):
 @app.get("/metrics")
 async def get_metrics():
     """
-    Get Prometheus-compatible metrics.
+    Get Prometheus metrics.
     
-    Returns basic metrics about ingestion operations.
+    Returns ingestion metrics of this process in the Prometheus text format.
     """
-    if not settings.ENABLE_PROMETHEUS:
+    if not metrics.enabled():
         raise HTTPException(status_code=404, detail="Metrics not enabled")
     
-    return {
-        "message": "Prometheus metrics endpoint",
-        "note": "Full metrics implementation pending"
-    }
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
 
 if __name__ == "__main__":
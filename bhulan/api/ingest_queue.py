@@ -0,0 +1,208 @@
+"""
+Background ingestion of webhook batches.
+
+Normalizing a batch and writing it to MongoDB block, so they run on
+worker threads instead of the event loop. Batches wait in a bounded
+queue; when it is full new batches are refused rather than held, so a
+burst of requests cannot grow memory or latency without bound.
+"""
+
+import logging
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from bhulan.config.settings import settings
+from bhulan.ingestion.normalize import MappingPlan, normalize_batch
+from bhulan.models.canonical import NormalizationResult
+from bhulan.storage.base import JobRegistry
+from bhulan.storage.mongo_repo import MongoTrackPointRepository
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFullError(Exception):
+    """Raised when a batch is submitted to a full queue."""
+    pass
+
+
+class IngestQueueClosedError(Exception):
+    """Raised when a batch is submitted to a queue that was closed."""
+    pass
+
+
+def ingest_records(
+    records: List[Dict[str, Any]],
+    mapping: MappingPlan,
+    ingest_id: str,
+    params: Dict[str, Any],
+    repo: MongoTrackPointRepository,
+    job_registry: JobRegistry
+) -> NormalizationResult:
+    """
+    Normalize and write one webhook batch as an ingestion job.
+    
+    Args:
+        records: Raw records
+        mapping: Mapping plan
+        ingest_id: Ingestion job ID
+        params: Job parameters
+        repo: Track point repository
+        job_registry: Job registry
+        
+    Returns:
+        NormalizationResult with accepted/rejected counts and errors
+        
+    Raises:
+        Exception: Any error normalizing or writing, after the job is
+            marked failed
+    """
+    job_registry.create_job(ingest_id=ingest_id, source='webhook', params=params)
+    
+    try:
+        result, points = normalize_batch(records, mapping, ingest_id)
+        
+        if points:
+            repo.upsert_batch(points)
+        
+        job_registry.update_job_status(
+            ingest_id=ingest_id,
+            status='succeeded' if result.rejected == 0 else 'partial',
+            stats={
+                'read': len(records),
+                'accepted': result.accepted,
+                'rejected': result.rejected
+            },
+            error_sample=dict(list(result.errors.items())[:10])
+        )
+        
+        return result
+    
+    except Exception as e:
+        job_registry.update_job_status(
+            ingest_id=ingest_id,
+            status='failed',
+            error_sample={0: str(e)}
+        )
+        raise
+
+
+class IngestQueue:
+    """
+    Bounded queue of webhook batches drained by worker threads.
+    
+    Workers are started with the first batch. Until a worker has created
+    its job, a batch can be looked up with get_pending.
+    """
+    
+    def __init__(
+        self,
+        repo: MongoTrackPointRepository,
+        job_registry: JobRegistry,
+        maxsize: Optional[int] = None,
+        workers: Optional[int] = None
+    ):
+        """
+        Initialize ingestion queue.
+        
+        Args:
+            repo: Track point repository
+            job_registry: Job registry
+            maxsize: Batches allowed to wait (defaults to settings.WEBHOOK_QUEUE_SIZE)
+            workers: Worker threads (defaults to settings.WEBHOOK_WORKERS)
+        """
+        self.repo = repo
+        self.job_registry = job_registry
+        self.workers = max(1, workers or settings.WEBHOOK_WORKERS)
+        self.batches: queue.Queue = queue.Queue(maxsize or settings.WEBHOOK_QUEUE_SIZE)
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.threads: List[threading.Thread] = []
+        self.lock = threading.Lock()
+        self.closed = False
+    
+    def __len__(self) -> int:
+        return self.batches.qsize()
+    
+    def submit(
+        self,
+        records: List[Dict[str, Any]],
+        mapping: MappingPlan,
+        ingest_id: str,
+        params: Dict[str, Any]
+    ) -> None:
+        """
+        Queue a batch for ingestion without waiting.
+        
+        Args:
+            records: Raw records
+            mapping: Mapping plan
+            ingest_id: Ingestion job ID
+            params: Job parameters
+            
+        Raises:
+            IngestQueueFullError: If maxsize batches are already waiting
+            IngestQueueClosedError: If the queue was closed
+        """
+        with self.lock:
+            if self.closed:
+                raise IngestQueueClosedError("Ingestion queue is closed")
+            if not self.threads:
+                self._start()
+            
+            # registered first, as a worker may finish the batch before put returns
+            self.pending[ingest_id] = params
+            try:
+                self.batches.put_nowait((records, mapping, ingest_id, params))
+            except queue.Full:
+                del self.pending[ingest_id]
+                raise IngestQueueFullError(f"{self.batches.maxsize} batches already queued")
+    
+    def get_pending(self, ingest_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the parameters of a batch that is queued but not yet ingested.
+        
+        Args:
+            ingest_id: Ingestion job ID
+            
+        Returns:
+            Job parameters or None if the batch is not queued
+        """
+        return self.pending.get(ingest_id)
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Refuse new batches and wait for the queued ones to be ingested.
+        
+        Args:
+            timeout: Seconds to wait for each worker
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        
+        for _ in self.threads:
+            self.batches.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+    
+    def _start(self) -> None:
+        """Start the worker threads."""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"ingest-queue-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+    
+    def _work(self) -> None:
+        """Ingest queued batches until a None sentinel is taken."""
+        while True:
+            batch: Optional[Tuple] = self.batches.get()
+            if batch is None:
+                return
+            
+            records, mapping, ingest_id, params = batch
+            try:
+                ingest_records(records, mapping, ingest_id, params, self.repo, self.job_registry)
+            except Exception:
+                logger.exception(f"Queued ingestion {ingest_id} failed", extra={'ingest_id': ingest_id})
+            finally:
+                self.pending.pop(ingest_id, None)
@@ -0,0 +1,50 @@
+"""
+Rekey track points stored by earlier versions.
+
+Points written before the switch to 16-byte BLAKE2b keys carry a hex
+SHA-256 _hash that new writes of the same point do not match, so they
+are not deduplicated until rekeyed. Run once after upgrading:
+    
+    bhulan-migrate-hashes [--batch-size N]
+
+It can run while points are being ingested and can be run again.
+"""
+
+import argparse
+import logging
+from typing import List, Optional
+from bhulan.config.settings import settings
+from bhulan.storage.mongo_repo import MongoTrackPointRepository
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Rekey the points of the configured database.
+    
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
+        
+    Returns:
+        Exit status
+    """
+    parser = argparse.ArgumentParser(description="Rekey track points stored with hex SHA-256 hashes.")
+    parser.add_argument('--mongo-uri', default=settings.MONGO_URI, help="MongoDB connection URI")
+    parser.add_argument('--db', default=settings.MONGO_DB_NAME, help="Database name")
+    parser.add_argument('--batch-size', type=int, default=None, help="Points rekeyed per bulk write")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    repo = MongoTrackPointRepository(mongo_uri=args.mongo_uri, db_name=args.db, dedup=False)
+    try:
+        counts = repo.migrate_hashes(batch_size=args.batch_size)
+    finally:
+        repo.close()
+    
+    logger.info("Rekeyed %d points and removed %d old duplicates", counts['rekeyed'], counts['removed'])
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
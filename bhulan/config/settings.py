@@ -17,6 +17,24 @@ class Settings(BaseSettings):
     MAX_BATCH_SIZE: int = 1000
     MAX_INFLIGHT_JOBS: int = 10
     
+    NORMALIZE_FAST_PATH: bool = True
+    INGEST_COLUMNAR: bool = True
+    
+    INGEST_NORMALIZE_WORKERS: Optional[int] = None
+    INGEST_WRITE_WORKERS: int = 2
+    INGEST_MAX_PENDING_CHUNKS: int = 4
+    
+    MONGO_BULK_CHUNK_SIZE: int = 1000
+    MONGO_INSERT_ONLY: bool = False
+    
+    DEDUP_ENABLED: bool = True
+    DEDUP_CAPACITY: int = 500000
+    DEDUP_WINDOW_SECONDS: float = 3600
+    DEDUP_STATE_PATH: Optional[str] = None
+    
+    JOB_FLUSH_SECONDS: float = 1.0
+    JOB_CACHE_SIZE: int = 1000
+    
     INGEST_S3_BUCKET: Optional[str] = None
     AWS_ACCESS_KEY_ID: Optional[str] = None
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
@@ -26,18 +44,37 @@ class Settings(BaseSettings):
     KAFKA_BROKERS: str = "localhost:9092"
     KAFKA_TOPIC: str = "gps.raw"
     KAFKA_GROUP_ID: str = "bhulan-ingest"
+    KAFKA_MAX_POLL_RECORDS: int = 500
+    KAFKA_POLL_TIMEOUT_MS: int = 100
+    KAFKA_LINGER_MS: int = 200
+    KAFKA_WORKERS: int = 4
+    KAFKA_MAX_PENDING_BATCHES: int = 2
+    KAFKA_RETRY_BACKOFF_MS: int = 1000
     
     ENABLE_MQTT: bool = False
     MQTT_BROKER: str = "localhost"
     MQTT_PORT: int = 1883
     MQTT_TOPIC: str = "devices/+/gps"
+    MQTT_KEEPALIVE: int = 60
+    MQTT_WORKERS: int = 2
+    MQTT_QUEUE_SIZE: int = 10000
+    MQTT_FLUSH_MS: int = 1000
+    MQTT_OVERFLOW_POLICY: str = "block"
+    MQTT_WRITE_RETRIES: int = 3
+    MQTT_RETRY_BACKOFF_MS: int = 500
     
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8080
     API_KEY: Optional[str] = None
     ALLOWED_ORIGINS: str = "*"
     
+    WEBHOOK_ASYNC: bool = False
+    WEBHOOK_QUEUE_SIZE: int = 100
+    WEBHOOK_WORKERS: int = 4
+    WEBHOOK_RETRY_AFTER_SECONDS: int = 1
+    
     ENABLE_PROMETHEUS: bool = True
+    METRICS_PORT: Optional[int] = None
     LOG_LEVEL: str = "INFO"
     
     class Config:
@@ -0,0 +1,427 @@
+"""
+Prometheus metrics for bhulan.
+
+Counters, gauges and histograms rendered in the Prometheus text format,
+without a client library. Metrics are kept per process: the API serves
+its own at /metrics, and stream consumers can serve theirs with
+start_http_server. Worker processes send what they observed to the
+process serving metrics with Registry.drain and Registry.merge.
+
+When settings.ENABLE_PROMETHEUS is false, labels() returns a shared
+no-op, so instrumented code pays one attribute check per call.
+"""
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from bhulan.config.settings import settings
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds, from a millisecond to ten seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize registry.
+
+        Args:
+            enabled: Record observations; when false, metrics ignore them
+        """
+        self.enabled = enabled
+        self.metrics: List['Metric'] = []
+        self.lock = threading.Lock()
+
+    def register(self, metric: 'Metric') -> None:
+        """
+        Add a metric.
+
+        Args:
+            metric: Metric to render with the others
+
+        Raises:
+            ValueError: If a metric with the same name is registered
+        """
+        with self.lock:
+            if any(m.name == metric.name for m in self.metrics):
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self.metrics.append(metric)
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text format.
+
+        Returns:
+            Exposition text, ending with a newline
+        """
+        with self.lock:
+            metrics = list(self.metrics)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def drain(self) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        """
+        Take the counter and histogram values observed so far.
+
+        The values are cleared, so draining again returns only what was
+        observed since. Call when no observations are in flight, e.g.
+        between the tasks of a worker process.
+
+        Returns:
+            Picklable values by metric name, for merge in another process
+        """
+        with self.lock:
+            metrics = list(self.metrics)
+
+        drained = {}
+        for metric in metrics:
+            values = metric.drain()
+            if values:
+                drained[metric.name] = values
+        return drained
+
+    def merge(self, drained: Dict[str, Dict[Tuple[str, ...], Any]]) -> None:
+        """
+        Add values drained from another process's registry.
+
+        Args:
+            drained: Values from drain; metrics not registered here are ignored
+        """
+        with self.lock:
+            metrics = {metric.name: metric for metric in self.metrics}
+
+        for name, values in drained.items():
+            metric = metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+
+REGISTRY = Registry(enabled=settings.ENABLE_PROMETHEUS)
+
+
+def enabled() -> bool:
+    """Whether the default registry records observations."""
+    return REGISTRY.enabled
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value, e.g. 3, 0.25 or +Inf."""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format label pairs, escaping values as the text format requires."""
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class _NoopValue:
+    """Stands in for every labelled value while metrics are disabled."""
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def time(self) -> '_NoopValue':
+        return self
+
+    def __enter__(self) -> '_NoopValue':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NOOP = _NoopValue()
+
+
+class _Value:
+    """Value of a counter or gauge for one set of labels."""
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def state(self) -> float:
+        return self.value
+
+    def merge(self, state: float) -> None:
+        self.inc(state)
+
+
+class _Timer:
+    """Context manager observing the seconds spent inside it."""
+
+    def __init__(self, value: '_HistogramValue'):
+        self.value = value
+
+    def __enter__(self) -> '_Timer':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.value.observe(time.perf_counter() - self.started)
+
+
+class _HistogramValue:
+    """Bucket counts, sum and count of a histogram for one set of labels."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def state(self) -> Tuple[List[int], float]:
+        with self.lock:
+            return list(self.counts), self.sum
+
+    def merge(self, state: Tuple[List[int], float]) -> None:
+        counts, total = state
+        with self.lock:
+            for i, count in enumerate(counts):
+                self.counts[i] += count
+            self.sum += total
+
+
+class Metric:
+    """Metric with one value per combination of label values."""
+
+    kind = 'untyped'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[Registry] = None
+    ):
+        """
+        Initialize and register metric.
+
+        Args:
+            name: Metric name, e.g. bhulan_points_written_total
+            documentation: Help text
+            labelnames: Names of the labels values are kept per
+            registry: Registry to render with (defaults to REGISTRY)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.values: Dict[Tuple[str, ...], object] = {}
+        self.lock = threading.Lock()
+        self.registry.register(self)
+
+    def labels(self, *values):
+        """
+        Get the value for a combination of label values.
+
+        Args:
+            *values: One value per label name, in order
+
+        Returns:
+            Value to update, or a no-op while the registry is disabled
+        """
+        if not self.registry.enabled:
+            return _NOOP
+
+        key = tuple(str(v) for v in values)
+        value = self.values.get(key)
+        if value is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self.lock:
+                value = self.values.setdefault(key, self._new_value())
+        return value
+
+    def _new_value(self):
+        return _Value()
+
+    def drain(self) -> Dict[Tuple[str, ...], Any]:
+        """Take and clear the state of every value, by label values."""
+        with self.lock:
+            values, self.values = self.values, {}
+        return {key: value.state() for key, value in values.items()}
+
+    def merge(self, values: Dict[Tuple[str, ...], Any]) -> None:
+        """Add drained states to the values with the same label values."""
+        if not self.registry.enabled:
+            return
+        for key, state in values.items():
+            self.labels(*key).merge(state)
+
+    def _items(self):
+        with self.lock:
+            return sorted(self.values.items())
+
+    def samples(self) -> List[str]:
+        """Render one sample line per combination of label values."""
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value.value)}"
+            for key, value in self._items()
+        ]
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1) -> None:
+        """Increase the value of an unlabelled counter."""
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """Value that goes up and down."""
+
+    kind = 'gauge'
+
+    def set(self, value: float) -> None:
+        """Set the value of an unlabelled gauge."""
+        self.labels().set(value)
+
+    def drain(self) -> Dict[Tuple[str, ...], Any]:
+        """Gauges describe the process they are set in, so none are drained."""
+        return {}
+
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        registry: Optional[Registry] = None
+    ):
+        """
+        Initialize and register histogram.
+
+        Args:
+            name: Metric name, e.g. bhulan_write_seconds
+            documentation: Help text
+            labelnames: Names of the labels values are kept per
+            buckets: Upper bounds of the buckets, ascending; +Inf is added
+            registry: Registry to render with (defaults to REGISTRY)
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float) -> None:
+        """Observe a value of an unlabelled histogram."""
+        self.labels().observe(value)
+
+    def time(self):
+        """Time a block of an unlabelled histogram."""
+        return self.labels().time()
+
+    def _new_value(self):
+        return _HistogramValue(self.buckets)
+
+    def samples(self) -> List[str]:
+        """Render cumulative buckets, sum and count per combination of label values."""
+        lines = []
+        for key, value in self._items():
+            with value.lock:
+                counts, total = list(value.counts), value.sum
+
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ('le',), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the default registry on any path."""
+
+    def do_GET(self):
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """
+    Serve the default registry over HTTP from a daemon thread.
+
+    For processes without the API, e.g. the Kafka and MQTT consumers.
+
+    Args:
+        port: Port to listen on
+        host: Address to bind
+
+    Returns:
+        The running server
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,393 @@
+"""
+Ingestion of directories and globs of files.
+
+Fans the files out across worker processes, with one job per file under
+a parent job, and skips files that were already ingested so re-running a
+backfill only reads what changed.
+"""
+
+import glob
+import hashlib
+import logging
+import os
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.util import Finalize
+from typing import Any, Dict, List, Optional
+from bhulan.config.settings import settings
+from bhulan.core import metrics
+from bhulan.ingestion.files import FileIngestionError, detect_file_type, ingest_file
+from bhulan.ingestion.normalize import MappingPlan
+from bhulan.ingestion.pipeline import IngestPipeline, worker_context
+from bhulan.models.canonical import DirectoryIngestionResult
+from bhulan.storage.base import JobRegistry
+from bhulan.storage.mongo_repo import MongoJobRegistry, MongoTrackPointRepository
+
+logger = logging.getLogger(__name__)
+
+
+# Jobs in these states read the whole file, so it need not be read again
+COMPLETED_STATUSES = ['succeeded', 'partial']
+
+# Repository and job registry of a directory worker process, created once
+# by _init_worker and shared by the files the worker ingests
+_worker_resources: Dict[str, Any] = {}
+
+
+def list_source_files(source: str, recursive: bool = False) -> List[str]:
+    """
+    List the files to ingest from a directory or glob pattern.
+    
+    Editor backups and Excel lock files (names with '~' or '$') and files
+    of unsupported types are left out.
+    
+    Args:
+        source: Directory or glob pattern
+        recursive: Include subdirectories of a directory; patterns may
+            use '**' either way
+            
+    Returns:
+        Sorted absolute paths
+    """
+    if os.path.isdir(source):
+        pattern = os.path.join(source, '**', '*') if recursive else os.path.join(source, '*')
+    else:
+        pattern = source
+    
+    paths = []
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        name = os.path.basename(path)
+        if not os.path.isfile(path) or '~' in name or '$' in name:
+            continue
+        try:
+            detect_file_type(path)
+        except FileIngestionError:
+            continue
+        paths.append(os.path.abspath(path))
+    
+    return paths
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    Hash the contents of a file.
+    
+    Args:
+        file_path: Path to file
+        block_size: Bytes read at a time
+        
+    Returns:
+        SHA256 hex digest of the contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_ingested_job(
+    job_registry: JobRegistry,
+    file_path: str,
+    size: int,
+    mtime: float,
+    sha256: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Find a completed job that already ingested a file.
+    
+    Without a content hash only a job for the same path, size and mtime
+    matches, so unchanged files are found without reading them. With one,
+    any job for the same contents matches, e.g. a copied or touched file.
+    
+    Args:
+        job_registry: Job registry
+        file_path: Absolute path to file
+        size: File size in bytes
+        mtime: File modification time
+        sha256: Content hash from file_sha256
+        
+    Returns:
+        Job document or None if the file was not ingested
+    """
+    if sha256 is None:
+        query = {'params.file_path': file_path, 'params.size': size, 'params.mtime': mtime}
+    else:
+        query = {'params.sha256': sha256}
+    query['status'] = {'$in': COMPLETED_STATUSES}
+    
+    return job_registry.find_job(query)
+
+
+def ingest_source_file(
+    file_path: str,
+    parent_id: str,
+    mapping: Optional[MappingPlan] = None,
+    vendor: str = 'generic',
+    force: bool = False,
+    repo: Optional[MongoTrackPointRepository] = None,
+    job_registry: Optional[JobRegistry] = None
+) -> Dict[str, Any]:
+    """
+    Ingest one file of a directory unless it was already ingested.
+    
+    Chunks are normalized on the calling worker rather than in a pool of
+    their own. A repo or job_registry not provided is created for this
+    file and closed once it is ingested.
+    
+    Args:
+        file_path: Absolute path to file
+        parent_id: Job ID of the directory ingestion
+        mapping: Mapping plan (inferred per file if not provided)
+        vendor: Vendor identifier
+        force: Ingest the file even if it was already ingested
+        repo: Track point repository
+        job_registry: Job registry
+        
+    Returns:
+        Outcome with path, status (ingested, skipped or failed) and
+        ingest_id, plus accepted and rejected counts or the error
+    """
+    created = []
+    if job_registry is None:
+        job_registry = MongoJobRegistry()
+        created.append(job_registry)
+    if repo is None:
+        repo = MongoTrackPointRepository()
+        created.append(repo)
+    
+    try:
+        return _ingest_source_file(file_path, parent_id, mapping, vendor, force, repo, job_registry)
+    finally:
+        for resource in created:
+            resource.close()
+
+
+def _ingest_source_file(
+    file_path: str,
+    parent_id: str,
+    mapping: Optional[MappingPlan],
+    vendor: str,
+    force: bool,
+    repo: MongoTrackPointRepository,
+    job_registry: JobRegistry
+) -> Dict[str, Any]:
+    """Ingest one file with the given repository and job registry."""
+    stat = os.stat(file_path)
+    params = {'parent_id': parent_id, 'size': stat.st_size, 'mtime': stat.st_mtime}
+    
+    job = None
+    if not force:
+        job = find_ingested_job(job_registry, file_path, stat.st_size, stat.st_mtime)
+    if job is None:
+        params['sha256'] = file_sha256(file_path)
+        if not force:
+            job = find_ingested_job(job_registry, file_path, stat.st_size, stat.st_mtime, params['sha256'])
+    if job is not None:
+        return {'path': file_path, 'status': 'skipped', 'ingest_id': job['ingest_id']}
+    
+    ingest_id = str(uuid.uuid4())
+    try:
+        result = ingest_file(
+            file_path,
+            mapping=mapping,
+            ingest_id=ingest_id,
+            vendor=vendor,
+            job_registry=job_registry,
+            pipeline=IngestPipeline(repo, normalize_workers=0),
+            job_params=params
+        )
+    except Exception as e:
+        if not isinstance(e, FileIngestionError):
+            # e.g. the registry failed to record the outcome, leaving the job running
+            try:
+                job_registry.update_job_status(ingest_id=ingest_id, status='failed', error_sample={0: str(e)})
+            except Exception as update_error:
+                logger.error(f"Failed to mark job {ingest_id} failed: {str(update_error)}")
+        return {'path': file_path, 'status': 'failed', 'ingest_id': ingest_id, 'error': str(e)}
+    
+    return {
+        'path': file_path,
+        'status': 'ingested',
+        'ingest_id': ingest_id,
+        'accepted': result.accepted,
+        'rejected': result.rejected
+    }
+
+
+def _init_worker() -> None:
+    """Create the repository and job registry of a directory worker process."""
+    _worker_resources['repo'] = MongoTrackPointRepository()
+    _worker_resources['job_registry'] = MongoJobRegistry()
+    # atexit handlers do not run in pool workers, finalizers do
+    Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker() -> None:
+    """Close the repository and job registry of a directory worker process."""
+    for resource in _worker_resources.values():
+        resource.close()
+    _worker_resources.clear()
+
+
+def _ingest_in_worker(
+    file_path: str,
+    parent_id: str,
+    mapping: Optional[MappingPlan],
+    vendor: str,
+    force: bool
+) -> Dict[str, Any]:
+    """
+    Ingest one file with the resources of this worker process.
+    
+    The normalize and write metrics observed for the file are returned
+    under 'metrics', as only the parent process serves them.
+    """
+    outcome = ingest_source_file(file_path, parent_id, mapping, vendor, force, **_worker_resources)
+    outcome['metrics'] = metrics.REGISTRY.drain()
+    return outcome
+
+
+def ingest_directory(
+    source: str,
+    mapping: Optional[MappingPlan] = None,
+    ingest_id: Optional[str] = None,
+    vendor: str = 'generic',
+    recursive: bool = False,
+    force: bool = False,
+    max_inflight: Optional[int] = None,
+    repo: Optional[MongoTrackPointRepository] = None,
+    job_registry: Optional[JobRegistry] = None
+) -> DirectoryIngestionResult:
+    """
+    Ingest every file of a directory or glob pattern.
+    
+    Files are ingested by worker processes, at most max_inflight at a
+    time, each with its own job whose params carry parent_id and the
+    file's size, mtime and sha256. The parent job collects the totals.
+    Each worker process connects to MongoDB once for all its files.
+    
+    When repo or job_registry is provided, it is shared by all files, so
+    files are ingested in threads of this process instead.
+    
+    Args:
+        source: Directory or glob pattern
+        mapping: Mapping plan (inferred per file if not provided)
+        ingest_id: Parent job ID (generated if not provided)
+        vendor: Vendor identifier
+        recursive: Include subdirectories of a directory
+        force: Ingest files even if they were already ingested
+        max_inflight: Files ingested at a time (defaults to settings.MAX_INFLIGHT_JOBS)
+        repo: Track point repository (created for the threads if only
+            job_registry is provided, and closed once done)
+        job_registry: Job registry (created if not provided, and closed
+            once done)
+        
+    Returns:
+        DirectoryIngestionResult with the files ingested, skipped and failed
+    """
+    if ingest_id is None:
+        ingest_id = str(uuid.uuid4())
+    
+    shared = repo is not None or job_registry is not None
+    created = []
+    if job_registry is None:
+        job_registry = MongoJobRegistry()
+        created.append(job_registry)
+    if shared and repo is None:
+        repo = MongoTrackPointRepository()
+        created.append(repo)
+    
+    try:
+        return _ingest_directory(
+            source, mapping, ingest_id, vendor, recursive, force, max_inflight, repo, job_registry, shared
+        )
+    finally:
+        for resource in created:
+            resource.close()
+
+
+def _ingest_directory(
+    source: str,
+    mapping: Optional[MappingPlan],
+    ingest_id: str,
+    vendor: str,
+    recursive: bool,
+    force: bool,
+    max_inflight: Optional[int],
+    repo: Optional[MongoTrackPointRepository],
+    job_registry: JobRegistry,
+    shared: bool
+) -> DirectoryIngestionResult:
+    """Ingest a directory, in threads sharing repo and job_registry if shared, else in worker processes."""
+    paths = list_source_files(source, recursive)
+    job_registry.create_job(
+        ingest_id=ingest_id,
+        source='directory',
+        params={'source': source, 'vendor': vendor, 'files': len(paths)}
+    )
+    
+    result = DirectoryIngestionResult(ingest_id=ingest_id, files=len(paths))
+    workers = max(1, min(max_inflight or settings.MAX_INFLIGHT_JOBS, len(paths)))
+    
+    executor: Executor
+    if shared:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        ingest, resources = ingest_source_file, {'repo': repo, 'job_registry': job_registry}
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=worker_context(), initializer=_init_worker)
+        ingest, resources = _ingest_in_worker, {}
+    
+    with executor:
+        futures = [
+            executor.submit(ingest, path, ingest_id, mapping, vendor, force, **resources)
+            for path in paths
+        ]
+        
+        for path, future in zip(paths, futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = {'path': path, 'status': 'failed', 'error': str(e)}
+            metrics.REGISTRY.merge(outcome.pop('metrics', {}))
+            
+            if outcome['status'] == 'ingested':
+                result.ingested[path] = outcome['ingest_id']
+                result.accepted += outcome['accepted']
+                result.rejected += outcome['rejected']
+            elif outcome['status'] == 'skipped':
+                result.skipped[path] = outcome['ingest_id']
+            else:
+                result.failed[path] = outcome['error']
+    
+    if result.failed and not (result.ingested or result.skipped):
+        status = 'failed'
+    elif result.failed or result.rejected:
+        status = 'partial'
+    else:
+        status = 'succeeded'
+    
+    # keyed by the file's position
+    failed = [(i, path) for i, path in enumerate(paths) if path in result.failed]
+    job_registry.update_job_status(
+        ingest_id=ingest_id,
+        status=status,
+        stats={
+            'files': result.files,
+            'ingested': len(result.ingested),
+            'skipped': len(result.skipped),
+            'failed': len(result.failed),
+            'read': result.accepted + result.rejected,
+            'accepted': result.accepted,
+            'rejected': result.rejected
+        },
+        error_sample={i: f"{path}: {result.failed[path]}" for i, path in failed[:10]}
+    )
+    
+    logger.info(
+        f"Ingested {len(result.ingested)} of {result.files} files from {source} "
+        f"({len(result.skipped)} skipped, {len(result.failed)} failed)",
+        extra={'ingest_id': ingest_id, 'accepted': result.accepted, 'rejected': result.rejected}
+    )
+    
+    return result
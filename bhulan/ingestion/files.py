@@ -6,10 +6,12 @@ Supports CSV, JSON, Excel (XLSX), and Parquet files from local filesystem or S3.
 
 import csv
 import json
-from typing import List, Dict, Any, Optional, Iterator
+from typing import List, Dict, Any, Optional, Iterator, Iterable, TextIO, Tuple
 from pathlib import Path
 import pandas as pd
-from bhulan.ingestion.normalize import MappingPlan, normalize_batch
+from openpyxl import load_workbook
+from bhulan.ingestion.normalize import MappingPlan
+from bhulan.ingestion.pipeline import IngestPipeline
 from bhulan.models.canonical import NormalizationResult, TrackPoint
 from bhulan.models.vendor.generic import infer_field_mapping, create_generic_mapping
 from bhulan.storage.mongo_repo import MongoTrackPointRepository, MongoJobRegistry
@@ -54,6 +56,20 @@ def detect_file_type(file_path: str) -> str:
     return type_map[ext]
 
 
+def read_csv_frames(file_path: str, chunk_size: int = 1000) -> Iterator[pd.DataFrame]:
+    """
+    Read CSV file as DataFrame chunks.
+    
+    Args:
+        file_path: Path to CSV file
+        chunk_size: Number of rows per chunk
+        
+    Yields:
+        Chunks of rows as DataFrames
+    """
+    yield from pd.read_csv(file_path, chunksize=chunk_size)
+
+
 def read_csv_file(file_path: str, chunk_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
     """
     Read CSV file in chunks.
@@ -65,39 +81,222 @@ def read_csv_file(file_path: str, chunk_size: int = 1000) -> Iterator[List[Dict[
     Yields:
         Chunks of records as list of dictionaries
     """
-    for chunk_df in pd.read_csv(file_path, chunksize=chunk_size):
+    for chunk_df in read_csv_frames(file_path, chunk_size):
         records = chunk_df.to_dict('records')
         yield records
 
 
-def read_json_file(file_path: str) -> List[Dict[str, Any]]:
+def _chunked(records: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
     """
-    Read JSON file (array or NDJSON).
+    Group records into chunks.
     
     Args:
-        file_path: Path to JSON file
+        records: Records to group
+        chunk_size: Number of records per chunk
+        
+    Yields:
+        Chunks of records as list of dictionaries
+    """
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _first_char(f: TextIO) -> str:
+    """
+    Read the first non-whitespace character of a file and rewind it.
+    
+    Args:
+        f: Open text file
+        
+    Returns:
+        First non-whitespace character, or '' for a blank file
+    """
+    char = f.read(1)
+    while char and char.isspace():
+        char = f.read(1)
+    f.seek(0)
+    return char
+
+
+def iter_ndjson(f: TextIO) -> Iterator[Dict[str, Any]]:
+    """
+    Parse newline-delimited JSON one line at a time.
+    
+    Args:
+        f: Open text file
+        
+    Yields:
+        One record per non-blank line
+    """
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_array(f: TextIO, buffer_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Parse the elements of a top-level JSON array incrementally.
+    
+    Only the current element and one read buffer are held in memory.
+    
+    Args:
+        f: Open text file holding a JSON array
+        buffer_size: Characters to read at a time
+        
+    Yields:
+        Array elements in order
+        
+    Raises:
+        json.JSONDecodeError: If the file is not a well-formed JSON array
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+    # whether the next token must be a value (after '[' or ','), and
+    # whether that value may be left out (only right after '[')
+    expect_value = True
+    allow_close = True
+    
+    while True:
+        # skip whitespace, refilling the buffer as it runs out
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = f.read(buffer_size), 0
+            eof = not buffer
+        
+        if pos >= len(buffer):
+            raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+        
+        char = buffer[pos]
+        if not started:
+            if char != '[':
+                raise json.JSONDecodeError("Expecting '['", buffer, pos)
+            started = True
+            pos += 1
+            continue
+        
+        if char == ']' and allow_close:
+            # as with json.loads, only whitespace may follow the array
+            pos += 1
+            while True:
+                rest = buffer[pos:].lstrip()
+                if rest:
+                    raise json.JSONDecodeError("Extra data", buffer, len(buffer) - len(rest))
+                buffer, pos = f.read(buffer_size), 0
+                if not buffer:
+                    return
+        
+        if not expect_value:
+            if char != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            expect_value = True
+            allow_close = False
+            pos += 1
+            continue
+        
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+            # a number cut off at '.', 'e' or a sign decodes as its prefix
+            complete = eof or (end < len(buffer) and buffer[end] not in '.eE+-')
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        
+        if not complete:
+            # the element may continue past the buffer, e.g. a cut-off
+            # object or number
+            more = f.read(max(buffer_size, len(buffer) - pos))
+            eof = not more
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        
+        yield value
+        pos = end
+        expect_value = False
+        allow_close = True
+        
+        if pos > buffer_size:
+            buffer, pos = buffer[pos:], 0
+
+
+def _iter_json_records(f: TextIO) -> Iterator[Dict[str, Any]]:
+    """
+    Parse records from a JSON array or NDJSON file.
+    
+    Args:
+        f: Open text file
         
     Returns:
-        List of records
+        Iterator over records in file order
+    """
+    if _first_char(f) == '[':
+        return iter_json_array(f)
+    return iter_ndjson(f)
+
+
+def read_json_file(file_path: str, chunk_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Read JSON file (array or NDJSON) in chunks.
+    
+    Arrays are parsed incrementally and NDJSON line by line, so memory use
+    does not grow with the file size.
+    
+    Args:
+        file_path: Path to JSON file
+        chunk_size: Number of records per chunk
+        
+    Yields:
+        Chunks of records as list of dictionaries
     """
     with open(file_path, 'r') as f:
-        first_char = f.read(1)
-        f.seek(0)
+        yield from _chunked(_iter_json_records(f), chunk_size)
+
+
+def _excel_headers(row: Tuple[Any, ...]) -> List[str]:
+    """
+    Build column names from an Excel header row.
+    
+    Args:
+        row: Header row values
         
-        if first_char == '[':
-            return json.load(f)
-        else:
-            records = []
-            for line in f:
-                if line.strip():
-                    records.append(json.loads(line))
-            return records
+    Returns:
+        Column names, with blank headers named as pandas does
+    """
+    return [str(value) if value is not None else f"Unnamed: {i}" for i, value in enumerate(row)]
+
+
+def _is_xls(file_path: str) -> bool:
+    """Whether a file is a legacy .xls workbook, which openpyxl cannot open."""
+    return Path(file_path).suffix.lower() == '.xls'
+
+
+def _read_xls_file(file_path: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Read a legacy .xls workbook with pandas (needs xlrd), all at once."""
+    df = pd.read_excel(file_path).dropna(how='all')
+    df = df.astype(object).where(df.notna(), None)
+    yield from _chunked(df.to_dict('records'), chunk_size)
 
 
 def read_excel_file(file_path: str, chunk_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
     """
     Read Excel file in chunks.
     
+    The first sheet is streamed with openpyxl in read-only mode, so rows
+    are never all loaded at once. Empty cells are read as None. Legacy
+    .xls workbooks are read whole with pandas, which needs xlrd.
+    
     Args:
         file_path: Path to Excel file
         chunk_size: Number of rows per chunk
@@ -105,18 +304,31 @@ def read_excel_file(file_path: str, chunk_size: int = 1000) -> Iterator[List[Dic
     Yields:
         Chunks of records as list of dictionaries
     """
-    df = pd.read_excel(file_path)
+    if _is_xls(file_path):
+        yield from _read_xls_file(file_path, chunk_size)
+        return
     
-    for i in range(0, len(df), chunk_size):
-        chunk = df.iloc[i:i+chunk_size]
-        records = chunk.to_dict('records')
-        yield records
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = _excel_headers(next(rows, ()))
+        
+        records = (
+            dict(zip(headers, row))
+            for row in rows
+            if any(value is not None for value in row)
+        )
+        yield from _chunked(records, chunk_size)
+    finally:
+        workbook.close()
 
 
 def read_parquet_file(file_path: str, chunk_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
     """
     Read Parquet file in chunks.
     
+    Record batches are read one at a time with pyarrow.
+    
     Args:
         file_path: Path to Parquet file
         chunk_size: Number of rows per chunk
@@ -124,12 +336,79 @@ def read_parquet_file(file_path: str, chunk_size: int = 1000) -> Iterator[List[D
     Yields:
         Chunks of records as list of dictionaries
     """
-    df = pd.read_parquet(file_path)
+    import pyarrow.parquet as pq
     
-    for i in range(0, len(df), chunk_size):
-        chunk = df.iloc[i:i+chunk_size]
-        records = chunk.to_dict('records')
-        yield records
+    parquet_file = pq.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        if batch.num_rows:
+            yield batch.to_pylist()
+
+
+def read_parquet_frames(file_path: str, chunk_size: int = 1000) -> Iterator[pd.DataFrame]:
+    """
+    Read Parquet file as DataFrame chunks.
+    
+    Arrow record batches are read one at a time and converted to pandas
+    column by column.
+    
+    Args:
+        file_path: Path to Parquet file
+        chunk_size: Number of rows per chunk
+        
+    Yields:
+        Chunks of rows as DataFrames
+    """
+    import pyarrow.parquet as pq
+    
+    parquet_file = pq.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def read_file_headers(file_path: str, file_type: str) -> List[str]:
+    """
+    Read the column names of a file without reading its rows.
+    
+    CSV and Excel files are read up to their header row, Parquet files
+    from their schema and JSON files up to their first record.
+    
+    Args:
+        file_path: Path to file
+        file_type: File type (csv, json, jsonl, xlsx, parquet)
+        
+    Returns:
+        Column names
+        
+    Raises:
+        FileIngestionError: If the file type has no headers
+    """
+    if file_type == 'csv':
+        with open(file_path, 'r') as f:
+            reader = csv.DictReader(f)
+            return list(reader.fieldnames or [])
+    
+    if file_type == 'xlsx' and _is_xls(file_path):
+        return _excel_headers(tuple(pd.read_excel(file_path, nrows=0).columns))
+    
+    if file_type == 'xlsx':
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(max_row=1, values_only=True)
+            return _excel_headers(next(rows, ()))
+        finally:
+            workbook.close()
+    
+    if file_type == 'parquet':
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(file_path).names)
+    
+    if file_type in ['json', 'jsonl']:
+        with open(file_path, 'r') as f:
+            first = next(_iter_json_records(f), None)
+        return list(first.keys()) if first else []
+    
+    raise FileIngestionError(f"Cannot infer mapping for file type: {file_type}")
 
 
 def infer_mapping_from_file(file_path: str, file_type: str) -> MappingPlan:
@@ -143,24 +422,7 @@ def infer_mapping_from_file(file_path: str, file_type: str) -> MappingPlan:
     Returns:
         Inferred MappingPlan
     """
-    if file_type == 'csv':
-        with open(file_path, 'r') as f:
-            reader = csv.DictReader(f)
-            headers = reader.fieldnames
-    elif file_type == 'xlsx':
-        df = pd.read_excel(file_path, nrows=0)
-        headers = df.columns.tolist()
-    elif file_type == 'parquet':
-        df = pd.read_parquet(file_path)
-        headers = df.columns.tolist()
-    elif file_type in ['json', 'jsonl']:
-        records = read_json_file(file_path)
-        if records:
-            headers = list(records[0].keys())
-        else:
-            headers = []
-    else:
-        raise FileIngestionError(f"Cannot infer mapping for file type: {file_type}")
+    headers = read_file_headers(file_path, file_type)
     
     field_map = infer_field_mapping(headers)
     
@@ -178,7 +440,10 @@ def ingest_file(
     ingest_id: Optional[str] = None,
     vendor: str = 'generic',
     repo: Optional[MongoTrackPointRepository] = None,
-    job_registry: Optional[MongoJobRegistry] = None
+    job_registry: Optional[MongoJobRegistry] = None,
+    columnar: Optional[bool] = None,
+    pipeline: Optional[IngestPipeline] = None,
+    job_params: Optional[Dict[str, Any]] = None
 ) -> NormalizationResult:
     """
     Ingest GPS data from file.
@@ -188,8 +453,14 @@ def ingest_file(
         mapping: Mapping plan (inferred if not provided)
         ingest_id: Ingestion job ID (generated if not provided)
         vendor: Vendor identifier
-        repo: Track point repository (created if not provided)
+        repo: Track point repository, used when pipeline is not provided
+            (created if not provided)
         job_registry: Job registry (created if not provided)
+        columnar: Normalize CSV and Parquet chunks column-wise with
+            normalize_frame (defaults to settings.INGEST_COLUMNAR)
+        pipeline: Pipeline that normalizes and writes the chunks
+            (created with default settings if not provided)
+        job_params: Extra parameters recorded on the job
         
     Returns:
         NormalizationResult with statistics
@@ -197,15 +468,15 @@ def ingest_file(
     if ingest_id is None:
         ingest_id = str(uuid.uuid4())
     
-    if repo is None:
-        repo = MongoTrackPointRepository()
+    if pipeline is None:
+        pipeline = IngestPipeline(repo or MongoTrackPointRepository())
     if job_registry is None:
         job_registry = MongoJobRegistry()
     
     job_registry.create_job(
         ingest_id=ingest_id,
         source='file',
-        params={'file_path': file_path, 'vendor': vendor}
+        params={'file_path': file_path, 'vendor': vendor, **(job_params or {})}
     )
     
     try:
@@ -214,54 +485,38 @@ def ingest_file(
         if mapping is None:
             mapping = infer_mapping_from_file(file_path, file_type)
         
-        total_read = 0
-        total_accepted = 0
-        total_rejected = 0
-        all_errors = {}
+        if columnar is None:
+            columnar = settings.INGEST_COLUMNAR
+        columnar = columnar and file_type in ['csv', 'parquet']
         
-        if file_type == 'csv':
+        if columnar and file_type == 'csv':
+            reader = read_csv_frames(file_path, chunk_size=settings.MAX_BATCH_SIZE)
+        elif columnar:
+            reader = read_parquet_frames(file_path, chunk_size=settings.MAX_BATCH_SIZE)
+        elif file_type == 'csv':
             reader = read_csv_file(file_path, chunk_size=settings.MAX_BATCH_SIZE)
         elif file_type == 'xlsx':
             reader = read_excel_file(file_path, chunk_size=settings.MAX_BATCH_SIZE)
         elif file_type == 'parquet':
             reader = read_parquet_file(file_path, chunk_size=settings.MAX_BATCH_SIZE)
         elif file_type in ['json', 'jsonl']:
-            records = read_json_file(file_path)
-            reader = [records[i:i+settings.MAX_BATCH_SIZE] 
-                     for i in range(0, len(records), settings.MAX_BATCH_SIZE)]
-        
-        for chunk in reader:
-            total_read += len(chunk)
-            
-            result, points = normalize_batch(chunk, mapping, ingest_id)
-            
-            total_accepted += result.accepted
-            total_rejected += result.rejected
-            
-            for idx, error in result.errors.items():
-                global_idx = total_read - len(chunk) + idx
-                all_errors[global_idx] = error
-            
-            if points:
-                repo.upsert_batch(points)
+            reader = read_json_file(file_path, chunk_size=settings.MAX_BATCH_SIZE)
+        
+        result, stats = pipeline.run(reader, mapping, ingest_id)
         
         job_registry.update_job_status(
             ingest_id=ingest_id,
-            status='succeeded' if total_rejected == 0 else 'partial',
+            status='succeeded' if result.rejected == 0 else 'partial',
             stats={
-                'read': total_read,
-                'accepted': total_accepted,
-                'rejected': total_rejected
+                'read': stats.rows,
+                'accepted': result.accepted,
+                'rejected': result.rejected,
+                'stage_seconds': stats.model_dump(exclude={'chunks', 'rows'})
             },
-            error_sample=dict(list(all_errors.items())[:10])  # First 10 errors
+            error_sample=dict(list(result.errors.items())[:10])  # First 10 errors
         )
         
-        return NormalizationResult(
-            accepted=total_accepted,
-            rejected=total_rejected,
-            errors=all_errors,
-            ingest_id=ingest_id
-        )
+        return result
         
     except Exception as e:
         job_registry.update_job_status(
@@ -5,12 +5,17 @@ Consumes GPS data from Kafka topics and ingests into the system.
 """
 
 import json
+import time
 import uuid
-from typing import Optional, Dict, Any
-from kafka import KafkaConsumer
-from kafka.errors import KafkaError
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from kafka import ConsumerRebalanceListener, KafkaConsumer, TopicPartition
+from kafka.structs import OffsetAndMetadata
 from bhulan.config.settings import settings
+from bhulan.core import metrics
+from bhulan.core.metrics import Gauge
 from bhulan.ingestion.normalize import normalize_batch, MappingPlan
+from bhulan.storage.base import JobRegistry
 from bhulan.storage.mongo_repo import MongoTrackPointRepository, MongoJobRegistry
 from bhulan.models.vendor.generic import create_generic_mapping
 import logging
@@ -18,15 +23,82 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+KAFKA_LAG = Gauge(
+    'bhulan_kafka_lag_messages',
+    'Messages in the partition after the last one polled',
+    ['topic', 'partition']
+)
+KAFKA_BUFFERED = Gauge(
+    'bhulan_kafka_buffered_messages',
+    'Messages polled and waiting for a worker',
+    ['topic', 'partition']
+)
+KAFKA_PAUSED = Gauge(
+    'bhulan_kafka_paused_partitions',
+    'Partitions paused for back-pressure or retry'
+)
+
+
+def commit_offset(offset: int) -> OffsetAndMetadata:
+    """
+    Build the value committed for a partition.
+    
+    Args:
+        offset: Offset of the next message to consume
+        
+    Returns:
+        OffsetAndMetadata for any kafka-python 2.x
+    """
+    # kafka-python 2.1 added leader_epoch
+    if len(OffsetAndMetadata._fields) == 3:
+        return OffsetAndMetadata(offset, '', -1)
+    return OffsetAndMetadata(offset, '')
+
+
+class _RebalanceListener(ConsumerRebalanceListener):
+    """Passes partition revocations to the consumer that subscribed."""
+    
+    def __init__(self, gps_consumer: 'KafkaGPSConsumer'):
+        self.gps_consumer = gps_consumer
+    
+    def on_partitions_revoked(self, revoked):
+        self.gps_consumer.on_partitions_revoked(revoked)
+    
+    def on_partitions_assigned(self, assigned):
+        logger.info(f"Assigned Kafka partitions: {sorted(tp.partition for tp in assigned)}")
+
+
 class KafkaGPSConsumer:
-    """Kafka consumer for GPS data ingestion."""
+    """
+    Kafka consumer for GPS data ingestion.
+    
+    Messages are buffered per partition and handed to worker threads as a
+    batch once batch_size have arrived or the oldest has waited linger_ms.
+    Each partition has at most one batch in flight, so its offsets are
+    committed in order, asynchronously and only after the batch is
+    written. A partition holding max_pending batches is paused until its
+    worker catches up.
+    
+    Delivery is at least once: a failed batch is retried after
+    retry_backoff_ms by seeking back to it, and repeated points are
+    dropped by their hash. When a rebalance revokes a partition, its
+    batch in flight is finished and committed and its buffer dropped.
+    """
     
     def __init__(
         self,
         topic: str = None,
         group_id: str = None,
         mapping: Optional[MappingPlan] = None,
-        vendor: str = 'generic'
+        vendor: str = 'generic',
+        batch_size: int = None,
+        linger_ms: int = None,
+        workers: int = None,
+        max_pending: int = None,
+        consumer: Optional[Any] = None,
+        track_repo: Optional[MongoTrackPointRepository] = None,
+        job_registry: Optional[JobRegistry] = None,
+        clock: Callable[[], float] = time.monotonic
     ):
         """
         Initialize Kafka consumer.
@@ -36,55 +108,229 @@ class KafkaGPSConsumer:
             group_id: Consumer group ID
             mapping: Mapping plan for data normalization
             vendor: Vendor identifier
+            batch_size: Messages per batch (defaults to settings.MAX_BATCH_SIZE)
+            linger_ms: Longest a message waits for its batch to fill (defaults to settings)
+            workers: Worker threads writing batches (defaults to settings)
+            max_pending: Batches buffered per partition before it is paused (defaults to settings)
+            consumer: KafkaConsumer or a stand-in with the same poll, assignment,
+                seek, pause, resume, highwater, commit_async, commit and close
+                methods (created and subscribed to topic if not provided; a
+                stand-in's owner calls on_partitions_revoked)
+            track_repo: Track point repository (created if not provided)
+            job_registry: Job registry (buffered one created if not provided)
+            clock: Time source, in seconds
         """
         self.topic = topic or settings.KAFKA_TOPIC
         self.group_id = group_id or settings.KAFKA_GROUP_ID
         self.mapping = mapping or create_generic_mapping()
         self.vendor = vendor
+        self.batch_size = batch_size or settings.MAX_BATCH_SIZE
+        self.linger = (linger_ms if linger_ms is not None else settings.KAFKA_LINGER_MS) / 1000
+        self.max_buffered = self.batch_size * (max_pending or settings.KAFKA_MAX_PENDING_BATCHES)
+        self.retry_backoff = settings.KAFKA_RETRY_BACKOFF_MS / 1000
+        self.clock = clock
         
-        self.track_repo = MongoTrackPointRepository()
-        self.job_registry = MongoJobRegistry()
+        self.track_repo = track_repo or MongoTrackPointRepository()
+        self.job_registry = job_registry or MongoJobRegistry(buffered=True)
         
-        self.consumer = KafkaConsumer(
-            self.topic,
-            bootstrap_servers=settings.KAFKA_BROKERS.split(','),
-            group_id=self.group_id,
-            value_deserializer=lambda m: json.loads(m.decode('utf-8')),
-            auto_offset_commit=False,  # Manual commit after successful processing
-            enable_auto_commit=False
+        if consumer is None:
+            consumer = KafkaConsumer(
+                bootstrap_servers=settings.KAFKA_BROKERS.split(','),
+                group_id=self.group_id,
+                value_deserializer=lambda m: json.loads(m.decode('utf-8')),
+                enable_auto_commit=False,  # committed per partition after writing
+                max_poll_records=settings.KAFKA_MAX_POLL_RECORDS
+            )
+            consumer.subscribe([self.topic], listener=_RebalanceListener(self))
+        self.consumer = consumer
+        
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or settings.KAFKA_WORKERS,
+            thread_name_prefix='kafka-worker'
         )
+        self.buffers: Dict[TopicPartition, List[Any]] = {}
+        self.buffered_since: Dict[TopicPartition, float] = {}
+        self.in_flight: Dict[TopicPartition, Tuple[int, Future]] = {}
+        self.retry_at: Dict[TopicPartition, float] = {}
+        self.written: Dict[TopicPartition, int] = {}
+        self.paused: Set[TopicPartition] = set()
         
         logger.info(f"Kafka consumer initialized for topic: {self.topic}")
     
-    def consume_batch(self, batch_size: int = None) -> None:
+    def consume_batch(self) -> int:
+        """
+        Poll once, start the batches that are ready and commit finished ones.
+        
+        Returns at the latest after settings.KAFKA_POLL_TIMEOUT_MS, so a
+        partial batch is started once it lingered, even on a quiet topic.
+        
+        Returns:
+            Number of messages polled
+        """
+        polled = self.consumer.poll(
+            timeout_ms=settings.KAFKA_POLL_TIMEOUT_MS,
+            max_records=settings.KAFKA_MAX_POLL_RECORDS
+        )
+        
+        now = self.clock()
+        count = 0
+        for tp, messages in polled.items():
+            if not self.buffers.get(tp):
+                self.buffered_since[tp] = now
+            self.buffers.setdefault(tp, []).extend(messages)
+            count += len(messages)
+        
+        self._collect()
+        self._dispatch()
+        self._apply_back_pressure()
+        
+        if metrics.enabled():
+            self._observe(polled)
+        
+        return count
+    
+    def drain(self) -> None:
+        """Write every buffered batch, without retrying failed ones, and commit synchronously."""
+        self._dispatch(force=True)
+        while self.in_flight:
+            for _, future in list(self.in_flight.values()):
+                try:
+                    future.result()
+                except Exception:
+                    pass
+            self._collect()
+            self._dispatch(force=True)
+        
+        if self.written:
+            self.consumer.commit(offsets={tp: commit_offset(offset) for tp, offset in self.written.items()})
+    
+    def on_partitions_revoked(self, revoked: Iterable[TopicPartition]) -> None:
         """
-        Consume and process a batch of messages.
+        Finish and forget partitions a rebalance takes away.
+        
+        Called from poll before the partitions are reassigned. Their
+        batches in flight are waited for and committed if written, so the
+        new owner starts after them; buffered messages are dropped and
+        fetched again by the new owner.
         
         Args:
-            batch_size: Number of messages to consume in batch
+            revoked: Partitions no longer assigned to this consumer
         """
-        batch_size = batch_size or settings.MAX_BATCH_SIZE
+        revoked = set(revoked)
+        offsets = {}
+        for tp in revoked & set(self.in_flight):
+            _, future = self.in_flight.pop(tp)
+            try:
+                offsets[tp] = commit_offset(future.result())
+            except Exception as e:
+                logger.warning(f"Kafka batch from revoked {tp.topic}[{tp.partition}] failed: {str(e)}")
+        
+        if offsets:
+            try:
+                self.consumer.commit(offsets=offsets)
+            except Exception as e:
+                logger.warning(f"Failed to commit revoked Kafka partitions: {str(e)}")
         
-        messages = []
-        records = []
+        for tp in revoked:
+            self.buffers.pop(tp, None)
+            self.buffered_since.pop(tp, None)
+            self.retry_at.pop(tp, None)
+            self.written.pop(tp, None)
+            KAFKA_BUFFERED.labels(tp.topic, tp.partition).set(0)
+        self.paused -= revoked
         
-        for message in self.consumer:
-            messages.append(message)
-            records.append(message.value)
+        logger.info(f"Revoked Kafka partitions: {sorted(tp.partition for tp in revoked)}")
+    
+    def _dispatch(self, force: bool = False) -> None:
+        """Hand full or lingering partition buffers to the workers."""
+        now = self.clock()
+        for tp, messages in self.buffers.items():
+            if not messages or tp in self.in_flight or self.retry_at.get(tp, 0) > now:
+                continue
+            if not force and len(messages) < self.batch_size and now - self.buffered_since[tp] < self.linger:
+                continue
+            
+            batch, self.buffers[tp] = messages[:self.batch_size], messages[self.batch_size:]
+            self.buffered_since[tp] = now
+            self.in_flight[tp] = (batch[0].offset, self.executor.submit(self._process, tp, batch))
+    
+    def _collect(self) -> None:
+        """Commit the partitions whose batch was written and rewind the failed ones."""
+        assigned = self.consumer.assignment()
+        offsets = {}
+        for tp, (first_offset, future) in list(self.in_flight.items()):
+            if not future.done():
+                continue
+            del self.in_flight[tp]
+            if tp not in assigned:
+                continue
             
-            if len(messages) >= batch_size:
-                break
+            try:
+                self.written[tp] = future.result()
+                offsets[tp] = commit_offset(self.written[tp])
+            except Exception as e:
+                logger.error(f"Kafka batch from {tp.topic}[{tp.partition}] failed, retrying from offset {first_offset}: {str(e)}")
+                # messages after the batch are fetched again from here
+                self.consumer.seek(tp, first_offset)
+                self.buffers[tp] = []
+                self.retry_at[tp] = self.clock() + self.retry_backoff
         
-        if not records:
-            return
+        if offsets:
+            self.consumer.commit_async(offsets=offsets, callback=self._on_commit)
+    
+    def _apply_back_pressure(self) -> None:
+        """Pause partitions with full buffers or waiting to retry, and resume the rest."""
+        now = self.clock()
+        assigned = self.consumer.assignment()
+        paused = {
+            tp for tp, messages in self.buffers.items()
+            if tp in assigned and (len(messages) >= self.max_buffered or self.retry_at.get(tp, 0) > now)
+        }
         
+        # partitions revoked without on_partitions_revoked cannot be resumed
+        self.paused &= assigned
+        if paused - self.paused:
+            self.consumer.pause(*(paused - self.paused))
+        if self.paused - paused:
+            self.consumer.resume(*(self.paused - paused))
+        self.paused = paused
+    
+    def _observe(self, polled: Dict[TopicPartition, List[Any]]) -> None:
+        """Update the lag and buffer gauges."""
+        for tp, messages in polled.items():
+            highwater = self.consumer.highwater(tp)
+            if highwater is not None:
+                KAFKA_LAG.labels(tp.topic, tp.partition).set(highwater - messages[-1].offset - 1)
+        for tp, messages in self.buffers.items():
+            KAFKA_BUFFERED.labels(tp.topic, tp.partition).set(len(messages))
+        KAFKA_PAUSED.set(len(self.paused))
+    
+    def _on_commit(self, offsets: Dict[TopicPartition, OffsetAndMetadata], response: Any) -> None:
+        """Log failed commits; the next commit of the partition supersedes them."""
+        if isinstance(response, Exception):
+            logger.warning(f"Failed to commit Kafka offsets: {str(response)}")
+    
+    def _process(self, tp: TopicPartition, messages: List[Any]) -> int:
+        """
+        Normalize and write one batch of a partition.
+        
+        Args:
+            tp: Partition the messages came from
+            messages: Consecutive messages of the partition
+            
+        Returns:
+            Offset to commit, after the last message
+        """
+        records = [message.value for message in messages]
         ingest_id = str(uuid.uuid4())
         
         self.job_registry.create_job(
             ingest_id=ingest_id,
             source='kafka',
             params={
-                'topic': self.topic,
+                'topic': tp.topic,
+                'partition': tp.partition,
+                'offsets': [messages[0].offset, messages[-1].offset],
                 'vendor': self.vendor,
                 'batch_size': len(records)
             }
@@ -107,19 +353,17 @@ class KafkaGPSConsumer:
                 error_sample=dict(list(result.errors.items())[:10])
             )
             
-            self.consumer.commit()
-            
             logger.info(f"Processed Kafka batch: {result.accepted} accepted, {result.rejected} rejected")
-            
+        
         except Exception as e:
-            logger.error(f"Error processing Kafka batch: {str(e)}")
-            
             self.job_registry.update_job_status(
                 ingest_id=ingest_id,
                 status='failed',
                 error_sample={0: str(e)}
             )
-            
+            raise
+        
+        return messages[-1].offset + 1
     
     def run(self):
         """Run consumer loop continuously."""
@@ -130,11 +374,15 @@ class KafkaGPSConsumer:
                 self.consume_batch()
         except KeyboardInterrupt:
             logger.info("Kafka consumer stopped by user")
+            self.drain()
         except Exception as e:
             logger.error(f"Kafka consumer error: {str(e)}")
             raise
         finally:
+            self.executor.shutdown(wait=True)
             self.consumer.close()
+            self.track_repo.close()
+            self.job_registry.close()
             logger.info("Kafka consumer closed")
 
 
@@ -155,6 +403,9 @@ def start_kafka_consumer(
         logger.warning("Kafka ingestion is disabled in settings")
         return
     
+    if settings.METRICS_PORT and metrics.enabled():
+        metrics.start_http_server(settings.METRICS_PORT)
+    
     consumer = KafkaGPSConsumer(
         topic=topic,
         mapping=mapping,
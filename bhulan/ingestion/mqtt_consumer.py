@@ -5,12 +5,17 @@ Subscribes to MQTT topics and ingests GPS data into the system.
 """
 
 import json
+import queue
+import threading
+import time
 import uuid
-from typing import Optional, Dict, Any, List
-from collections import deque
+from typing import Optional, Dict, Any, List, Tuple
 import paho.mqtt.client as mqtt
 from bhulan.config.settings import settings
+from bhulan.core import metrics
+from bhulan.core.metrics import Counter, Gauge
 from bhulan.ingestion.normalize import normalize_batch, MappingPlan
+from bhulan.storage.base import JobRegistry
 from bhulan.storage.mongo_repo import MongoTrackPointRepository, MongoJobRegistry
 from bhulan.models.vendor.generic import create_generic_mapping
 import logging
@@ -18,15 +23,56 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+MQTT_MESSAGES = Counter(
+    'bhulan_mqtt_messages_total',
+    'MQTT messages received, dropped or malformed, and points accepted, rejected or failed',
+    ['outcome']
+)
+MQTT_QUEUED = Gauge(
+    'bhulan_mqtt_queued_messages',
+    'MQTT messages waiting for a worker'
+)
+MQTT_LAG = Gauge(
+    'bhulan_mqtt_lag_seconds',
+    'Time the oldest message of the last batch waited in the queue'
+)
+
+# What the network thread does with a message when the queue is full
+OVERFLOW_POLICIES = ['block', 'drop_oldest', 'drop_newest']
+
+# Shortest wait of an idle worker for a message, so flush_ms=0 does not spin
+MIN_IDLE_WAIT_SECONDS = 0.1
+
+
 class MQTTGPSConsumer:
-    """MQTT consumer for GPS data ingestion."""
+    """
+    MQTT consumer for GPS data ingestion.
+    
+    The network callback only queues payloads. Worker threads take them
+    off the queue in batches of batch_size, or fewer once the oldest has
+    waited flush_ms, and retry failed writes with backoff.
+    
+    When the queue is full, overflow_policy decides:
+    - block: wait for room, at most half the keepalive so the broker does
+      not drop the connection, then drop the message
+    - drop_oldest: drop the oldest queued message to make room
+    - drop_newest: drop the new message
+    
+    Dropped messages are counted in get_stats.
+    """
     
     def __init__(
         self,
         topic: str = None,
         mapping: Optional[MappingPlan] = None,
         vendor: str = 'generic',
-        batch_size: int = None
+        batch_size: int = None,
+        flush_ms: int = None,
+        workers: int = None,
+        queue_size: int = None,
+        overflow_policy: str = None,
+        track_repo: Optional[MongoTrackPointRepository] = None,
+        job_registry: Optional[JobRegistry] = None
     ):
         """
         Initialize MQTT consumer.
@@ -36,18 +82,42 @@ class MQTTGPSConsumer:
             mapping: Mapping plan for data normalization
             vendor: Vendor identifier
             batch_size: Number of messages to batch before processing
+            flush_ms: Longest a message waits for its batch to fill (defaults to settings)
+            workers: Worker threads writing batches (defaults to settings)
+            queue_size: Messages queued for the workers (defaults to settings)
+            overflow_policy: One of OVERFLOW_POLICIES (defaults to settings)
+            track_repo: Track point repository (created if not provided)
+            job_registry: Job registry (buffered one created if not provided)
+            
+        Raises:
+            ValueError: If overflow_policy is unknown
         """
         self.topic = topic or settings.MQTT_TOPIC
         self.mapping = mapping or create_generic_mapping()
         self.vendor = vendor
         self.batch_size = batch_size or settings.MAX_BATCH_SIZE
+        self.flush_seconds = (flush_ms if flush_ms is not None else settings.MQTT_FLUSH_MS) / 1000
+        self.num_workers = workers or settings.MQTT_WORKERS
+        self.overflow_policy = overflow_policy or settings.MQTT_OVERFLOW_POLICY
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {self.overflow_policy}")
         
-        self.track_repo = MongoTrackPointRepository()
-        self.job_registry = MongoJobRegistry()
+        self.track_repo = track_repo or MongoTrackPointRepository()
+        self.job_registry = job_registry or MongoJobRegistry(buffered=True)
         
-        self.message_buffer: deque = deque(maxlen=self.batch_size * 2)
-        
-        self.dedup_buffer: deque = deque(maxlen=1000)
+        self.messages: queue.Queue = queue.Queue(queue_size or settings.MQTT_QUEUE_SIZE)
+        self.workers: List[threading.Thread] = []
+        self.stopping = threading.Event()
+        self.stats_lock = threading.Lock()
+        self.stats: Dict[str, Any] = {
+            'received': 0,
+            'dropped': 0,
+            'malformed': 0,
+            'accepted': 0,
+            'rejected': 0,
+            'failed': 0,
+            'lag_seconds': 0.0
+        }
         
         self.client = mqtt.Client()
         self.client.on_connect = self._on_connect
@@ -70,34 +140,131 @@ class MQTTGPSConsumer:
             logger.warning(f"Unexpected MQTT disconnect, return code: {rc}")
     
     def _on_message(self, client, userdata, msg):
-        """Callback when message received."""
-        try:
-            payload = json.loads(msg.payload.decode('utf-8'))
-            
-            msg_hash = hash(json.dumps(payload, sort_keys=True))
-            if msg_hash in self.dedup_buffer:
-                logger.debug(f"Duplicate message detected, skipping")
+        """Callback when message received; queues the payload for the workers."""
+        self._count('received')
+        item = (time.monotonic(), msg.payload)
+        
+        if self.overflow_policy == 'drop_newest':
+            try:
+                self.messages.put_nowait(item)
+            except queue.Full:
+                self._count('dropped')
+        
+        elif self.overflow_policy == 'drop_oldest':
+            while True:
+                try:
+                    self.messages.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        self.messages.get_nowait()
+                        self._count('dropped')
+                    except queue.Empty:
+                        pass
+        
+        else:
+            try:
+                self.messages.put(item, timeout=settings.MQTT_KEEPALIVE / 2)
+            except queue.Full:
+                self._count('dropped')
+                logger.warning("MQTT queue full, dropped message")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get message counters.
+        
+        Returns:
+            Counts of messages received, dropped and malformed, of points
+            accepted and rejected, and of messages in failed batches, plus
+            queued (messages waiting now) and lag_seconds (how long the
+            oldest message of the last batch waited)
+        """
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['queued'] = self.messages.qsize()
+        return stats
+    
+    def _count(self, name: str, n: int = 1) -> None:
+        """Add to a counter."""
+        with self.stats_lock:
+            self.stats[name] += n
+        MQTT_MESSAGES.labels(name).inc(n)
+    
+    def start(self):
+        """Start the worker threads."""
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._work, name=f"mqtt-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+    
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop receiving and wait for the workers to write the queued messages.
+        
+        Args:
+            timeout: Seconds to wait for each worker
+        """
+        self.client.disconnect()
+        self.stopping.set()
+        for worker in self.workers:
+            worker.join(timeout)
+    
+    def _work(self):
+        """Write batches until stopped and the queue is empty."""
+        while True:
+            batch = self._next_batch()
+            if batch is None:
                 return
-            
-            self.dedup_buffer.append(msg_hash)
-            
-            self.message_buffer.append(payload)
-            
-            if len(self.message_buffer) >= self.batch_size:
-                self._process_batch()
-                
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse MQTT message: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error processing MQTT message: {str(e)}")
+            if batch:
+                self._process_batch(batch)
     
-    def _process_batch(self):
-        """Process accumulated messages as a batch."""
-        if not self.message_buffer:
-            return
+    def _next_batch(self) -> Optional[List[Tuple[float, bytes]]]:
+        """
+        Take the next batch off the queue.
+        
+        Returns:
+            Queued (time, payload) items, empty if none arrived within
+            flush_ms (at least MIN_IDLE_WAIT_SECONDS), or None once
+            stopped with nothing queued
+        """
+        try:
+            first = self.messages.get(timeout=max(self.flush_seconds, MIN_IDLE_WAIT_SECONDS))
+        except queue.Empty:
+            return None if self.stopping.is_set() else []
         
-        records = list(self.message_buffer)
-        self.message_buffer.clear()
+        batch = [first]
+        deadline = first[0] + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self.stopping.is_set():
+                    batch.append(self.messages.get(timeout=remaining))
+                else:
+                    # a lagging queue still fills whole batches
+                    batch.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        
+        return batch
+    
+    def _process_batch(self, batch: List[Tuple[float, bytes]]):
+        """Process a batch of queued messages."""
+        lag = time.monotonic() - batch[0][0]
+        with self.stats_lock:
+            self.stats['lag_seconds'] = lag
+        MQTT_LAG.set(lag)
+        MQTT_QUEUED.set(self.messages.qsize())
+        
+        records = []
+        for _, payload in batch:
+            try:
+                records.append(json.loads(payload.decode('utf-8')))
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                self._count('malformed')
+                logger.error(f"Failed to parse MQTT message: {str(e)}")
+        
+        if not records:
+            return
         
         ingest_id = str(uuid.uuid4())
         
@@ -115,7 +282,7 @@ class MQTTGPSConsumer:
             result, points = normalize_batch(records, self.mapping, ingest_id)
             
             if points:
-                self.track_repo.upsert_batch(points)
+                self._write(points)
             
             self.job_registry.update_job_status(
                 ingest_id=ingest_id,
@@ -128,10 +295,13 @@ class MQTTGPSConsumer:
                 error_sample=dict(list(result.errors.items())[:10])
             )
             
+            self._count('accepted', result.accepted)
+            self._count('rejected', result.rejected)
             logger.info(f"Processed MQTT batch: {result.accepted} accepted, {result.rejected} rejected")
-            
+        
         except Exception as e:
             logger.error(f"Error processing MQTT batch: {str(e)}")
+            self._count('failed', len(records))
             
             self.job_registry.update_job_status(
                 ingest_id=ingest_id,
@@ -139,12 +309,24 @@ class MQTTGPSConsumer:
                 error_sample={0: str(e)}
             )
     
+    def _write(self, points):
+        """Write points, retrying with exponential backoff."""
+        for attempt in range(settings.MQTT_WRITE_RETRIES + 1):
+            try:
+                self.track_repo.upsert_batch(points)
+                return
+            except Exception as e:
+                if attempt == settings.MQTT_WRITE_RETRIES:
+                    raise
+                logger.warning(f"MQTT batch write failed, retrying: {str(e)}")
+                time.sleep(settings.MQTT_RETRY_BACKOFF_MS / 1000 * 2 ** attempt)
+    
     def connect(self):
         """Connect to MQTT broker."""
         self.client.connect(
             settings.MQTT_BROKER,
             settings.MQTT_PORT,
-            keepalive=60
+            keepalive=settings.MQTT_KEEPALIVE
         )
     
     def run(self):
@@ -152,17 +334,19 @@ class MQTTGPSConsumer:
         logger.info("Starting MQTT consumer loop")
         
         try:
+            self.start()
             self.connect()
             self.client.loop_forever()
         except KeyboardInterrupt:
             logger.info("MQTT consumer stopped by user")
-            self._process_batch()
         except Exception as e:
             logger.error(f"MQTT consumer error: {str(e)}")
             raise
         finally:
-            self.client.disconnect()
-            logger.info("MQTT consumer closed")
+            self.stop()
+            self.track_repo.close()
+            self.job_registry.close()
+            logger.info(f"MQTT consumer closed: {self.get_stats()}")
 
 
 def start_mqtt_consumer(
@@ -182,6 +366,9 @@ def start_mqtt_consumer(
         logger.warning("MQTT ingestion is disabled in settings")
         return
     
+    if settings.METRICS_PORT and metrics.enabled():
+        metrics.start_http_server(settings.METRICS_PORT)
+    
     consumer = MQTTGPSConsumer(
         topic=topic,
         mapping=mapping,
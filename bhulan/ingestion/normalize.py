@@ -4,10 +4,17 @@ Normalization pipeline for GPS data.
 Converts raw GPS data from various sources into canonical TrackPoint schema.
 """
 
-from typing import Dict, Any, List, Optional
-from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
+import hashlib
+import time
 import uuid
-from bhulan.models.canonical import TrackPoint, NormalizationResult
+import numpy as np
+import pandas as pd
+from bhulan.config.settings import settings
+from bhulan.core.metrics import Counter, Histogram
+from bhulan.models.canonical import TrackPoint, NormalizationResult, POINT_KEY
+from bhulan.ingestion.timestamps import TimestampParser
 from bhulan.ingestion.validate import (
     validate_required_fields,
     validate_coordinates,
@@ -21,6 +28,32 @@ from bhulan.ingestion.validate import (
 )
 
 
+NORMALIZE_SECONDS = Histogram(
+    'bhulan_normalize_seconds',
+    'Time to normalize a batch of records',
+    ['vendor']
+)
+NORMALIZE_RECORDS = Counter(
+    'bhulan_normalize_records_total',
+    'Records normalized, by whether they were accepted or rejected',
+    ['vendor', 'outcome']
+)
+
+
+def observe_batch(vendor: str, result: NormalizationResult, seconds: float) -> None:
+    """
+    Record the latency and outcome counts of a normalized batch.
+    
+    Args:
+        vendor: Vendor of the mapping plan
+        result: Result of the batch
+        seconds: Time taken to normalize it
+    """
+    NORMALIZE_SECONDS.labels(vendor).observe(seconds)
+    NORMALIZE_RECORDS.labels(vendor, 'accepted').inc(result.accepted)
+    NORMALIZE_RECORDS.labels(vendor, 'rejected').inc(result.rejected)
+
+
 class MappingPlan:
     """
     Defines how to map source fields to canonical schema.
@@ -48,6 +81,50 @@ class MappingPlan:
         self.unit_map = unit_map or {}
         self.defaults = defaults or {}
         self.vendor = vendor
+        self._compiled = None
+        self._timestamp_format = None
+    
+    def compile(self) -> 'CompiledMapping':
+        """
+        Compile the plan into a reusable record transform.
+        
+        The plan is compiled on first use and cached, so field_map,
+        unit_map and defaults should not be changed afterwards.
+        
+        Returns:
+            CompiledMapping for this plan
+        """
+        if self._compiled is None:
+            self._compiled = CompiledMapping(self)
+            self._compiled.timestamps.format = self._timestamp_format
+        return self._compiled
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Pickle the plan without its compiled transform, which holds closures.
+        
+        The timestamp format the transform sniffed is kept, so a plan sent
+        to a worker process with each chunk does not sniff it again.
+        """
+        state = self.__dict__.copy()
+        if self._compiled is not None:
+            state['_timestamp_format'] = self._compiled.timestamps.format
+        state['_compiled'] = None
+        return state
+
+
+SPEED_UNITS = {
+    'mps': 1.0,
+    'kph': 1.0 / 3.6,
+    'mph': 0.44704,
+    'knots': 0.514444
+}
+
+ALTITUDE_UNITS = {
+    'm': 1.0,
+    'ft': 0.3048,
+    'km': 1000.0
+}
 
 
 def convert_speed_to_mps(value: float, unit: str) -> float:
@@ -61,18 +138,11 @@ def convert_speed_to_mps(value: float, unit: str) -> float:
     Returns:
         Speed in meters per second
     """
-    conversions = {
-        'mps': 1.0,
-        'kph': 1.0 / 3.6,
-        'mph': 0.44704,
-        'knots': 0.514444
-    }
-    
     unit_lower = unit.lower()
-    if unit_lower not in conversions:
+    if unit_lower not in SPEED_UNITS:
         raise ValueError(f"Unknown speed unit: {unit}")
     
-    return value * conversions[unit_lower]
+    return value * SPEED_UNITS[unit_lower]
 
 
 def convert_altitude_to_meters(value: float, unit: str) -> float:
@@ -86,53 +156,164 @@ def convert_altitude_to_meters(value: float, unit: str) -> float:
     Returns:
         Altitude in meters
     """
-    conversions = {
-        'm': 1.0,
-        'ft': 0.3048,
-        'km': 1000.0
-    }
-    
     unit_lower = unit.lower()
-    if unit_lower not in conversions:
+    if unit_lower not in ALTITUDE_UNITS:
         raise ValueError(f"Unknown altitude unit: {unit}")
     
-    return value * conversions[unit_lower]
+    return value * ALTITUDE_UNITS[unit_lower]
 
 
-def apply_mapping(record: Dict[str, Any], mapping: MappingPlan) -> Dict[str, Any]:
+def _unit_converter(value_unit: str, convert):
     """
-    Apply mapping plan to convert source record to canonical fields.
+    Build a converter for one unit-mapped field.
     
     Args:
-        record: Source data record
-        mapping: Mapping plan to apply
+        value_unit: Source unit from the plan's unit_map
+        convert: convert_speed_to_mps or convert_altitude_to_meters
         
     Returns:
-        Mapped record with canonical field names
+        Function converting one value to the canonical unit
+    """
+    try:
+        factor = convert(1.0, value_unit)
+    except ValueError:
+        # unknown units fail per record, like the uncompiled mapping did
+        return lambda value: convert(value, value_unit)
+    return lambda value: value * factor
+
+
+class CompiledMapping:
     """
-    mapped = {}
+    MappingPlan with field lookups and unit conversions resolved once.
     
-    for source_field, canonical_field in mapping.field_map.items():
-        if source_field in record:
-            mapped[canonical_field] = record[source_field]
+    Records that share a key layout (every row of a file or vendor feed)
+    share the list of (source, canonical) field pairs to copy, so mapping
+    a record no longer walks the whole field_map or branches on units.
+    """
     
-    for field, default_value in mapping.defaults.items():
-        if field not in mapped:
-            mapped[field] = default_value
+    MAX_SHAPES = 256
     
-    if 'speed_mps' in mapped and 'speed_mps' in mapping.unit_map:
-        unit = mapping.unit_map['speed_mps']
-        if unit != 'mps':
-            mapped['speed_mps'] = convert_speed_to_mps(mapped['speed_mps'], unit)
+    def __init__(self, plan: MappingPlan):
+        """
+        Compile a mapping plan.
+        
+        Args:
+            plan: Mapping plan to compile
+        """
+        self.vendor = plan.vendor
+        self.field_map = dict(plan.field_map)
+        self.defaults = dict(plan.defaults)
+        
+        # (field, source unit, converter) for fields not already in
+        # canonical units
+        self.units = []
+        for field, base_unit, convert in [
+            ('speed_mps', 'mps', convert_speed_to_mps),
+            ('alt_m', 'm', convert_altitude_to_meters)
+        ]:
+            unit = plan.unit_map.get(field)
+            if unit is not None and unit != base_unit:
+                self.units.append((field, unit, convert))
+        self.converters = [(field, _unit_converter(unit, convert)) for field, unit, convert in self.units]
+        
+        # timestamp format of the feed, sniffed on first use
+        self.timestamps = TimestampParser()
+        
+        self._shapes = {}
     
-    if 'alt_m' in mapped and 'alt_m' in mapping.unit_map:
-        unit = mapping.unit_map['alt_m']
-        if unit != 'm':
-            mapped['alt_m'] = convert_altitude_to_meters(mapped['alt_m'], unit)
+    def _compile_shape(self, keys) -> Tuple[List[Tuple[str, str]], List[Tuple[str, Any]]]:
+        """
+        Resolve which fields to copy and which defaults to fill.
+        
+        Args:
+            keys: Keys present in the source record
+            
+        Returns:
+            Tuple of ((source, canonical) pairs in field_map order,
+            (canonical, default) pairs for fields no source provides)
+        """
+        pairs = [(src, canonical) for src, canonical in self.field_map.items() if src in keys]
+        mapped = {canonical for _, canonical in pairs}
+        defaults = [(field, value) for field, value in self.defaults.items() if field not in mapped]
+        return pairs, defaults
     
-    mapped['src'] = mapping.vendor
+    def __call__(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Map a source record to canonical fields.
+        
+        Args:
+            record: Source data record
+            
+        Returns:
+            Mapped record with canonical field names
+        """
+        if type(record) is dict:
+            shape = tuple(record)
+            compiled = self._shapes.get(shape)
+            if compiled is None:
+                if len(self._shapes) >= self.MAX_SHAPES:
+                    self._shapes.clear()
+                compiled = self._shapes[shape] = self._compile_shape(record)
+        else:
+            compiled = self._compile_shape(record)
+        
+        pairs, defaults = compiled
+        mapped = {canonical: record[src] for src, canonical in pairs}
+        for field, value in defaults:
+            mapped[field] = value
+        
+        for field, convert in self.converters:
+            if mapped.get(field) is not None:
+                mapped[field] = convert(mapped[field])
+        
+        mapped['src'] = self.vendor
+        
+        return mapped
     
-    return mapped
+    def apply_frame(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Map a DataFrame of source records column-wise.
+        
+        Equivalent to mapping every row: columns are renamed to canonical
+        fields, missing fields are filled with defaults and unit fields
+        are multiplied by their conversion factor.
+        
+        Args:
+            frame: Source records, one column per source field
+            
+        Returns:
+            DataFrame with canonical columns
+            
+        Raises:
+            ValueError: If the plan uses an unknown unit
+        """
+        pairs, defaults = self._compile_shape(set(frame.columns))
+        
+        mapped = pd.DataFrame({canonical: frame[src] for src, canonical in pairs}, index=frame.index)
+        for field, value in defaults:
+            mapped[field] = value
+        
+        for field, unit, convert in self.units:
+            if field in mapped:
+                mapped[field] = mapped[field] * convert(1.0, unit)
+        
+        mapped['src'] = self.vendor
+        
+        return mapped
+
+
+def apply_mapping(record: Dict[str, Any], mapping: MappingPlan) -> Dict[str, Any]:
+    """
+    Apply mapping plan to convert source record to canonical fields.
+    
+    Args:
+        record: Source data record
+        mapping: Mapping plan to apply
+        
+    Returns:
+        Mapped record with canonical field names
+    """
+    return mapping.compile()(record)
 
 
 def normalize_record(
@@ -211,8 +392,10 @@ def normalize_record(
 def normalize_batch(
     records: List[Dict[str, Any]],
     mapping: MappingPlan,
-    ingest_id: Optional[str] = None
-) -> NormalizationResult:
+    ingest_id: Optional[str] = None,
+    fast: Optional[bool] = None,
+    observe: bool = True
+) -> Tuple[NormalizationResult, List[TrackPoint]]:
     """
     Normalize a batch of records.
     
@@ -220,13 +403,26 @@ def normalize_batch(
         records: List of source data records
         mapping: Mapping plan to apply
         ingest_id: Ingestion job ID (generated if not provided)
+        fast: Use normalize_batch_fast (defaults to settings.NORMALIZE_FAST_PATH)
+        observe: Record the batch in the normalize metrics; off when the
+            caller records it, e.g. from another process
         
     Returns:
-        NormalizationResult with accepted/rejected counts and errors
+        Tuple of (NormalizationResult with accepted/rejected counts and
+        errors, accepted TrackPoints)
     """
+    started = time.perf_counter()
     if ingest_id is None:
         ingest_id = str(uuid.uuid4())
     
+    if fast is None:
+        fast = settings.NORMALIZE_FAST_PATH
+    if fast:
+        result, points = normalize_batch_fast(records, mapping, ingest_id)
+        if observe:
+            observe_batch(mapping.vendor, result, time.perf_counter() - started)
+        return result, points
+    
     accepted = []
     rejected = 0
     errors = {}
@@ -242,9 +438,508 @@ def normalize_batch(
             rejected += 1
             errors[idx] = f"Unexpected error: {str(e)}"
     
+    result = NormalizationResult(
+        accepted=len(accepted),
+        rejected=rejected,
+        errors=errors,
+        ingest_id=ingest_id
+    )
+    if observe:
+        observe_batch(mapping.vendor, result, time.perf_counter() - started)
+    return result, accepted
+
+
+_NUMERIC_TYPES = (int, float, np.integer, np.floating)
+_NUMERIC_FIELDS = ['lat', 'lon', 'speed_mps', 'heading_deg', 'hdop', 'alt_m']
+_PLAIN_TYPES = {float, int, type(None)}
+
+# same layout as POINT_KEY
+_POINT_KEY_DTYPE = np.dtype([('ts', '<i8'), ('lat', '<i4'), ('lon', '<i4')])
+
+
+def _numeric_column(values: List[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convert optional numeric values to a float column.
+    
+    Args:
+        values: Field values, possibly None
+        
+    Returns:
+        Tuple of (float array with nan for None, present mask, mask of
+        values that are present but not plain numbers)
+    """
+    n = len(values)
+    
+    if set(map(type, values)) <= _PLAIN_TYPES:
+        try:
+            column = np.array(values, dtype=np.float64)
+        except OverflowError:
+            pass
+        else:
+            present = np.array(values, dtype=object) != None  # noqa: E711
+            return column, present, np.zeros(n, dtype=bool)
+    
+    column = np.full(n, np.nan)
+    present = np.zeros(n, dtype=bool)
+    bad = np.zeros(n, dtype=bool)
+    
+    for i, v in enumerate(values):
+        if v is None:
+            continue
+        present[i] = True
+        if isinstance(v, _NUMERIC_TYPES):
+            try:
+                column[i] = v
+            except OverflowError:
+                bad[i] = True
+        else:
+            bad[i] = True
+    
+    return column, present, bad
+
+
+def _parse_timestamps(transform: 'CompiledMapping', values: List[Any]) -> np.ndarray:
+    """
+    Parse a column of raw timestamps, repairing the ones the parser skips.
+    
+    Args:
+        transform: Compiled mapping whose TimestampParser to use
+        values: Raw timestamp values
+        
+    Returns:
+        datetime64[us] array in naive UTC, NaT where a value cannot be parsed
+    """
+    ts, parsed = transform.timestamps.parse(values)
+    for i in np.flatnonzero(~parsed).tolist():
+        try:
+            ts[i] = repair_timestamp(values[i])
+        except Exception:
+            pass
+    return ts
+
+
+def _check_columns(
+    ts: np.ndarray,
+    columns: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]
+) -> Tuple[np.ndarray, Dict[str, List[Any]], List[Optional[Dict[str, bool]]]]:
+    """
+    Apply the record validators to whole columns.
+    
+    Args:
+        ts: datetime64[us] timestamps, NaT where unparsed
+        columns: _numeric_column result for lat, lon, speed_mps,
+            heading_deg, hdop and alt_m
+            
+    Returns:
+        Tuple of (mask of rows that pass every check, field -> list of
+        values to store with None for unset or dropped values, quality
+        flags per row or None)
+    """
+    lat, _, lat_bad = columns['lat']
+    lon, _, lon_bad = columns['lon']
+    speed, speed_set, speed_bad = columns['speed_mps']
+    heading, heading_set, heading_bad = columns['heading_deg']
+    hdop, hdop_set, hdop_bad = columns['hdop']
+    alt, alt_set, alt_bad = columns['alt_m']
+    
+    # both the validator and the model bound timestamps, one with utc now
+    # and one with local now
+    max_date = min(datetime.utcnow(), datetime.now()) + timedelta(days=2)
+    ts_ok = (ts >= np.datetime64('1970-01-01')) & (ts <= np.datetime64(max_date))
+    
+    coords_ok = (lat >= -90) & (lat <= 90) & (lon >= -180) & (lon <= 180)
+    
+    speed_flag = speed_set & ((speed < 0) | (speed > 120))
+    heading_flag = heading_set & ~((heading >= 0) & (heading < 360))
+    hdop_negative = hdop_set & (hdop < 0)
+    hdop_flag = hdop_negative | (hdop_set & (hdop > 10))
+    
+    ok = ts_ok & coords_ok & ~(lat_bad | lon_bad | speed_bad | heading_bad | hdop_bad | alt_bad)
+    # nan passes the range checks of the validators but not the model
+    ok &= ~(speed_set & np.isnan(speed)) & ~(hdop_set & np.isnan(hdop))
+    
+    def stored(values, keep):
+        return [v if k else None for v, k in zip(values.tolist(), keep.tolist())]
+    
+    values = {
+        'ts_utc': ts.tolist(),
+        'lat': lat.tolist(),
+        'lon': lon.tolist(),
+        'speed_mps': stored(speed, speed_set & ~speed_flag),
+        'heading_deg': stored(heading, heading_set & ~heading_flag),
+        'hdop': stored(hdop, hdop_set & ~hdop_negative),
+        'alt_m': stored(alt, alt_set),
+    }
+    
+    flags = [None] * len(ts)
+    for i in np.flatnonzero(ok & (speed_flag | heading_flag | hdop_flag)).tolist():
+        quality_flags = {}
+        if speed_flag[i]:
+            quality_flags['flag_speed_spike'] = True
+        if heading_flag[i]:
+            quality_flags['flag_bad_heading'] = True
+        if hdop_flag[i]:
+            quality_flags['flag_bad_hdop'] = True
+        flags[i] = quality_flags
+    
+    return ok, values, flags
+
+
+def _construct_point(values: Dict[str, Any]) -> TrackPoint:
+    """
+    Build a TrackPoint from already validated values.
+    
+    Does what TrackPoint.model_construct does without its per-field
+    default and alias handling, so values must hold every field.
+    
+    Args:
+        values: Field values in TrackPoint field order
+        
+    Returns:
+        TrackPoint without validation
+    """
+    point = TrackPoint.__new__(TrackPoint)
+    object.__setattr__(point, '__dict__', values)
+    object.__setattr__(point, '__pydantic_fields_set__', set(values))
+    object.__setattr__(point, '__pydantic_extra__', None)
+    object.__setattr__(point, '__pydantic_private__', None)
+    return point
+
+
+def normalize_batch_fast(
+    records: List[Dict[str, Any]],
+    mapping: MappingPlan,
+    ingest_id: Optional[str] = None
+) -> Tuple[NormalizationResult, List[TrackPoint]]:
+    """
+    Normalize a batch of records, validating fields column-wise.
+    
+    Coordinates, timestamps, speed, heading and hdop are checked for the
+    whole batch with NumPy masks, and rows that pass every check are built
+    directly from the checked values, skipping per-row pydantic validation.
+    Timestamps are parsed for the whole batch with the mapping's
+    TimestampParser. Any row that fails a check or holds a value the masks
+    do not cover (strings in numeric fields, nan speed/hdop) goes through
+    normalize_record, so accepted points, rejected rows and
+    error messages are the same as normalize_batch(fast=False).
+    
+    Args:
+        records: List of source data records
+        mapping: Mapping plan to apply
+        ingest_id: Ingestion job ID (generated if not provided)
+        
+    Returns:
+        Tuple of (NormalizationResult with accepted/rejected counts and
+        errors, accepted TrackPoints)
+    """
+    if ingest_id is None:
+        ingest_id = str(uuid.uuid4())
+    
+    # rows that mapped cleanly; everything else is left to the per-row
+    # path below
+    transform = mapping.compile()
+    rows = []
+    for idx, record in enumerate(records):
+        try:
+            mapped = transform(record)
+            validate_required_fields(mapped)
+        except Exception:
+            continue
+        rows.append((idx, mapped))
+    
+    clean = {}
+    if rows:
+        mapped_rows = [row[1] for row in rows]
+        
+        # timestamps in the feed's format are parsed in one call, only the
+        # rest go through repair_timestamp
+        ts = _parse_timestamps(transform, [m['ts_utc'] for m in mapped_rows])
+        columns = {
+            field: _numeric_column([m.get(field) for m in mapped_rows])
+            for field in _NUMERIC_FIELDS
+        }
+        ok, values, flags = _check_columns(ts, columns)
+        
+        ts, lat, lon = values['ts_utc'], values['lat'], values['lon']
+        speed, heading = values['speed_mps'], values['heading_deg']
+        hdop, alt = values['hdop'], values['alt_m']
+        
+        for i in np.flatnonzero(ok).tolist():
+            idx, mapped = rows[i]
+            
+            point = _construct_point({
+                'device_id': str(mapped['device_id']),
+                'ts_utc': ts[i],
+                'lat': lat[i],
+                'lon': lon[i],
+                'speed_mps': speed[i],
+                'heading_deg': heading[i],
+                'alt_m': alt[i],
+                'hdop': hdop[i],
+                'src': mapped.get('src'),
+                'raw': {'original': records[idx]},
+                'ingest_id': ingest_id,
+                'seq_no': idx
+            })
+            
+            if flags[i]:
+                add_quality_flags(point, flags[i])
+            
+            clean[idx] = point
+    
+    accepted = []
+    rejected = 0
+    errors = {}
+    
+    if len(clean) == len(records):
+        accepted = list(clean.values())
+    else:
+        for idx, record in enumerate(records):
+            point = clean.get(idx)
+            if point is not None:
+                accepted.append(point)
+                continue
+            
+            try:
+                accepted.append(normalize_record(record, mapping, ingest_id, seq_no=idx))
+            except ValidationError as e:
+                rejected += 1
+                errors[idx] = str(e)
+            except Exception as e:
+                rejected += 1
+                errors[idx] = f"Unexpected error: {str(e)}"
+    
     return NormalizationResult(
         accepted=len(accepted),
         rejected=rejected,
         errors=errors,
         ingest_id=ingest_id
     ), accepted
+
+
+def _frame_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Convert a DataFrame to records, with None for null cells.
+    
+    Args:
+        frame: Source records
+        
+    Returns:
+        One dictionary per row
+    """
+    columns = []
+    for name in frame.columns:
+        series = frame[name]
+        nulls = series.isna()
+        if nulls.any():
+            series = series.astype(object).where(~nulls, None)
+        columns.append(series.tolist())
+    
+    names = list(frame.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def _frame_column(mapped: pd.DataFrame, field: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build a numeric column from a mapped DataFrame, like _numeric_column.
+    
+    Args:
+        mapped: DataFrame with canonical columns
+        field: Canonical numeric field
+        
+    Returns:
+        Tuple of (float array, present mask, bad type mask)
+    """
+    n = len(mapped)
+    if field not in mapped:
+        return np.full(n, np.nan), np.zeros(n, dtype=bool), np.zeros(n, dtype=bool)
+    
+    series = mapped[field]
+    if pd.api.types.is_float_dtype(series.dtype) or pd.api.types.is_signed_integer_dtype(series.dtype):
+        present = series.notna().to_numpy()
+        return series.to_numpy(dtype=np.float64, na_value=np.nan), present, np.zeros(n, dtype=bool)
+    
+    return _numeric_column(series.astype(object).where(series.notna(), None).tolist())
+
+
+def _frame_timestamps(transform: 'CompiledMapping', series: pd.Series) -> np.ndarray:
+    """
+    Parse the timestamp column of a mapped DataFrame.
+    
+    Args:
+        transform: Compiled mapping whose TimestampParser to use
+        series: Raw timestamp column
+        
+    Returns:
+        datetime64[us] array in naive UTC, NaT where a value cannot be parsed
+    """
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+        return series.to_numpy(dtype='datetime64[us]')
+    
+    return _parse_timestamps(transform, series.astype(object).where(series.notna(), None).tolist())
+
+
+def _point_hashes(
+    rows: np.ndarray,
+    devices: List[str],
+    ts_ms: np.ndarray,
+    lat: np.ndarray,
+    lon: np.ndarray
+) -> List[bytes]:
+    """
+    Compute point_hash for many points at once.
+    
+    Args:
+        rows: Row positions of the points
+        devices: Device identifier of each point
+        ts_ms: Epoch milliseconds, by row
+        lat: Latitudes, by row
+        lon: Longitudes, by row
+        
+    Returns:
+        16-byte hash of each point, as TrackPoint.compute_hash returns
+    """
+    keys = np.empty(len(rows), dtype=_POINT_KEY_DTYPE)
+    keys['ts'] = ts_ms[rows]
+    keys['lat'] = np.rint(lat[rows] * 1e6)
+    keys['lon'] = np.rint(lon[rows] * 1e6)
+    packed = keys.tobytes()
+    
+    size = POINT_KEY.size
+    blake2b = hashlib.blake2b
+    return [
+        blake2b(packed[i * size:(i + 1) * size] + device.encode(), digest_size=16).digest()
+        for i, device in enumerate(devices)
+    ]
+
+
+def normalize_frame(
+    frame: pd.DataFrame,
+    mapping: MappingPlan,
+    ingest_id: Optional[str] = None,
+    observe: bool = True
+) -> Tuple[NormalizationResult, List[Dict[str, Any]]]:
+    """
+    Normalize a DataFrame of records straight to MongoDB documents.
+    
+    The frame is mapped with CompiledMapping.apply_frame and validated
+    column-wise, and documents are built directly from the checked columns
+    without creating TrackPoints. Null cells are missing values, so the
+    result is the same as normalize_batch on the frame's records with None
+    for nulls, followed by to_mongo_doc and compute_hash. Rows that fail a
+    column check go through normalize_record for their error message.
+    
+    Args:
+        frame: Source records, one column per source field
+        mapping: Mapping plan to apply
+        ingest_id: Ingestion job ID (generated if not provided)
+        observe: Record the batch in the normalize metrics, as for
+            normalize_batch
+        
+    Returns:
+        Tuple of (NormalizationResult, documents with _hash for accepted rows)
+    """
+    started = time.perf_counter()
+    if ingest_id is None:
+        ingest_id = str(uuid.uuid4())
+    
+    frame = frame.reset_index(drop=True)
+    records = _frame_records(frame)
+    transform = mapping.compile()
+    
+    try:
+        mapped = transform.apply_frame(frame)
+    except (TypeError, ValueError):
+        # e.g. text in a unit-converted column, left to normalize_record
+        mapped = None
+    
+    clean = {}
+    if mapped is not None and len(mapped) and all(f in mapped for f in ['device_id', 'ts_utc', 'lat', 'lon']):
+        ts = _frame_timestamps(transform, mapped['ts_utc'])
+        columns = {field: _frame_column(mapped, field) for field in _NUMERIC_FIELDS}
+        ok, values, flags = _check_columns(ts, columns)
+        ts_ms = ts.astype(np.int64) // 1000
+        
+        devices = mapped['device_id'].astype(object).where(mapped['device_id'].notna(), None).tolist()
+        srcs = mapped['src'].tolist()
+        ts, lat, lon = values['ts_utc'], values['lat'], values['lon']
+        speed, heading = values['speed_mps'], values['heading_deg']
+        hdop, alt = values['hdop'], values['alt_m']
+        
+        rows = []
+        row_devices = []
+        for i in np.flatnonzero(ok).tolist():
+            device_id = devices[i]
+            if device_id is None:
+                continue
+            device_id = str(device_id)
+            if not device_id.strip():
+                continue
+            rows.append(i)
+            row_devices.append(device_id)
+            
+            raw = {'original': records[i]}
+            if flags[i]:
+                raw['meta'] = {'quality_flags': flags[i]}
+            
+            clean[i] = {
+                'device_id': device_id,
+                'ts_utc': ts[i],
+                'lat': lat[i],
+                'lon': lon[i],
+                'speed_mps': speed[i],
+                'heading_deg': heading[i],
+                'alt_m': alt[i],
+                'hdop': hdop[i],
+                'src': srcs[i],
+                'raw': raw,
+                'ingest_id': ingest_id,
+                'seq_no': i,
+                'loc': {'type': 'Point', 'coordinates': [lon[i], lat[i]]}
+            }
+        
+        hashes = _point_hashes(np.array(rows, dtype=np.intp), row_devices, ts_ms,
+                               columns['lat'][0], columns['lon'][0])
+        for i, point_hash in zip(rows, hashes):
+            clean[i]['_hash'] = point_hash
+    
+    if len(clean) == len(records):
+        docs = list(clean.values())
+        rejected = 0
+        errors = {}
+    else:
+        docs = []
+        rejected = 0
+        errors = {}
+        for idx, record in enumerate(records):
+            doc = clean.get(idx)
+            if doc is not None:
+                docs.append(doc)
+                continue
+            
+            try:
+                point = normalize_record(record, mapping, ingest_id, seq_no=idx)
+            except ValidationError as e:
+                rejected += 1
+                errors[idx] = str(e)
+                continue
+            except Exception as e:
+                rejected += 1
+                errors[idx] = f"Unexpected error: {str(e)}"
+                continue
+            
+            doc = point.to_mongo_doc()
+            doc['_hash'] = point.compute_hash()
+            docs.append(doc)
+    
+    result = NormalizationResult(
+        accepted=len(docs),
+        rejected=rejected,
+        errors=errors,
+        ingest_id=ingest_id
+    )
+    if observe:
+        observe_batch(mapping.vendor, result, time.perf_counter() - started)
+    return result, docs
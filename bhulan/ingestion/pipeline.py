@@ -0,0 +1,331 @@
+"""
+Pipelined ingestion of file chunks.
+
+Overlaps the three stages of file ingestion: chunks are read on the
+calling thread, normalized in a process pool and written to MongoDB from
+a thread pool, with a bounded number of chunks waiting between stages.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from pydantic import BaseModel, Field
+from bhulan.config.settings import settings
+from bhulan.ingestion.normalize import MappingPlan, normalize_batch, normalize_frame, observe_batch
+from bhulan.models.canonical import NormalizationResult
+from bhulan.storage.mongo_repo import MongoTrackPointRepository, point_documents
+
+logger = logging.getLogger(__name__)
+
+# Normalization pools shared by the pipelines of this process, by worker count
+_normalize_pools: Dict[int, Executor] = {}
+_normalize_pools_lock = threading.Lock()
+
+
+class PipelineStats(BaseModel):
+    """Counts and time spent in each stage of a pipelined ingestion."""
+    chunks: int = Field(0, description="Number of chunks read")
+    rows: int = Field(0, description="Number of rows read")
+    read_seconds: float = Field(0.0, description="Time spent reading chunks")
+    normalize_seconds: float = Field(0.0, description="Time spent normalizing, summed over workers")
+    write_seconds: float = Field(0.0, description="Time spent writing, summed over workers")
+    blocked_seconds: float = Field(0.0, description="Time the reader waited for later stages")
+    total_seconds: float = Field(0.0, description="Wall-clock time of the whole run")
+
+
+def normalize_chunk(
+    chunk: Any,
+    mapping: MappingPlan,
+    ingest_id: str
+) -> Tuple[NormalizationResult, List[Dict[str, Any]], float]:
+    """
+    Normalize one chunk into track point documents.
+    
+    Runs in the normalization workers, so it takes and returns only
+    picklable values. The chunk is not recorded in the normalize metrics
+    here, as a worker process's metrics are never served; the pipeline
+    records it from the returned result.
+    
+    Args:
+        chunk: DataFrame (normalized with normalize_frame) or list of records
+        mapping: Mapping plan
+        ingest_id: Ingestion job ID
+        
+    Returns:
+        Tuple of (NormalizationResult, documents with _hash, seconds taken)
+    """
+    started = time.perf_counter()
+    if isinstance(chunk, pd.DataFrame):
+        result, docs = normalize_frame(chunk, mapping, ingest_id, observe=False)
+    else:
+        result, points = normalize_batch(chunk, mapping, ingest_id, observe=False)
+        docs = point_documents(points)
+    
+    return result, docs, time.perf_counter() - started
+
+
+class InlineExecutor(Executor):
+    """Executor that runs each call on the submitting thread."""
+    
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        Run a call and return its already completed future.
+        
+        Args:
+            fn: Callable to run
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+            
+        Returns:
+            Future holding the result or exception of the call
+        """
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def worker_context() -> multiprocessing.context.BaseContext:
+    """
+    Get the multiprocessing context for ingestion worker processes.
+    
+    forkserver is used where available, so workers do not inherit the
+    parent's MongoClient and its monitor threads.
+    
+    Returns:
+        forkserver context, else the platform default
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context()
+
+
+def _normalize_worker_count(workers: Optional[int]) -> int:
+    """Resolve the number of normalization workers from settings and the CPU count."""
+    if workers is None:
+        workers = settings.INGEST_NORMALIZE_WORKERS
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def create_normalize_pool(workers: Optional[int] = None) -> Executor:
+    """
+    Create the executor that normalizes chunks.
+    
+    Args:
+        workers: Number of worker processes (defaults to
+            settings.INGEST_NORMALIZE_WORKERS, then the CPU count). With
+            fewer than two, chunks are normalized on the calling thread.
+            
+    Returns:
+        Process pool, or an InlineExecutor
+    """
+    workers = _normalize_worker_count(workers)
+    if workers < 2:
+        return InlineExecutor()
+    
+    return ProcessPoolExecutor(max_workers=workers, mp_context=worker_context())
+
+
+def get_normalize_pool(workers: Optional[int] = None) -> Executor:
+    """
+    Get the normalization executor shared by the pipelines of this process.
+    
+    Process pools are created on first use and kept until the process
+    exits, so files ingested one after another reuse the same workers.
+    
+    Args:
+        workers: Number of worker processes, as for create_normalize_pool
+        
+    Returns:
+        Shared process pool, or an InlineExecutor
+    """
+    workers = _normalize_worker_count(workers)
+    if workers < 2:
+        return InlineExecutor()
+    
+    with _normalize_pools_lock:
+        pool = _normalize_pools.get(workers)
+        if pool is None:
+            pool = _normalize_pools[workers] = create_normalize_pool(workers)
+        return pool
+
+
+def _discard_normalize_pool(pool: Executor) -> None:
+    """Stop sharing a pool whose workers died, so the next run starts a new one."""
+    with _normalize_pools_lock:
+        for workers, shared in list(_normalize_pools.items()):
+            if shared is pool:
+                del _normalize_pools[workers]
+    pool.shutdown(wait=False)
+
+
+class IngestPipeline:
+    """
+    Read, normalize and write chunks of one ingestion job concurrently.
+    
+    At most max_pending chunks wait for normalization and at most
+    max_pending for writing; when either stage is full the reader blocks
+    until the oldest chunk moves on. Results are collected in chunk order,
+    so error indexes and job stats are the same as for a sequential run.
+    """
+    
+    def __init__(
+        self,
+        repo: MongoTrackPointRepository,
+        normalize_pool: Optional[Executor] = None,
+        normalize_workers: Optional[int] = None,
+        write_workers: Optional[int] = None,
+        max_pending: Optional[int] = None
+    ):
+        """
+        Initialize ingestion pipeline.
+        
+        Args:
+            repo: Track point repository to write to
+            normalize_pool: Executor for normalization, not shut down by
+                the pipeline (the process-wide pool from get_normalize_pool,
+                used from the second chunk, if not provided)
+            normalize_workers: Worker processes of the process-wide pool
+            write_workers: Writer threads (defaults to settings); 0 writes
+                on the calling thread
+            max_pending: Chunks allowed to wait for each stage (defaults to settings)
+        """
+        self.repo = repo
+        self.normalize_pool = normalize_pool
+        self.normalize_workers = normalize_workers
+        self.write_workers = settings.INGEST_WRITE_WORKERS if write_workers is None else write_workers
+        self.max_pending = max(1, max_pending or settings.INGEST_MAX_PENDING_CHUNKS)
+    
+    def run(
+        self,
+        chunks: Iterable[Any],
+        mapping: MappingPlan,
+        ingest_id: str
+    ) -> Tuple[NormalizationResult, PipelineStats]:
+        """
+        Ingest chunks from a reader.
+        
+        Args:
+            chunks: Chunks of records or DataFrames, e.g. from read_csv_frames
+            mapping: Mapping plan
+            ingest_id: Ingestion job ID
+            
+        Returns:
+            Tuple of (NormalizationResult over all chunks, PipelineStats)
+            
+        Raises:
+            Exception: The first error from reading, normalizing or writing;
+                chunks still waiting are cancelled
+        """
+        stats = PipelineStats()
+        result = NormalizationResult(accepted=0, rejected=0, ingest_id=ingest_id)
+        normalizing: Deque[Tuple[int, Future]] = deque()
+        writing: Deque[Future] = deque()
+        started = time.perf_counter()
+        
+        owned = []
+        normalize_pool = self.normalize_pool or InlineExecutor()
+        if self.write_workers > 0:
+            write_pool = ThreadPoolExecutor(max_workers=self.write_workers)
+            owned.append(write_pool)
+        else:
+            write_pool = InlineExecutor()
+        
+        try:
+            offset = 0
+            reader = iter(chunks)
+            while True:
+                read_started = time.perf_counter()
+                chunk = next(reader, None)
+                stats.read_seconds += time.perf_counter() - read_started
+                if chunk is None:
+                    break
+                
+                stats.chunks += 1
+                if stats.chunks == 2 and self.normalize_pool is None:
+                    # files of a single chunk are not worth handing to workers
+                    normalize_pool = get_normalize_pool(self.normalize_workers)
+                normalizing.append((offset, normalize_pool.submit(normalize_chunk, chunk, mapping, ingest_id)))
+                offset += len(chunk)
+                stats.rows = offset
+                
+                blocked_started = time.perf_counter()
+                while len(normalizing) >= self.max_pending:
+                    self._collect(normalizing.popleft(), mapping, result, stats, write_pool, writing)
+                stats.blocked_seconds += time.perf_counter() - blocked_started
+            
+            while normalizing:
+                self._collect(normalizing.popleft(), mapping, result, stats, write_pool, writing)
+            while writing:
+                stats.write_seconds += writing.popleft().result()
+        
+        except BaseException as e:
+            for _, future in normalizing:
+                future.cancel()
+            for future in writing:
+                future.cancel()
+            if isinstance(e, BrokenExecutor) and self.normalize_pool is None:
+                _discard_normalize_pool(normalize_pool)
+            raise
+        
+        finally:
+            # waiting chunks were cancelled above, so this only waits for running writes
+            for executor in owned:
+                executor.shutdown(wait=True)
+        
+        stats.total_seconds = time.perf_counter() - started
+        logger.info(
+            f"Ingested {stats.chunks} chunks in {stats.total_seconds:.2f}s "
+            f"(read {stats.read_seconds:.2f}s, normalize {stats.normalize_seconds:.2f}s, "
+            f"write {stats.write_seconds:.2f}s, blocked {stats.blocked_seconds:.2f}s)",
+            extra={
+                'ingest_id': ingest_id,
+                'accepted': result.accepted,
+                'rejected': result.rejected,
+                'duration_ms': int(stats.total_seconds * 1000)
+            }
+        )
+        
+        return result, stats
+    
+    def _collect(
+        self,
+        pending: Tuple[int, Future],
+        mapping: MappingPlan,
+        result: NormalizationResult,
+        stats: PipelineStats,
+        write_pool: Executor,
+        writing: Deque[Future]
+    ) -> None:
+        """Add a normalized chunk to the totals and queue its documents for writing."""
+        offset, future = pending
+        chunk_result, docs, seconds = future.result()
+        stats.normalize_seconds += seconds
+        observe_batch(mapping.vendor, chunk_result, seconds)
+        
+        result.accepted += chunk_result.accepted
+        result.rejected += chunk_result.rejected
+        for idx, error in chunk_result.errors.items():
+            result.errors[offset + idx] = error
+        
+        # finished writes are collected early so that a failed one stops the run
+        while writing and (writing[0].done() or len(writing) >= self.max_pending):
+            stats.write_seconds += writing.popleft().result()
+        if docs:
+            writing.append(write_pool.submit(self._write, docs))
+    
+    def _write(self, docs: List[Dict[str, Any]]) -> float:
+        """Write documents, returning the seconds taken."""
+        started = time.perf_counter()
+        self.repo.write_documents(docs)
+        return time.perf_counter() - started
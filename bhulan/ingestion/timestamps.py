@@ -0,0 +1,178 @@
+"""
+Batch timestamp parsing for GPS data.
+
+Sniffs the timestamp format of a feed from a sample of its values and
+parses whole batches with one vectorized pandas call, leaving only values
+that do not match to repair_timestamp.
+"""
+
+from typing import Any, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+
+# Formats tried when sniffing, in order. Each must give the same result as
+# repair_timestamp for every string it matches (ISO strings through
+# fromisoformat, the rest through dateutil, which reads a/b/c as month first).
+# UTC offsets are left to fromisoformat: %z also accepts malformed offsets.
+TIMESTAMP_FORMATS = [
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%SZ',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S.%fZ',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%d',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %H:%M',
+    '%m/%d/%Y',
+    '%Y/%m/%d %H:%M:%S',
+]
+
+# Epoch numbers above this are milliseconds, as in repair_timestamp
+EPOCH_MS_THRESHOLD = 1e10
+
+# Integer epochs outside this range are left to repair_timestamp, whose
+# float division loses microseconds on larger millisecond values
+EPOCH_MIN = -1e10
+EPOCH_MAX = 4e12
+
+
+def parse_with_format(values: Sequence[str], fmt: str) -> np.ndarray:
+    """
+    Parse strings with a fixed format.
+    
+    Args:
+        values: Timestamp strings
+        fmt: strptime format
+        
+    Returns:
+        datetime64[us] array in naive UTC, NaT where a value does not match
+    """
+    values = pd.Index(values, dtype=object)
+    zulu = None
+    if fmt.endswith('Z'):
+        # pandas only has a fast parser for ISO formats, so a literal 'Z'
+        # is stripped and the rest parsed as plain ISO
+        zulu = np.asarray(values.str.endswith('Z'), dtype=bool)
+        values, fmt = values.str[:-1], fmt[:-1]
+    
+    parsed = pd.to_datetime(values, format=fmt, errors='coerce', utc=True)
+    parsed = parsed.tz_convert(None).values.astype('datetime64[us]')
+    if zulu is not None:
+        parsed[~zulu] = np.datetime64('NaT')
+    return parsed
+
+
+def sniff_timestamp_format(
+    values: Sequence[str],
+    formats: Sequence[str] = TIMESTAMP_FORMATS
+) -> Optional[str]:
+    """
+    Find the format that parses a sample of timestamp strings.
+    
+    Args:
+        values: Sample of timestamp strings
+        formats: Candidate formats, in order of preference
+        
+    Returns:
+        First format that parses every value, else the one that parses the
+        most (at least half), else None
+    """
+    if not values:
+        return None
+    
+    best = None
+    best_count = len(values) / 2
+    for fmt in formats:
+        count = int((~np.isnat(parse_with_format(values, fmt))).sum())
+        if count == len(values):
+            return fmt
+        if count >= best_count:
+            best, best_count = fmt, count
+    
+    return best
+
+
+class TimestampParser:
+    """
+    Column parser for the timestamps of one feed.
+    
+    The format is sniffed from the first batch and reused for later ones,
+    and sniffed again when a batch no longer matches it.
+    """
+    
+    def __init__(self, sample_size: int = 100, formats: Sequence[str] = TIMESTAMP_FORMATS):
+        """
+        Initialize timestamp parser.
+        
+        Args:
+            sample_size: Number of strings to sniff the format from
+            formats: Candidate formats, in order of preference
+        """
+        self.sample_size = sample_size
+        self.formats = formats
+        self.format = None
+    
+    def parse_strings(self, values: List[str]) -> np.ndarray:
+        """
+        Parse timestamp strings with the feed's format.
+        
+        Args:
+            values: Timestamp strings
+            
+        Returns:
+            datetime64[us] array in naive UTC, NaT where a value does not match
+        """
+        if not values:
+            return np.empty(0, dtype='datetime64[us]')
+        
+        fmt = self.format
+        if fmt is not None:
+            parsed = parse_with_format(values, fmt)
+            if not np.isnat(parsed).all():
+                return parsed
+        
+        fmt = self.format = sniff_timestamp_format(values[:self.sample_size], self.formats)
+        if fmt is None:
+            return np.full(len(values), np.datetime64('NaT'), dtype='datetime64[us]')
+        return parse_with_format(values, fmt)
+    
+    def parse(self, values: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Parse a column of raw timestamp values.
+        
+        Strings are parsed with the sniffed format and integers as epoch
+        seconds or milliseconds. Anything else, and strings that do not
+        match the format, are left for repair_timestamp.
+        
+        Args:
+            values: Raw timestamp values
+            
+        Returns:
+            Tuple of (datetime64[us] array in naive UTC, mask of parsed values)
+        """
+        result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[us]')
+        
+        strings = []
+        string_idx = []
+        epochs = []
+        epoch_idx = []
+        for i, value in enumerate(values):
+            kind = type(value)
+            if kind is str:
+                strings.append(value)
+                string_idx.append(i)
+            elif kind is int and EPOCH_MIN <= value < EPOCH_MAX:
+                epochs.append(value)
+                epoch_idx.append(i)
+        
+        if strings:
+            result[string_idx] = self.parse_strings(strings)
+        
+        if epochs:
+            epochs = np.array(epochs, dtype=np.int64)
+            micros = np.where(epochs > EPOCH_MS_THRESHOLD, epochs * 1000, epochs * 1000000)
+            result[epoch_idx] = micros.astype('datetime64[us]')
+        
+        return result, ~np.isnat(result)
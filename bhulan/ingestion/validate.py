@@ -5,7 +5,8 @@ Implements data quality checks and repairs for ingested GPS data.
 """
 
 from typing import Dict, Any, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from dateutil import parser as date_parser
 from bhulan.models.canonical import TrackPoint
 
 
@@ -139,6 +140,21 @@ def validate_hdop(hdop: Optional[float]) -> Tuple[Optional[float], bool]:
     return hdop, False
 
 
+def to_naive_utc(ts: datetime) -> datetime:
+    """
+    Convert a timezone-aware datetime to naive UTC.
+    
+    Args:
+        ts: Datetime, naive (assumed UTC) or timezone-aware
+        
+    Returns:
+        Naive datetime in UTC
+    """
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 def repair_timestamp(value: Any) -> datetime:
     """
     Attempt to repair/parse timestamp from various formats.
@@ -147,13 +163,13 @@ def repair_timestamp(value: Any) -> datetime:
         value: Timestamp value (string, int, float, or datetime)
         
     Returns:
-        Parsed datetime in UTC
+        Parsed datetime in UTC, without tzinfo
         
     Raises:
         ValidationError: If timestamp cannot be parsed
     """
     if isinstance(value, datetime):
-        return value
+        return to_naive_utc(value)
     
     if isinstance(value, (int, float)):
         try:
@@ -166,13 +182,12 @@ def repair_timestamp(value: Any) -> datetime:
     
     if isinstance(value, str):
         try:
-            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return to_naive_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
         except ValueError:
             pass
         
         try:
-            from dateutil import parser
-            return parser.parse(value)
+            return to_naive_utc(date_parser.parse(value))
         except Exception as e:
             raise ValidationError(f"Cannot parse timestamp: {value}")
     
@@ -6,10 +6,49 @@ Defines the normalized data model that all ingested GPS data is converted to.
 
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timedelta
+import hashlib
+import struct
 import uuid
 
 
+EPOCH = datetime(1970, 1, 1)
+
+# Packed hash key: epoch milliseconds, then latitude and longitude in
+# millionths of a degree, followed by the UTF-8 device_id
+POINT_KEY = struct.Struct('<qii')
+
+
+def epoch_ms(ts: datetime) -> int:
+    """
+    Convert a naive UTC timestamp to milliseconds since the epoch.
+    
+    Args:
+        ts: Naive UTC timestamp
+        
+    Returns:
+        Whole milliseconds, truncated as MongoDB stores dates
+    """
+    return (ts - EPOCH) // timedelta(milliseconds=1)
+
+
+def point_hash(device_id: str, ts_ms: int, lat: float, lon: float) -> bytes:
+    """
+    Compute the deduplication key of a track point.
+    
+    Args:
+        device_id: Device identifier
+        ts_ms: Timestamp in milliseconds since the epoch, from epoch_ms
+        lat: Latitude in decimal degrees
+        lon: Longitude in decimal degrees
+        
+    Returns:
+        16-byte BLAKE2b digest of device, timestamp and coordinates
+    """
+    key = POINT_KEY.pack(ts_ms, round(lat * 1e6), round(lon * 1e6)) + device_id.encode()
+    return hashlib.blake2b(key, digest_size=16).digest()
+
+
 class TrackPoint(BaseModel):
     """
     Canonical GPS track point model.
@@ -63,15 +102,25 @@ class TrackPoint(BaseModel):
         }
         return doc
     
-    def compute_hash(self) -> str:
+    def compute_hash(self) -> bytes:
         """
         Compute deterministic hash for deduplication.
         
         Uses device_id, timestamp, lat, lon to create unique identifier.
         """
-        import hashlib
-        key = f"{self.device_id}:{self.ts_utc.isoformat()}:{self.lat:.6f}:{self.lon:.6f}"
-        return hashlib.sha256(key.encode()).hexdigest()
+        return point_hash(self.device_id, epoch_ms(self.ts_utc), self.lat, self.lon)
+
+
+class WriteResult(BaseModel):
+    """Result of writing a batch of track points to storage."""
+    inserted: int = Field(0, description="Number of new points stored")
+    modified: int = Field(0, description="Number of existing points updated")
+    duplicates: int = Field(0, description="Number of points already stored or repeated in the batch")
+    
+    @property
+    def written(self) -> int:
+        """Number of points inserted or updated."""
+        return self.inserted + self.modified
 
 
 class NormalizationResult(BaseModel):
@@ -82,4 +131,19 @@ class NormalizationResult(BaseModel):
     ingest_id: str = Field(..., description="Ingestion job ID")
 
 
-from datetime import timedelta
+class IngestAccepted(BaseModel):
+    """Response for a webhook batch queued for background ingestion."""
+    ingest_id: str = Field(..., description="Ingestion job ID to poll /jobs with")
+    status: str = Field("queued", description="Job status, queued until a worker takes the batch")
+    record_count: int = Field(..., description="Number of records in the batch")
+
+
+class DirectoryIngestionResult(BaseModel):
+    """Result of ingesting a directory or glob of files."""
+    ingest_id: str = Field(..., description="Parent ingestion job ID")
+    files: int = Field(0, description="Number of files found")
+    ingested: Dict[str, str] = Field(default_factory=dict, description="Path to job ID of files ingested")
+    skipped: Dict[str, str] = Field(default_factory=dict, description="Path to earlier job ID of files already ingested")
+    failed: Dict[str, str] = Field(default_factory=dict, description="Path to error message of files that failed")
+    accepted: int = Field(0, description="Number of records accepted over all files")
+    rejected: int = Field(0, description="Number of records rejected over all files")
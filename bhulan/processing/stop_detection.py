@@ -0,0 +1,258 @@
+"""
+Streaming stop detection for GPS traces.
+
+Detects stops (clusters of consecutive points within a small radius) in a
+single pass with constant work per point, so a truck-day can be processed
+as a stream of legacy TruckPoints or canonical TrackPoints.
+"""
+
+import math
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from bhulan.models.canonical import TrackPoint
+
+
+EARTH_RADIUS_KM = 6373.0
+
+DEFAULT_CONSTRAINT_KM = 0.02
+DEFAULT_MIN_STOP_MINUTES = 10
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great-circle distance between two coordinates.
+
+    Args:
+        lat1: Latitude of the first point in decimal degrees
+        lon1: Longitude of the first point in decimal degrees
+        lat2: Latitude of the second point in decimal degrees
+        lon2: Longitude of the second point in decimal degrees
+
+    Returns:
+        Distance in kilometers
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_theta = math.radians(lon2 - lon1)
+
+    a = math.sin(d_phi / 2.0) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_theta / 2.0) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, max(0.0, a))))
+
+
+def datetime_duration_minutes(start: datetime, end: datetime) -> float:
+    """
+    Duration between two datetimes in minutes.
+
+    Args:
+        start: Start time
+        end: End time
+
+    Returns:
+        Elapsed minutes
+    """
+    return (end - start).total_seconds() / 60.0
+
+
+class DetectedStop:
+    """A closed cluster of points that lasted long enough to count as a stop."""
+
+    __slots__ = ['lat', 'lon', 'radius_km', 'start', 'end', 'duration_minutes', 'num_points']
+
+    def __init__(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        start: Any,
+        end: Any,
+        duration_minutes: float,
+        num_points: int
+    ):
+        """
+        Initialize detected stop.
+
+        Args:
+            lat: Centroid latitude
+            lon: Centroid longitude
+            radius_km: Upper bound on the cluster radius in kilometers
+            start: Earliest time value in the cluster
+            end: Latest time value in the cluster
+            duration_minutes: Stop duration in minutes
+            num_points: Number of points in the cluster
+        """
+        self.lat = lat
+        self.lon = lon
+        self.radius_km = radius_km
+        self.start = start
+        self.end = end
+        self.duration_minutes = duration_minutes
+        self.num_points = num_points
+
+    def __repr__(self) -> str:
+        return (f"DetectedStop(lat={self.lat}, lon={self.lon}, radius_km={self.radius_km}, "
+                f"start={self.start!r}, end={self.end!r}, num_points={self.num_points})")
+
+
+class StopDetector:
+    """
+    Incremental stop detector.
+
+    Each point is compared against the centroid of the open cluster. Points
+    within the constraint join the cluster; the first point outside it closes
+    the cluster and starts a new one. The centroid is kept as running sums and
+    the radius as a lat/lon bounding box, so every point costs O(1).
+    """
+
+    def __init__(
+        self,
+        constraint_km: float = DEFAULT_CONSTRAINT_KM,
+        min_stop_minutes: float = DEFAULT_MIN_STOP_MINUTES,
+        duration_func: Callable[[Any, Any], float] = datetime_duration_minutes
+    ):
+        """
+        Initialize stop detector.
+
+        Args:
+            constraint_km: Maximum distance from the cluster centroid in km
+            min_stop_minutes: Minimum cluster duration to be reported as a stop
+            duration_func: Computes minutes between the earliest and latest
+                time values of a cluster
+        """
+        self.constraint_km = constraint_km
+        self.min_stop_minutes = min_stop_minutes
+        self.duration_func = duration_func
+        self._reset()
+
+    def _reset(self) -> None:
+        """Clear the open cluster."""
+        self.count = 0
+        self.sum_lat = 0.0
+        self.sum_lon = 0.0
+        self.min_lat = self.max_lat = None
+        self.min_lon = self.max_lon = None
+        self.start = None
+        self.end = None
+
+    def _add(self, lat: float, lon: float, t: Any) -> None:
+        """Add a point to the open cluster."""
+        if self.count == 0:
+            self.min_lat = self.max_lat = lat
+            self.min_lon = self.max_lon = lon
+            self.start = self.end = t
+        else:
+            self.min_lat = min(self.min_lat, lat)
+            self.max_lat = max(self.max_lat, lat)
+            self.min_lon = min(self.min_lon, lon)
+            self.max_lon = max(self.max_lon, lon)
+            if t < self.start:
+                self.start = t
+            if t > self.end:
+                self.end = t
+
+        self.count += 1
+        self.sum_lat += lat
+        self.sum_lon += lon
+
+    def centroid(self) -> Optional[Tuple[float, float]]:
+        """
+        Centroid of the open cluster.
+
+        Returns:
+            (lat, lon) tuple or None if no cluster is open
+        """
+        if self.count == 0:
+            return None
+        return self.sum_lat / self.count, self.sum_lon / self.count
+
+    def _close(self) -> Optional[DetectedStop]:
+        """Close the open cluster, returning it if it qualifies as a stop."""
+        stop = None
+        if self.count > 1:
+            duration = self.duration_func(self.start, self.end)
+            if duration >= self.min_stop_minutes:
+                lat, lon = self.centroid()
+                # the bounding box diagonal bounds the cluster diameter
+                diameter = haversine_km(self.min_lat, self.min_lon, self.max_lat, self.max_lon)
+                stop = DetectedStop(
+                    lat=lat,
+                    lon=lon,
+                    radius_km=diameter / 2,
+                    start=self.start,
+                    end=self.end,
+                    duration_minutes=duration,
+                    num_points=self.count
+                )
+
+        self._reset()
+        return stop
+
+    def push(self, lat: float, lon: float, t: Any) -> Optional[DetectedStop]:
+        """
+        Feed the next point of the trace.
+
+        Args:
+            lat: Latitude in decimal degrees
+            lon: Longitude in decimal degrees
+            t: Time value (anything ordered that duration_func understands)
+
+        Returns:
+            The stop closed by this point, if any
+        """
+        stop = None
+        if self.count > 0:
+            c_lat, c_lon = self.centroid()
+            if haversine_km(c_lat, c_lon, lat, lon) >= self.constraint_km:
+                stop = self._close()
+
+        self._add(lat, lon, t)
+        return stop
+
+    def flush(self) -> Optional[DetectedStop]:
+        """
+        Close the open cluster at the end of the trace.
+
+        Returns:
+            The final stop, if any
+        """
+        return self._close()
+
+    def detect(self, points: Iterable[Tuple[float, float, Any]]) -> Iterator[DetectedStop]:
+        """
+        Detect stops in a stream of points.
+
+        Args:
+            points: Iterable of (lat, lon, time) tuples in trace order
+
+        Yields:
+            Stops as soon as their cluster closes
+        """
+        for lat, lon, t in points:
+            stop = self.push(lat, lon, t)
+            if stop is not None:
+                yield stop
+
+        stop = self.flush()
+        if stop is not None:
+            yield stop
+
+
+def detect_stops(
+    points: Iterable[TrackPoint],
+    constraint_km: float = DEFAULT_CONSTRAINT_KM,
+    min_stop_minutes: float = DEFAULT_MIN_STOP_MINUTES
+) -> Iterator[DetectedStop]:
+    """
+    Detect stops in a stream of canonical track points.
+
+    Args:
+        points: TrackPoints for one device, ordered by ts_utc
+        constraint_km: Maximum distance from the cluster centroid in km
+        min_stop_minutes: Minimum stop duration in minutes
+
+    Yields:
+        DetectedStop for each stop, as soon as it closes
+    """
+    detector = StopDetector(constraint_km, min_stop_minutes)
+    return detector.detect((p.lat, p.lon, p.ts_utc) for p in points)
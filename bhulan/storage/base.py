@@ -26,7 +26,7 @@ class TrackPointRepository(ABC):
         pass
     
     @abstractmethod
-    def exists(self, point_hash: str) -> bool:
+    def exists(self, point_hash: bytes) -> bool:
         """
         Check if a track point with given hash already exists.
         
@@ -128,3 +128,16 @@ class JobRegistry(ABC):
             Job document or None if not found
         """
         pass
+    
+    @abstractmethod
+    def find_job(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Find the most recently started job matching a query.
+        
+        Args:
+            query: MongoDB-style filter on job fields, e.g. params
+            
+        Returns:
+            Job document or None if no job matches
+        """
+        pass
@@ -0,0 +1,139 @@
+"""
+In-process deduplication of recently written track points.
+
+Devices resend points after reconnecting, so repositories remember the
+hashes of points they wrote recently and drop resends before any network
+round trip to MongoDB.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from bhulan.config.settings import settings
+
+
+HASH_SIZE = 16
+
+
+class RecentHashFilter:
+    """
+    Set of recently written point hashes that forgets the oldest over time.
+    
+    Hashes are kept in two generations. New hashes go into the current
+    one; once it holds half the capacity or is half the window old, it
+    becomes the previous generation and the older one is dropped. A hash is
+    therefore remembered until half the window has passed or half the
+    capacity of newer hashes has been added, at the least.
+    Unlike a bloom filter there are no false positives, so no new point is
+    ever dropped; each hash costs about 90 bytes.
+    
+    Safe to share between threads and repositories.
+    """
+    
+    def __init__(
+        self,
+        capacity: int = None,
+        window_seconds: float = None,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize hash filter.
+        
+        Args:
+            capacity: Most hashes remembered (defaults to settings)
+            window_seconds: Longest time a hash is remembered (defaults to settings)
+            path: File the hashes are saved to and loaded from on start
+            clock: Time source, in seconds
+        """
+        self.capacity = capacity or settings.DEDUP_CAPACITY
+        self.window_seconds = window_seconds or settings.DEDUP_WINDOW_SECONDS
+        self.path = path
+        self.clock = clock
+        self.lock = threading.Lock()
+        
+        self.current: Set[bytes] = set()
+        self.previous: Set[bytes] = set()
+        self.started = clock()
+        
+        if path and os.path.exists(path):
+            self.previous = self._read(path)
+    
+    def __len__(self) -> int:
+        return len(self.current) + len(self.previous)
+    
+    def __contains__(self, key: bytes) -> bool:
+        return key in self.current or key in self.previous
+    
+    def filter(self, docs: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Drop documents whose hash was written recently.
+        
+        Args:
+            docs: Track point documents with _hash
+            
+        Returns:
+            Tuple of (documents not seen recently, number dropped)
+        """
+        with self.lock:
+            self._rotate()
+            current, previous = self.current, self.previous
+            fresh = [doc for doc in docs if doc['_hash'] not in current and doc['_hash'] not in previous]
+        
+        return fresh, len(docs) - len(fresh)
+    
+    def add(self, keys: Iterable[bytes]) -> None:
+        """
+        Remember hashes of points that were written.
+        
+        Args:
+            keys: Point hashes
+        """
+        with self.lock:
+            self._rotate()
+            self.current.update(keys)
+    
+    def save(self) -> None:
+        """Write the remembered hashes to path, replacing the file atomically."""
+        if not self.path:
+            return
+        
+        with self.lock:
+            data = b''.join(self.previous | self.current)
+        
+        # a unique file per save, so filters saving to the same path at
+        # once, e.g. in several processes, never write into each other's
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    
+    def _rotate(self) -> None:
+        """Start a new generation when the current one is full or old."""
+        now = self.clock()
+        if len(self.current) < self.capacity / 2 and now - self.started < self.window_seconds / 2:
+            return
+        
+        if now - self.started >= self.window_seconds:
+            # nothing was added for half a window, so even the current
+            # generation is older than that
+            self.previous = set()
+        else:
+            self.previous = self.current
+        self.current = set()
+        self.started = now
+    
+    @staticmethod
+    def _read(path: str) -> Set[bytes]:
+        """Read hashes saved by save, ignoring a truncated tail."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        
+        end = len(data) - len(data) % HASH_SIZE
+        return {data[i:i + HASH_SIZE] for i in range(0, end, HASH_SIZE)}
@@ -4,28 +4,118 @@ MongoDB implementation of storage repositories.
 Provides concrete implementations for TrackPoint and Job storage using MongoDB.
 """
 
-from typing import List, Dict, Any, Optional
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Set
 from datetime import datetime
-from pymongo import MongoClient, ASCENDING, GEOSPHERE
-from pymongo.errors import DuplicateKeyError
-from bhulan.models.canonical import TrackPoint
+from bson import encode
+from bson.errors import InvalidDocument
+from pymongo import MongoClient, ASCENDING, GEOSPHERE, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from bhulan.models.canonical import TrackPoint, WriteResult, epoch_ms, point_hash
 from bhulan.storage.base import TrackPointRepository, JobRegistry
+from bhulan.storage.dedup import RecentHashFilter
 from bhulan.config.settings import settings
+from bhulan.core.metrics import SIZE_BUCKETS, Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+
+WRITE_SECONDS = Histogram(
+    'bhulan_write_seconds',
+    'Time to write a batch of track points'
+)
+WRITE_BATCH_SIZE = Histogram(
+    'bhulan_write_batch_size',
+    'Track points per batch written',
+    buckets=SIZE_BUCKETS
+)
+POINTS_WRITTEN = Counter(
+    'bhulan_points_written_total',
+    'Track points written, by whether they were inserted, modified or duplicates',
+    ['result']
+)
+
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _raise_on_write_errors(error: BulkWriteError) -> int:
+    """
+    Count duplicate key errors in a failed bulk write.
+    
+    Args:
+        error: Error raised by an unordered bulk write
+        
+    Returns:
+        Number of operations rejected by the unique _hash index
+        
+    Raises:
+        BulkWriteError: If any operation failed for another reason
+    """
+    write_errors = error.details.get('writeErrors', [])
+    if any(e.get('code') != DUPLICATE_KEY_ERROR for e in write_errors):
+        raise error
+    return len(write_errors)
+
+
+def point_documents(points: List[TrackPoint]) -> List[Dict[str, Any]]:
+    """
+    Build the stored documents for track points.
+    
+    Args:
+        points: List of TrackPoint objects
+        
+    Returns:
+        Documents from to_mongo_doc with the point hash as _hash
+    """
+    docs = []
+    for point in points:
+        doc = point.to_mongo_doc()
+        doc['_hash'] = point.compute_hash()
+        docs.append(doc)
+    
+    return docs
 
 
 class MongoTrackPointRepository(TrackPointRepository):
     """MongoDB implementation of TrackPoint repository."""
     
-    def __init__(self, mongo_uri: str = None, db_name: str = None):
+    def __init__(
+        self,
+        mongo_uri: str = None,
+        db_name: str = None,
+        chunk_size: int = None,
+        insert_only: bool = None,
+        dedup: bool = None,
+        dedup_filter: Optional[RecentHashFilter] = None
+    ):
         """
         Initialize MongoDB connection.
         
         Args:
             mongo_uri: MongoDB connection URI (defaults to settings)
             db_name: Database name (defaults to settings)
+            chunk_size: Operations per bulk write (defaults to settings)
+            insert_only: Insert new points only and let the unique _hash
+                index drop duplicates instead of upserting (defaults to settings)
+            dedup: Drop points this repository wrote recently before
+                writing, counting them as duplicates (defaults to settings)
+            dedup_filter: Recent hashes, e.g. shared between repositories
+                (created from settings if not provided)
         """
         self.mongo_uri = mongo_uri or settings.MONGO_URI
         self.db_name = db_name or settings.MONGO_DB_NAME
+        self.chunk_size = chunk_size or settings.MONGO_BULK_CHUNK_SIZE
+        self.insert_only = settings.MONGO_INSERT_ONLY if insert_only is None else insert_only
+        if dedup is None:
+            dedup = settings.DEDUP_ENABLED
+        if dedup and dedup_filter is None:
+            dedup_filter = RecentHashFilter(path=settings.DEDUP_STATE_PATH)
+        self.dedup_filter = dedup_filter if dedup else None
         self.client = MongoClient(self.mongo_uri)
         self.db = self.client[self.db_name]
         self.collection = self.db['track_points']
@@ -42,28 +132,108 @@ class MongoTrackPointRepository(TrackPointRepository):
         Returns:
             Number of points successfully inserted/updated
         """
-        if not points:
-            return 0
+        return self.write_batch(points).written
+    
+    def write_batch(self, points: List[TrackPoint]) -> WriteResult:
+        """
+        Write a batch of track points with unordered bulk writes.
+        
+        Points are sent in chunks of chunk_size operations. Points repeated
+        within a chunk are written once (the last one wins, as with
+        sequential upserts).
         
-        inserted_count = 0
-        for point in points:
-            doc = point.to_mongo_doc()
-            doc['_hash'] = point.compute_hash()
+        Args:
+            points: List of TrackPoint objects to persist
             
-            try:
-                result = self.collection.update_one(
-                    {'_hash': doc['_hash']},
-                    {'$set': doc},
-                    upsert=True
-                )
-                if result.upserted_id or result.modified_count > 0:
-                    inserted_count += 1
-            except DuplicateKeyError:
-                pass
+        Returns:
+            Inserted, modified and duplicate counts from the bulk results
+        """
+        return self.write_documents(point_documents(points))
+    
+    def write_documents(self, docs: List[Dict[str, Any]]) -> WriteResult:
+        """
+        Write track point documents with unordered bulk writes.
+        
+        Same as write_batch for documents already built with to_mongo_doc
+        and a _hash, e.g. by normalize_frame. With dedup, points written
+        recently are dropped first, without a round trip.
+        
+        Args:
+            docs: Track point documents with _hash
+            
+        Returns:
+            Inserted, modified and duplicate counts from the bulk results
+        """
+        started = time.perf_counter()
+        WRITE_BATCH_SIZE.observe(len(docs))
+        
+        result = WriteResult()
+        if self.dedup_filter is not None:
+            docs, result.duplicates = self.dedup_filter.filter(docs)
         
-        return inserted_count
+        for start in range(0, len(docs), self.chunk_size):
+            chunk = self._chunk_docs(docs[start:start + self.chunk_size], result)
+            if self.insert_only:
+                self._insert_chunk(chunk, result)
+            else:
+                self._upsert_chunk(chunk, result)
+            
+            # only once written, so points of a failed write can be retried
+            if self.dedup_filter is not None:
+                self.dedup_filter.add(doc['_hash'] for doc in chunk)
+        
+        WRITE_SECONDS.observe(time.perf_counter() - started)
+        POINTS_WRITTEN.labels('inserted').inc(result.inserted)
+        POINTS_WRITTEN.labels('modified').inc(result.modified)
+        POINTS_WRITTEN.labels('duplicate').inc(result.duplicates)
+        return result
+    
+    def _chunk_docs(self, docs: List[Dict[str, Any]], result: WriteResult) -> List[Dict[str, Any]]:
+        """Keep one document per distinct hash, counting repeats as duplicates."""
+        unique = {}
+        for doc in docs:
+            if doc['_hash'] in unique:
+                result.duplicates += 1
+            unique[doc['_hash']] = doc
+        
+        return list(unique.values())
+    
+    def _upsert_chunk(self, docs: List[Dict[str, Any]], result: WriteResult) -> None:
+        """Upsert documents by hash in one unordered bulk write."""
+        operations = [
+            UpdateOne({'_hash': doc['_hash']}, {'$set': doc}, upsert=True)
+            for doc in docs
+        ]
+        
+        rejected = 0
+        try:
+            counts = self.collection.bulk_write(operations, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            # concurrent writers can race to upsert the same new hash
+            rejected = _raise_on_write_errors(e)
+            counts = e.details
+        
+        result.inserted += counts.get('nUpserted', 0)
+        result.modified += counts.get('nModified', 0)
+        result.duplicates += rejected + counts.get('nMatched', 0) - counts.get('nModified', 0)
+    
+    def _insert_chunk(self, docs: List[Dict[str, Any]], result: WriteResult) -> None:
+        """Insert documents, relying on the unique _hash index to drop duplicates."""
+        try:
+            inserted = len(self.collection.insert_many(docs, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            result.duplicates += _raise_on_write_errors(e)
+            inserted = e.details.get('nInserted', 0)
+        
+        result.inserted += inserted
+    
+    def close(self) -> None:
+        """Save the recent hashes, if configured to persist, and close the connection."""
+        if self.dedup_filter is not None:
+            self.dedup_filter.save()
+        self.client.close()
     
-    def exists(self, point_hash: str) -> bool:
+    def exists(self, point_hash: bytes) -> bool:
         """
         Check if a track point with given hash already exists.
         
@@ -75,6 +245,63 @@ class MongoTrackPointRepository(TrackPointRepository):
         """
         return self.collection.count_documents({'_hash': point_hash}, limit=1) > 0
     
+    def has_legacy_hashes(self) -> bool:
+        """Check if any point is still stored with the hex SHA-256 _hash of earlier versions."""
+        return self.collection.find_one({'_hash': {'$type': 'string'}}, {'_id': 1}) is not None
+    
+    def migrate_hashes(self, batch_size: int = None) -> Dict[str, int]:
+        """
+        Rekey points stored with the hex SHA-256 _hash of earlier versions.
+        
+        Each point gets the point_hash of its stored device, timestamp and
+        coordinates. A point already stored under its new key, e.g. written
+        again since the upgrade, is a duplicate and its old copy is
+        deleted, so the migration can run while points are being written
+        and can be run again.
+        
+        Args:
+            batch_size: Points rekeyed per bulk write (defaults to chunk_size)
+            
+        Returns:
+            Number of points rekeyed and of old duplicates removed
+        """
+        batch_size = batch_size or self.chunk_size
+        counts = {'rekeyed': 0, 'removed': 0}
+        cursor = self.collection.find(
+            {'_hash': {'$type': 'string'}},
+            {'device_id': 1, 'ts_utc': 1, 'lat': 1, 'lon': 1}
+        ).batch_size(batch_size)
+        
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                self._rekey(batch, counts)
+                batch = []
+        if batch:
+            self._rekey(batch, counts)
+        
+        return counts
+    
+    def _rekey(self, docs: List[Dict[str, Any]], counts: Dict[str, int]) -> None:
+        """Set the new _hash of old documents, deleting those already stored under it."""
+        operations = [
+            UpdateOne(
+                {'_id': doc['_id']},
+                {'$set': {'_hash': point_hash(doc['device_id'], epoch_ms(doc['ts_utc']), doc['lat'], doc['lon'])}}
+            )
+            for doc in docs
+        ]
+        
+        try:
+            counts['rekeyed'] += self.collection.bulk_write(operations, ordered=False).bulk_api_result['nModified']
+        except BulkWriteError as e:
+            _raise_on_write_errors(e)
+            duplicates = [docs[error['index']]['_id'] for error in e.details['writeErrors']]
+            self.collection.delete_many({'_id': {'$in': duplicates}})
+            counts['rekeyed'] += e.details.get('nModified', 0)
+            counts['removed'] += len(duplicates)
+    
     def create_indexes(self) -> None:
         """Create necessary indexes for efficient querying."""
         self.collection.create_index('_hash', unique=True)
@@ -128,23 +355,55 @@ class MongoTrackPointRepository(TrackPointRepository):
 
 
 class MongoJobRegistry(JobRegistry):
-    """MongoDB implementation of job registry."""
+    """
+    MongoDB implementation of job registry.
+    
+    When buffered, jobs are kept in memory and written by a background
+    thread every flush_seconds, all changed jobs in one bulk write, so a
+    job created and finished between flushes costs a single upsert. Jobs
+    therefore reach MongoDB up to flush_seconds late and are lost if the
+    process dies before close. get_job serves recent jobs from memory.
+    """
     
-    def __init__(self, mongo_uri: str = None, db_name: str = None):
+    def __init__(
+        self,
+        mongo_uri: str = None,
+        db_name: str = None,
+        buffered: bool = False,
+        flush_seconds: float = None,
+        cache_size: int = None
+    ):
         """
         Initialize MongoDB connection.
         
         Args:
             mongo_uri: MongoDB connection URI (defaults to settings)
             db_name: Database name (defaults to settings)
+            buffered: Coalesce job writes in memory and flush them periodically
+            flush_seconds: Time between flushes when buffered (defaults to settings)
+            cache_size: Recent jobs kept in memory when buffered (defaults to settings)
         """
         self.mongo_uri = mongo_uri or settings.MONGO_URI
         self.db_name = db_name or settings.MONGO_DB_NAME
+        self.buffered = buffered
+        self.flush_seconds = flush_seconds or settings.JOB_FLUSH_SECONDS
+        self.cache_size = cache_size or settings.JOB_CACHE_SIZE
         self.client = MongoClient(self.mongo_uri)
         self.db = self.client[self.db_name]
         self.collection = self.db['ingest_jobs']
         
+        self.jobs: OrderedDict = OrderedDict()
+        self.dirty: Set[str] = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.flusher: Optional[threading.Thread] = None
+        
         self.collection.create_index('ingest_id', unique=True)
+        self.collection.create_index([('params.sha256', 1), ('started_at', -1)], sparse=True)
+        self.collection.create_index(
+            [('params.file_path', 1), ('params.size', 1), ('params.mtime', 1), ('started_at', -1)],
+            sparse=True
+        )
     
     def create_job(
         self, 
@@ -174,7 +433,19 @@ class MongoJobRegistry(JobRegistry):
             },
             'error_sample': {}
         }
-        self.collection.insert_one(job_doc)
+        
+        if not self.buffered:
+            self.collection.insert_one(job_doc)
+            return
+        
+        with self.lock:
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush_periodically, name="job-flusher", daemon=True)
+                self.flusher.start()
+            self.jobs[ingest_id] = job_doc
+            self.jobs.move_to_end(ingest_id)
+            self.dirty.add(ingest_id)
+            self._evict()
     
     def update_job_status(
         self, 
@@ -190,7 +461,8 @@ class MongoJobRegistry(JobRegistry):
             ingest_id: Job identifier
             status: Status (running/succeeded/failed/partial)
             stats: Statistics (read, accepted, rejected counts)
-            error_sample: Sample of errors encountered
+            error_sample: Sample of errors encountered, keyed by record
+                index; keys are stored as strings, as BSON requires
         """
         update_doc = {
             'status': status,
@@ -201,8 +473,17 @@ class MongoJobRegistry(JobRegistry):
             update_doc['stats'] = stats
         
         if error_sample:
-            update_doc['error_sample'] = error_sample
+            update_doc['error_sample'] = {str(k): v for k, v in error_sample.items()}
+        
+        with self.lock:
+            job = self.jobs.get(ingest_id)
+            if job is not None:
+                job.update(update_doc)
+                self.jobs.move_to_end(ingest_id)
+                self.dirty.add(ingest_id)
+                return
         
+        # not created or no longer cached here
         self.collection.update_one(
             {'ingest_id': ingest_id},
             {'$set': update_doc}
@@ -218,4 +499,90 @@ class MongoJobRegistry(JobRegistry):
         Returns:
             Job document or None if not found
         """
+        with self.lock:
+            job = self.jobs.get(ingest_id)
+            if job is not None:
+                return copy.deepcopy(job)
+        
         return self.collection.find_one({'ingest_id': ingest_id}, {'_id': 0})
+    
+    def find_job(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Find the most recently started job matching a query.
+        
+        Buffered jobs are flushed first, so they are found too.
+        
+        Args:
+            query: MongoDB filter on job fields, e.g. params
+            
+        Returns:
+            Job document or None if no job matches
+        """
+        self.flush()
+        return self.collection.find_one(query, {'_id': 0}, sort=[('started_at', -1)])
+    
+    def flush(self) -> int:
+        """
+        Write buffered job changes in one bulk write.
+        
+        Returns:
+            Number of jobs written
+        """
+        with self.lock:
+            ids = list(self.dirty)
+            docs = [copy.deepcopy(self.jobs[ingest_id]) for ingest_id in ids]
+            self.dirty.clear()
+        
+        # a job MongoDB would reject is dropped, not retried with the batch
+        writable = []
+        for doc in docs:
+            try:
+                encode(doc)
+            except (InvalidDocument, OverflowError) as e:
+                logger.error(f"Dropped unwritable job {doc['ingest_id']}: {str(e)}")
+                ids.remove(doc['ingest_id'])
+                continue
+            writable.append(doc)
+        docs = writable
+        
+        if not docs:
+            return 0
+        
+        try:
+            self.collection.bulk_write(
+                [ReplaceOne({'ingest_id': doc['ingest_id']}, doc, upsert=True) for doc in docs],
+                ordered=False
+            )
+        except Exception:
+            # written again by the next flush
+            with self.lock:
+                self.dirty.update(ids)
+            raise
+        
+        return len(docs)
+    
+    def close(self) -> None:
+        """Stop the background flushes, write buffered jobs and close the connection."""
+        self.stopped.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.flush()
+        self.client.close()
+    
+    def _flush_periodically(self) -> None:
+        """Flush every flush_seconds until closed."""
+        while not self.stopped.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush job registry: {str(e)}")
+    
+    def _evict(self) -> None:
+        """Drop the least recently used written jobs beyond cache_size."""
+        excess = len(self.jobs) - self.cache_size
+        for ingest_id in list(self.jobs):
+            if excess <= 0:
+                break
+            if ingest_id not in self.dirty:
+                del self.jobs[ingest_id]
+                excess -= 1
@@ -60,6 +60,24 @@ class TruckPoint(DBItem):
         self.item[TIMESTAMP_KEY] = self.timestamp
         super(TruckPoint, self).save(TruckPoint.tblKey)
 
+    # batch writes of points drop the availability index aggregated from
+    # them, so getAvailabilityIndex rebuilds it instead of reading it stale;
+    # single-point save and saveItem leave it, so callers writing points one
+    # at a time delete TruckDateStats once when they are done
+    @classmethod
+    def saveItems(cls, items, db, delete=False):
+        items = super(TruckPoint, cls).saveItems(items, db, delete)
+        TruckDateStats.deleteItems(db)
+
+        return items
+
+    @classmethod
+    def deleteItems(cls, db):
+        super(TruckPoint, cls).deleteItems(db)
+        TruckDateStats.deleteItems(db)
+
+        return True
+
 
 def getLatLon(self):
     return self.point.getLatLon()
@@ -119,6 +137,54 @@ class TruckDates(DBItem):
         self.item[ROUTE_CENTERS_KEY] = self.routeCenters
         super(TruckDates, self).save(TruckDates.tblKey)
 
+# one row per truck and date that has points, see computeAvailabilityIndex
+class TruckDateStats(DBItem):
+    tblKey = TRUCK_DATE_STATS_KEY
+
+    __slots__ = [TRUCK_ID_KEY, DATE_NUM_KEY, COUNT_KEY, MIN_TIME_KEY, MAX_TIME_KEY, LAT_KEY, LON_KEY]
+
+    def __init__(self, item, db):
+        DBItem.__init__(self, item, db)
+        self.truckId = item[TRUCK_ID_KEY]
+        self.dateNum = item[DATE_NUM_KEY]
+        self.count = item[COUNT_KEY]
+        self.minTime = item[MIN_TIME_KEY]
+        self.maxTime = item[MAX_TIME_KEY]
+        self.lat = item[LAT_KEY]
+        self.lon = item[LON_KEY]
+
+    def save(self):
+        self.item[TRUCK_ID_KEY] = self.truckId
+        self.item[DATE_NUM_KEY] = self.dateNum
+        self.item[COUNT_KEY] = self.count
+        self.item[MIN_TIME_KEY] = self.minTime
+        self.item[MAX_TIME_KEY] = self.maxTime
+        self.item[LAT_KEY] = self.lat
+        self.item[LON_KEY] = self.lon
+        super(TruckDateStats, self).save(TruckDateStats.tblKey)
+
+# reverse geocoded address for a rounded lat/lon, see geocode.py
+class GeoAddress(DBItem):
+    tblKey = GEO_CACHE_KEY
+
+    __slots__ = [KEY, LAT_KEY, LON_KEY, ADDRESS_KEY, CACHED_AT_KEY]
+
+    def __init__(self, item, db):
+        DBItem.__init__(self, item, db)
+        self.key = item[KEY]
+        self.lat = item[LAT_KEY]
+        self.lon = item[LON_KEY]
+        self.address = item[ADDRESS_KEY]
+        self.cachedAt = item[CACHED_AT_KEY]
+
+    def save(self):
+        self.item[KEY] = self.key
+        self.item[LAT_KEY] = self.lat
+        self.item[LON_KEY] = self.lon
+        self.item[ADDRESS_KEY] = self.address
+        self.item[CACHED_AT_KEY] = self.cachedAt
+        super(GeoAddress, self).save(GeoAddress.tblKey)
+
 class Stop(DBItem):
     tblKey = STOPS_KEY
 
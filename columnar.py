@@ -0,0 +1,212 @@
+from array import array
+from collections import OrderedDict
+import numpy as np
+from constants import *
+from classes import TruckPoint
+
+FLOAT_COLUMN = "float"
+INT_COLUMN = "int"
+TIME_COLUMN = "time"
+CATEGORY_COLUMN = "category"
+TEXT_COLUMN = "text"
+
+# how each TruckPoint field is stored.
+# float/int: one number per point (missing floats are nan)
+# time: "HH:MM:SS" clock times as seconds since midnight
+# category: repeated strings (truck ids, patents, communes) as int codes
+#   into a list of distinct values
+# text: anything else, kept as python objects
+TRUCK_POINT_COLUMNS = OrderedDict([
+    (TRUCK_ID_KEY, CATEGORY_COLUMN),
+    (DATE_NUM_KEY, INT_COLUMN),
+    (TIME_KEY, TIME_COLUMN),
+    (LAT_KEY, FLOAT_COLUMN),
+    (LON_KEY, FLOAT_COLUMN),
+    (VELOCITY_KEY, FLOAT_COLUMN),
+    (DIRECTION_KEY, FLOAT_COLUMN),
+    (TEMPERATURE_KEY, FLOAT_COLUMN),
+    (PATENT_KEY, CATEGORY_COLUMN),
+    (COMMUNE_KEY, CATEGORY_COLUMN),
+    (TIMESTAMP_KEY, TEXT_COLUMN),
+])
+
+# what stop detection and the distance/time metrics need
+TRACK_FIELDS = [TRUCK_ID_KEY, DATE_NUM_KEY, TIME_KEY, LAT_KEY, LON_KEY]
+
+ARRAY_TYPECODES = {FLOAT_COLUMN: 'd', INT_COLUMN: 'q', TIME_COLUMN: 'l', CATEGORY_COLUMN: 'l'}
+NUMPY_TYPES = {FLOAT_COLUMN: np.float64, INT_COLUMN: np.int64, TIME_COLUMN: np.int32,
+               CATEGORY_COLUMN: np.int32}
+
+def parseClockSeconds(time):
+    t = time.split(":")
+    return int(t[0]) * 3600 + int(t[1]) * 60 + int(float(t[2]))
+
+def formatClockSeconds(seconds):
+    seconds = int(seconds)
+    return "%02d:%02d:%02d" % (seconds // 3600, (seconds // 60) % 60, seconds % 60)
+
+################ Begin Columnar Truck Points ################
+
+# read only view of one point of a TruckPointColumns. exposes the same
+# attributes as a TruckPoint (truckId, time, lat, ...) for the loaded fields
+class TruckPointRow(object):
+    __slots__ = ['columns', 'index']
+
+    def __init__(self, columns, index):
+        self.columns = columns
+        self.index = index
+
+    def __getattr__(self, key):
+        if key not in self.columns.data:
+            raise AttributeError(key)
+        return self.columns.getValue(key, self.index)
+
+    def getItem(self):
+        return {key: self.columns.getValue(key, self.index) for key in self.columns.data}
+
+    def __repr__(self):
+        return "TruckPointRow(%r)" % self.getItem()
+
+
+# truck points stored column by column, one numpy array per field, instead
+# of one TruckPoint (with its mongo dict and Point) per ping. indexing with
+# an int gives a TruckPointRow, with a slice, index array or boolean mask a
+# new TruckPointColumns.
+class TruckPointColumns(object):
+    def __init__(self, data, categories):
+        # data maps field -> numpy array, categories maps category
+        # field -> list of distinct values (shared between subsets)
+        self.data = data
+        self.categories = categories
+
+    @classmethod
+    def fromCursor(cls, cursor, fields=None):
+        if fields is None:
+            fields = list(TRUCK_POINT_COLUMNS.keys())
+
+        kinds = [(key, TRUCK_POINT_COLUMNS[key]) for key in fields]
+        buffers = {}
+        codes = {}
+        for key, kind in kinds:
+            buffers[key] = [] if kind == TEXT_COLUMN else array(ARRAY_TYPECODES[kind])
+            if kind == CATEGORY_COLUMN:
+                codes[key] = {}
+
+        # values are appended to compact array.arrays while the cursor is
+        # read, so no per point object outlives its mongo document
+        for item in cursor:
+            for key, kind in kinds:
+                value = item.get(key)
+                if kind == FLOAT_COLUMN:
+                    buffers[key].append(float('nan') if value is None else value)
+                elif kind == CATEGORY_COLUMN:
+                    keyCodes = codes[key]
+                    code = keyCodes.get(value)
+                    if code is None:
+                        code = keyCodes[value] = len(keyCodes)
+                    buffers[key].append(code)
+                elif kind == TIME_COLUMN:
+                    buffers[key].append(parseClockSeconds(value))
+                else:
+                    buffers[key].append(value)
+
+        data = OrderedDict()
+        for key, kind in kinds:
+            if kind == TEXT_COLUMN:
+                column = np.empty(len(buffers[key]), dtype=object)
+                column[:] = buffers[key]
+            else:
+                column = np.array(buffers[key], dtype=NUMPY_TYPES[kind])
+            data[key] = column
+
+        categories = {key: list(keyCodes.keys()) for key, keyCodes in codes.items()}
+        return cls(data, categories)
+
+    # loads the points matching query, reading only the given fields
+    @classmethod
+    def load(cls, query, db, fields=TRACK_FIELDS):
+        if fields is None:
+            fields = list(TRUCK_POINT_COLUMNS.keys())
+        projection = {key: 1 for key in fields}
+        projection[MONGO_ID_KEY] = 0
+
+        cursor = TruckPoint.getTbl(db).find(query, projection)
+        return cls.fromCursor(cursor, fields)
+
+    def __len__(self):
+        for column in self.data.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError(index)
+            return TruckPointRow(self, index)
+
+        data = OrderedDict((key, column[index]) for key, column in self.data.items())
+        return TruckPointColumns(data, self.categories)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield TruckPointRow(self, i)
+
+    def getValue(self, key, index):
+        kind = TRUCK_POINT_COLUMNS[key]
+        value = self.data[key][index]
+        if kind == CATEGORY_COLUMN:
+            return self.categories[key][value]
+        if kind == TIME_COLUMN:
+            return formatClockSeconds(value)
+        if kind == TEXT_COLUMN:
+            return value
+        return value.item()
+
+    # decoded values of a field as a list
+    def getValues(self, key):
+        kind = TRUCK_POINT_COLUMNS[key]
+        column = self.data[key]
+        if kind == CATEGORY_COLUMN:
+            values = self.categories[key]
+            return [values[code] for code in column]
+        if kind == TIME_COLUMN:
+            return [formatClockSeconds(s) for s in column]
+        return column.tolist()
+
+    @property
+    def lats(self):
+        return self.data[LAT_KEY]
+
+    @property
+    def lons(self):
+        return self.data[LON_KEY]
+
+    # clock times in seconds since midnight
+    @property
+    def seconds(self):
+        return self.data[TIME_KEY]
+
+    # splits the points by a category field, e.g. truckId, keeping the
+    # original order within each group and the order of first appearance
+    # between groups
+    def groupBy(self, key):
+        codes = self.data[key]
+        values = self.categories[key]
+        order = np.argsort(codes, kind='stable')
+        sortedCodes = codes[order]
+        bounds = np.flatnonzero(np.diff(sortedCodes)) + 1
+
+        groups = {}
+        for chunk in np.split(order, bounds):
+            if len(chunk):
+                groups[chunk[0]] = (values[codes[chunk[0]]], self[chunk])
+
+        return OrderedDict(groups[first] for first in sorted(groups))
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.data.values())
+
+################ End Columnar Truck Points ################
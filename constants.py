@@ -29,6 +29,10 @@ POINT_KEY = "point"
 AVAILABILITY_KEY = "availability"
 TRUCK_DATES_KEY = "truckDates"
 ROUTE_CENTERS_KEY = "routeCenters"
+TRUCK_DATE_STATS_KEY = "truckDateStats"
+COUNT_KEY = "count"
+MIN_TIME_KEY = "minTime"
+MAX_TIME_KEY = "maxTime"
 CHILE_DATA_DB_KEY = "chileData"
 CHILE_MAP_DB_KEY = "chileMap"
 WATTS_DATA_DB_KEY = "wattsData"
@@ -125,6 +129,8 @@ STATE_KEY = "state"
 TEST_EDGES_KEY = "testEdges"
 TEST_NODES_KEY = "testNodes"
 ADDRESS_KEY = "address"
+GEO_CACHE_KEY = "geoCache"
+CACHED_AT_KEY = "cachedAt"
 
 STOPS_KEY = "stops"
 STOP_PROPS_KEY = "stopProps"
@@ -0,0 +1,271 @@
+import time
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from constants import *
+from init import (GEOCODE_PRECISION, GEOCODE_CACHE_SIZE, GEOCODE_TTL_DAYS, GEOCODE_DB,
+                  GEOCODE_RATE, GEOCODE_BURST, GEOCODE_WORKERS, GEOCODE_USER_AGENT, GEOCODE_TIMEOUT)
+from classes import GeoAddress
+
+SECONDS_PER_DAY = 86400
+
+################ Begin Geocoding Providers ################
+
+# a provider turns one lat/lon into an address string, or None if the
+# service has no address for it. GeoCoder only calls a provider for
+# coordinates that are not cached, possibly from several threads at once.
+class GeoProvider(ABC):
+    @abstractmethod
+    def reverse(self, lat, lon):
+        pass
+
+
+# the public OpenStreetMap Nominatim service. one client is shared by
+# every lookup
+class NominatimProvider(GeoProvider):
+    def __init__(self, userAgent=GEOCODE_USER_AGENT, timeout=GEOCODE_TIMEOUT):
+        self.userAgent = userAgent
+        self.timeout = timeout
+        self.geolocator = None
+        self.lock = threading.Lock()
+
+    def reverse(self, lat, lon):
+        with self.lock:
+            if self.geolocator is None:
+                from geopy.geocoders import Nominatim
+                self.geolocator = Nominatim(user_agent=self.userAgent)
+
+        coords = str(lat) + "," + str(lon)
+        location = self.geolocator.reverse(coords, timeout=self.timeout)
+        if location is None:
+            return None
+        return location.address
+
+
+# offline provider for tests and for machines without network access.
+# addresses maps (lat, lon) tuples, as passed to reverse, to addresses
+class OfflineProvider(GeoProvider):
+    def __init__(self, addresses=None, default=None):
+        self.addresses = addresses if addresses is not None else {}
+        self.default = default
+
+    def reverse(self, lat, lon):
+        return self.addresses.get((lat, lon), self.default)
+
+################ End Geocoding Providers ################
+
+################ Begin Geocoding Caches ################
+
+# token bucket shared by the lookup threads. it refills at rate tokens per
+# second up to capacity, and every call takes one token, sleeping until it
+# is available. a rate of None or 0 disables the limit
+class TokenBucket(object):
+    def __init__(self, rate, capacity=1, clock=time.time, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(capacity)
+        self.last = None
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+
+        with self.lock:
+            now = self.clock()
+            if self.last is not None:
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            # a negative balance reserves a future token for this caller,
+            # so waiting threads are released one per 1/rate seconds
+            self.tokens -= 1
+            delay = -self.tokens / self.rate
+
+        if delay > 0:
+            self.sleep(delay)
+
+
+# least recently used in-memory cache of key -> (address, cachedAt).
+# entries older than ttl seconds are treated as missing
+class MemoryCache(object):
+    def __init__(self, maxSize, ttl):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+
+    def get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[1] > self.ttl:
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, address, cachedAt):
+        self.entries[key] = (address, cachedAt)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# persistent cache in the geoCache collection, shared by every process and
+# run that uses the same db
+class MongoCache(object):
+    def __init__(self, db, ttl):
+        self.db = db
+        self.ttl = ttl
+
+    # returns key -> (address, cachedAt) for the keys that are stored and
+    # not expired, using one query
+    def getMany(self, keys, now):
+        if not keys:
+            return {}
+
+        found = {}
+        for item in GeoAddress.find({KEY: {'$in': list(keys)}}, self.db):
+            if now - item.cachedAt <= self.ttl:
+                found[item.key] = (item.address, item.cachedAt)
+        return found
+
+    # entries is a list of (key, lat, lon, address). replaces stored entries
+    # for the same keys
+    def putMany(self, entries, cachedAt):
+        if not entries:
+            return
+
+        tbl = GeoAddress.getTbl(self.db)
+        tbl.remove({KEY: {'$in': [entry[0] for entry in entries]}})
+        tbl.insert([{KEY: key, LAT_KEY: lat, LON_KEY: lon, ADDRESS_KEY: address, CACHED_AT_KEY: cachedAt}
+                    for key, lat, lon, address in entries])
+
+    # deletes entries older than the ttl
+    def purge(self, now):
+        GeoAddress.getTbl(self.db).remove({CACHED_AT_KEY: {'$lt': now - self.ttl}})
+
+################ End Geocoding Caches ################
+
+################ Begin Reverse Geocoder ################
+
+# reverse geocoder with an in-memory LRU cache in front of the persistent
+# geoCache collection. coordinates are rounded to precision decimals, so
+# stops a few meters apart share one lookup, and only keys missing from
+# both caches reach the provider, from up to workers threads sharing one
+# token bucket.
+class GeoCoder(object):
+    def __init__(self, provider=None, db=GEOCODE_DB, precision=GEOCODE_PRECISION,
+                 cacheSize=GEOCODE_CACHE_SIZE, ttlDays=GEOCODE_TTL_DAYS,
+                 rate=GEOCODE_RATE, burst=GEOCODE_BURST, workers=GEOCODE_WORKERS,
+                 clock=time.time, sleep=time.sleep):
+        ttl = ttlDays * SECONDS_PER_DAY
+        self.provider = provider if provider is not None else NominatimProvider()
+        self.precision = precision
+        self.clock = clock
+        self.memory = MemoryCache(cacheSize, ttl)
+        # db=None keeps the cache in memory only
+        self.store = MongoCache(db, ttl) if db is not None else None
+        self.bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep)
+        self.workers = workers
+
+    def getCoords(self, lat, lon):
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+
+    def getKey(self, lat, lon):
+        lat, lon = self.getCoords(lat, lon)
+        return "%.*f,%.*f" % (self.precision, lat, self.precision, lon)
+
+    def reverse(self, lat, lon):
+        return self.reverseMany([(lat, lon)])[0]
+
+    def fetch(self, item):
+        key, (lat, lon) = item
+        self.bucket.acquire()
+        return key, lat, lon, self.provider.reverse(lat, lon)
+
+    # calls the provider for every (key, (lat, lon)) item, in a thread pool
+    # when there is more than one, yielding results in item order
+    def fetchAll(self, items):
+        if self.workers > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as pool:
+                for result in pool.map(self.fetch, items):
+                    yield result
+        else:
+            for item in items:
+                yield self.fetch(item)
+
+    # returns the address for every (lat, lon) in latLons, in order.
+    # duplicate keys are resolved once and the persistent cache is read and
+    # written in one batch each
+    def reverseMany(self, latLons):
+        now = self.clock()
+        keys = [self.getKey(lat, lon) for lat, lon in latLons]
+
+        addresses = {}
+        missing = OrderedDict()
+        for key, (lat, lon) in zip(keys, latLons):
+            if key in addresses or key in missing:
+                continue
+            entry = self.memory.get(key, now)
+            if entry is not None:
+                addresses[key] = entry[0]
+            else:
+                missing[key] = self.getCoords(lat, lon)
+
+        if missing and self.store is not None:
+            for key, entry in self.store.getMany(missing.keys(), now).items():
+                self.memory.put(key, entry[0], entry[1])
+                addresses[key] = entry[0]
+                del missing[key]
+
+        fetched = []
+        try:
+            for key, lat, lon, address in self.fetchAll(list(missing.items())):
+                addresses[key] = address
+                # no address is not cached so that it is retried next time
+                if address is not None:
+                    self.memory.put(key, address, now)
+                    fetched.append((key, lat, lon, address))
+        finally:
+            # keep what was fetched even if the provider fails part way
+            if self.store is not None:
+                self.store.putMany(fetched, now)
+
+        return [addresses[key] for key in keys]
+
+    def purge(self):
+        if self.store is not None:
+            self.store.purge(self.clock())
+
+    def clear(self):
+        self.memory.clear()
+
+################ End Reverse Geocoder ################
+
+geoCoder = None
+
+# shared geocoder used by util.revGeoCode, created on first use
+def getGeoCoder():
+    global geoCoder
+    if geoCoder is None:
+        geoCoder = GeoCoder()
+    return geoCoder
+
+# replaces the shared geocoder, e.g. with one using an OfflineProvider
+def setGeoCoder(coder):
+    global geoCoder
+    geoCoder = coder
+    return coder
+
+def revGeoCodeMany(latLons):
+    return getGeoCoder().reverseMany(latLons)
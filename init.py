@@ -18,6 +18,10 @@ MIN_STOP_TIME = 10
 # it is considered part of the stop location
 CONSTRAINT = .02
 
+# number of worker processes used to find stops across truck/date partitions.
+# 1 runs everything in the current process
+STOP_WORKERS = 1
+
 # hours that a vehicle has to stay at a stop for it to be considered a DC or home
 DC_HOURS = 4
 
@@ -30,6 +34,25 @@ SANTIAGO_RADIUS = 60
 SANTI_LAT = '-33.469994'
 SANTI_LON = '-70.642193'
 
+# reverse geocoding. addresses are cached per coordinate rounded to
+# GEOCODE_PRECISION decimals (4 is about 11 meters), kept in memory for up to
+# GEOCODE_CACHE_SIZE coordinates and in the geoCache collection of
+# GEOCODE_DB for GEOCODE_TTL_DAYS days.
+GEOCODE_PRECISION = 4
+GEOCODE_CACHE_SIZE = 10000
+GEOCODE_TTL_DAYS = 90
+GEOCODE_DB = "wattsData"
+
+# requests per second (and burst size) allowed to the geocoding service,
+# shared by GEOCODE_WORKERS lookup threads. the public Nominatim server
+# allows one request per second and requires a user agent; raise these for
+# a self hosted server.
+GEOCODE_RATE = 1.0
+GEOCODE_BURST = 1
+GEOCODE_WORKERS = 4
+GEOCODE_USER_AGENT = "bhulan"
+GEOCODE_TIMEOUT = 10
+
 # url to access cartodb
 CARTO_URL = "https://<username>.cartodb.com/api/v1/imports/?api_key="
 
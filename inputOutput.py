@@ -20,12 +20,13 @@ def saveStopsToFile(db=WATTS_DATA_DB_KEY):
     sys.setdefaultencoding("utf-8")
 
     stops = Stop.getItems(db)
+    keys = list(stops.keys())
+    addresses = revGeoCodeMany([(stops[i].lat, stops[i].lon) for i in keys])
 
     with open(GPS_FILE_DIRECTORY+"stopsall.csv",'w') as wf:
         wf.write("id,lat,lng,address\n")
-        for i in stops.keys():
+        for i, address in zip(keys, addresses):
             prop = stops[i]
-            address = revGeoCode(prop.lat, prop.lon)
             items = [prop.id, prop.lat, prop.lon, address]
             line = getLineForItems(items)
             wf.write(line)
@@ -13,6 +13,29 @@ def getTbl(db, tblKey):
 def getDb(db):
     return client[db]
 
+# sort is a key (ascending) or a list of (key, direction) pairs.
+# batchSize is how many documents the server returns per round trip; the
+# cursor is still read lazily, one batch at a time.
+def getCursor(db, tblKey, query=None, projection=None, sort=None, batchSize=None, limit=None):
+    tbl = getTbl(db, tblKey)
+    if query is None:
+        query = {}
+    if projection is None:
+        cursor = tbl.find(query)
+    else:
+        cursor = tbl.find(query, projection)
+
+    if sort is not None:
+        if isinstance(sort, str):
+            sort = [(sort, 1)]
+        cursor = cursor.sort(sort)
+    if batchSize:
+        cursor = cursor.batch_size(batchSize)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    return cursor
+
 class DBItem(object):
     @classmethod
     def getTbl(cls, db):
@@ -40,6 +63,28 @@ class DBItem(object):
 
         return items
 
+    @classmethod
+    def getCursor(cls, db, query=None, projection=None, sort=None, batchSize=None, limit=None):
+        return getCursor(db, cls.tblKey, query, projection, sort, batchSize, limit)
+
+    # lazy versions of find/getItemList, objects are built as the cursor is
+    # read instead of all at once
+    @classmethod
+    def iterFind(cls, query, db, sort=None, batchSize=None, limit=None):
+        for item in cls.getCursor(db, query, sort=sort, batchSize=batchSize, limit=limit):
+            yield cls(item, db)
+
+    @classmethod
+    def iterItems(cls, db, sort=None, batchSize=None):
+        return cls.iterFind({}, db, sort, batchSize)
+
+    # raw documents, optionally projected to the fields a caller needs. a
+    # projected document may not have every field the class reads, so no
+    # objects are built
+    @classmethod
+    def iterMongoItems(cls, db, query=None, projection=None, sort=None, batchSize=None):
+        return iter(cls.getCursor(db, query, projection, sort, batchSize))
+
     @classmethod
     def findItem(cls, key, value, db):
         tbl = getTbl(db, cls.tblKey)
@@ -50,25 +95,23 @@ class DBItem(object):
         return cls(item, db)
 
     @classmethod
-    def findItems(cls, key, value, db):
-        tbl = getTbl(db, cls.tblKey)
-        items = tbl.find({key: value})
+    def findItems(cls, key, value, db, sort=None, batchSize=None):
+        items = cls.iterFind({key: value}, db, sort, batchSize)
 
-        return {item[ID_KEY]: cls(item, db) for item in items}
+        return {item.item[ID_KEY]: item for item in items}
 
     @classmethod
-    def findItemList(cls, key, value, db):
-        tbl = getTbl(db, cls.tblKey)
-        items = tbl.find({key: value})
-
-        return [cls(item, db) for item in items]
+    def findItemList(cls, key, value, db, sort=None, batchSize=None):
+        return list(cls.iterFind({key: value}, db, sort, batchSize))
 
     @classmethod
-    def find(cls, query, db):
-        tbl = getTbl(db, cls.tblKey)
-        items = tbl.find(query)
+    def find(cls, query, db, sort=None, batchSize=None):
+        return list(cls.iterFind(query, db, sort, batchSize))
 
-        return [cls(item, db) for item in items]
+    # objects whose key is any of values, with one $in query
+    @classmethod
+    def findIn(cls, key, values, db, sort=None, batchSize=None):
+        return cls.find({key: {'$in': list(values)}}, db, sort, batchSize)
 
     @classmethod
     def findOne(cls, query, db):
@@ -80,18 +123,47 @@ class DBItem(object):
         return cls(item, db)
 
     @classmethod
-    def getItems(cls, db):
-        tbl = getTbl(db, cls.tblKey)
-        items = tbl.find()
+    def getItems(cls, db, sort=None, batchSize=None):
+        items = cls.iterItems(db, sort, batchSize)
+
+        return {item.item[ID_KEY]: item for item in items}
 
-        return {item[ID_KEY] : cls(item, db) for item in items}
+    @classmethod
+    def getItemList(cls, db, sort=None, batchSize=None):
+        return list(cls.iterItems(db, sort, batchSize))
 
     @classmethod
-    def getItemList(cls, db):
+    def aggregate(cls, pipeline, db):
         tbl = getTbl(db, cls.tblKey)
-        items = tbl.find()
+        return list(tbl.aggregate(pipeline))
+
+    # number of documents per value of key (or per tuple of values for a
+    # list of keys), counted by the server
+    @classmethod
+    def countBy(cls, key, db, query=None):
+        keys = [key] if isinstance(key, str) else list(key)
+        pipeline = []
+        if query:
+            pipeline.append({'$match': query})
+        pipeline.append({'$group': {MONGO_ID_KEY: {k: '$' + k for k in keys},
+                                    COUNT_KEY: {'$sum': 1}}})
+
+        counts = {}
+        for group in cls.aggregate(pipeline, db):
+            values = tuple(group[MONGO_ID_KEY].get(k) for k in keys)
+            counts[values if len(keys) > 1 else values[0]] = group[COUNT_KEY]
+        return counts
+
+    # (value, count) pairs for the distinct values of key, most common first
+    @classmethod
+    def distinctWithCounts(cls, key, db, query=None):
+        pipeline = []
+        if query:
+            pipeline.append({'$match': query})
+        pipeline.append({'$group': {MONGO_ID_KEY: '$' + key, COUNT_KEY: {'$sum': 1}}})
+        pipeline.append({'$sort': {COUNT_KEY: -1, MONGO_ID_KEY: 1}})
 
-        return [cls(item, db) for item in items]
+        return [(group[MONGO_ID_KEY], group[COUNT_KEY]) for group in cls.aggregate(pipeline, db)]
 
     @classmethod
     def getMongoItems(cls, db):
@@ -124,6 +196,35 @@ class DBItem(object):
         return self.item
 
 
+# per request cache of DBItem objects by a unique key (ID_KEY by default).
+# every object is read at most once, and all keys not seen yet are loaded
+# with a single $in query, so resolving references for a list of rows
+# costs one round trip instead of one per row.
+class IdentityMap(object):
+    def __init__(self, cls, db, key=ID_KEY):
+        self.cls = cls
+        self.db = db
+        self.key = key
+        self.items = {}
+
+    # returns value -> object for the values that exist
+    def getMany(self, values):
+        missing = set(v for v in values if v not in self.items)
+        if missing:
+            for item in self.cls.iterFind({self.key: {'$in': list(missing)}}, self.db):
+                self.items[item.item[self.key]] = item
+            # remember keys without an object so they are not queried again
+            for value in missing:
+                self.items.setdefault(value, None)
+
+        return {v: self.items[v] for v in values if self.items[v] is not None}
+
+    def get(self, value):
+        return self.getMany([value]).get(value)
+
+    def __len__(self):
+        return len([item for item in self.items.values() if item is not None])
+
 def flushBigData(fileName, db=BIG_DATA_DB_KEY):
     db = getDb(db)
     fs = gridfs.GridFS(db)
@@ -1,9 +1,16 @@
 import datetime
 
+import numpy as np
+from pymongo import UpdateOne
 from init import *
-from util import (kilDist, getTimeDeltas, revGeoCode)
-from processVehicles import findStopsAll
+from util import (kilDist, kilDists, legKilDists, getLatLons, getLat, getLon,
+                  getTimeDeltas, revGeoCode)
+from processVehicles import findStopsAll, getAvailabilityIndex
+from spatial import GridIndex
+from columnar import TruckPointColumns
+from geocode import revGeoCodeMany
 from classes import *
+from bhulan.core.metrics import Histogram
 
 
 EMORNING = 'emorning'
@@ -14,6 +21,12 @@ NIGHT = 'night'
 MNTOMORN = 'mntomorn'
 # truckId, dateNum, lat, lon, time, vel
 
+# time spent in each stage of saveComputedStops: find, merge, save, geocode
+STOP_STAGE_SECONDS = Histogram('bhulan_stop_stage_seconds',
+                               'Time spent in each stage of the stop pipeline',
+                               ['stage'],
+                               buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600))
+
 
 # ################ Begin Database Helpers #######################
 
@@ -30,8 +43,10 @@ def getLineForItems(items):
     return line
 
 
-def getDateByDatenum(datenum):
-    return (((getTruckPointsByDateNum(WATTS_DATA_DB_KEY, datenum))[0].timestamp).split('T')[0])
+def getDateByDatenum(datenum, db=WATTS_DATA_DB_KEY):
+    # only one timestamp is needed, not every point of the day
+    cursor = TruckPoint.getCursor(db, {DATE_NUM_KEY: datenum}, {TIMESTAMP_KEY: 1}, limit=1)
+    return list(cursor)[0][TIMESTAMP_KEY].split('T')[0]
 
 
 def getDuration(t1, t2):
@@ -105,31 +120,22 @@ def getStopPropsFromTruckDate(truckId, dateNum=None, db=WATTS_DATA_DB_KEY):
     return StopProperties.find({TRUCK_ID_KEY: truckId, DATE_NUM_KEY: dateNum}, db)
 
 
-def getStopsFromTruckDate(truckId, dateNum=None, db=WATTS_DATA_DB_KEY):
+# one stop property (the first) for every distinct stop the truck visited.
+# the stops are resolved with a single query through an IdentityMap
+def getStopsFromTruckDate(truckId, dateNum=None, db=WATTS_DATA_DB_KEY, stopMap=None):
+    props = getStopPropsFromTruckDate(truckId, dateNum, db)
+    if stopMap is None:
+        stopMap = IdentityMap(Stop, db)
+    found = stopMap.getMany([s.stopPropId for s in props])
+
     stops = {}
-    if dateNum == None:
-        props = StopProperties.findItemList(TRUCK_ID_KEY, truckId, db)
-        for s in props:
-            x = Stop.findItem(ID_KEY, s.stopPropId, db)
-            if x.id in stops:
-                continue
-            else:
-                stops[x.id] = s
-    else:
-        props = StopProperties.find({TRUCK_ID_KEY: truckId, DATE_NUM_KEY: dateNum}, db)
-        stops = {}
-        for s in props:
-            x = Stop.findItem(ID_KEY, s.stopPropId, db)
-            #print x.id,
-            if x.id in stops:
-                #print ":x",
-                continue
-            else:
-                #print ":a"
-                stops[x.id] = s
+    for s in props:
+        x = found.get(s.stopPropId)
+        if x is None or x.id in stops:
+            continue
+        stops[x.id] = s
 
     return stops
-    #return StopProperties.find({TRUCK_ID_KEY: truckId, DATE_NUM_KEY: dateNum}, db)
 
 
 def getStopFromStopPropId(stopPropId, db=WATTS_DATA_DB_KEY):
@@ -141,6 +147,16 @@ def getStopPropsFromStopId(stopId, db=WATTS_DATA_DB_KEY):
     return StopProperties.findItems(STOP_PROP_ID_KEY, stopId, db)
 
 
+# getStopPropsFromStopId for many stops with one query.
+# returns stop id -> {stop prop id: StopProperties}
+def getStopPropsFromStopIds(stopIds, db=WATTS_DATA_DB_KEY):
+    propsByStop = {stopId: {} for stopId in stopIds}
+    for prop in StopProperties.findIn(STOP_PROP_ID_KEY, propsByStop.keys(), db):
+        propsByStop[prop.stopPropId][prop.id] = prop
+
+    return propsByStop
+
+
 def getStopTruckDateCombos(db=WATTS_DATA_DB_KEY, truckId=None, dateNum=None, stopPropId=None):
     return StopProperties.find({TRUCK_ID_KEY: truckId, DATE_NUM_KEY: dateNum, STOP_PROP_ID_KEY: stopPropId}, db)
 
@@ -170,104 +186,66 @@ def getStopPropsCombos(db=WATTS_DATA_DB_KEY, stopPropId=None, thresh=None):
 ################# End Database Helpers #######################
 
 
-# stop ID, lat, lon, time of day, duration
-def computeStopData():
-    print('processing stops for each truck and date - this will take time, please be patient')
-    stops = {}
+def getStopStats(ml, lat, lon):
     stats = {}
-    stopList = []
-    first = None
-    stop_id = 1
+    stats[TRUCK_ID_KEY] = ml[1]
+    stats[DATE_NUM_KEY] = ml[0]
+    t1 = getTime(int(ml[5].split(":")[0]), int(ml[5].split(":")[1]))
+    t2 = getTime(int(ml[6].split(":")[0]), int(ml[6].split(":")[1]))
+    stats[TIME_KEY] = t1
+    stats[DURATION_KEY] = getDuration(t1, t2)
+    stats[LAT_KEY] = lat
+    stats[LON_KEY] = lon
+    stats[RADIUS_KEY] = ml[4]
+    return stats
+
+
+# merges the rows returned by findStopsAll into stops.
+# a row within CONSTRAINT of an existing stop is added to the list under that
+# stop (to every such stop) without incrementing the stop ID; otherwise it
+# starts a new stop with the next ID.
+# the index answers the "existing stops within CONSTRAINT" lookup; the grid
+# only visits neighbouring cells so merging is near linear in the number of
+# rows. LinearIndex gives the original brute force scan.
+def mergeStops(masterList, index=None):
+    if index is None:
+        index = GridIndex(CONSTRAINT)
 
-    masterList = findStopsAll()
+    stops = {}
+    stop_id = 0
 
     for ml in masterList:
-        addRow = True
-        if first is None:
-            point = (stop_id, float(ml[2]), float(ml[3]))
-            stats[TRUCK_ID_KEY] = ml[1]
-            stats[DATE_NUM_KEY] = ml[0]
-            t1 = getTime(int(ml[5].split(":")[0]), int(ml[5].split(":")[1]))
-            t2 = getTime(int(ml[6].split(":")[0]), int(ml[6].split(":")[1]))
-            stats[TIME_KEY] = t1
-            stats[DURATION_KEY] = getDuration(t1, t2)
-            stats[LAT_KEY] = point[1]
-            stats[LON_KEY] = point[2]
-            stats[RADIUS_KEY] = ml[4]
-            stopList.append(stats)
-            stops[point] = stopList
-            first = 1
-            stats = {}
-            stopList = []
-        else:
-            # get the new line from the document and get the lat,long for the stop
-            # compare to the existing stops using kildist and if its less than constraint
-            # if yes, then it means they are the same stop.
-            #   add to the list under the stop entry without incrementing stop ID
-            #   add the truck id, time, duration, datenum
-            # if no, then it means its a differnet stop
-            #   add a new entry with an id.
-            #   add the truck id, datenum, stop time, and duration
-            oldPoint = {}
-
-            newPoint = {}
-            newPoint[LAT_KEY] = float(ml[2])
-            newPoint[LON_KEY] = float(ml[3])
-            keys = stops.keys()
-            for i in keys:
-
-                oldPoint[LAT_KEY] = i[1]
-                oldPoint[LON_KEY] = i[2]
-
-                if (kilDist(oldPoint, newPoint)) <= CONSTRAINT:
-                    #if yes, then it means they are the same stop.
-                    #   add to the list under the stop entry without incrementing stop prop ID
-                    #   add the truck id, time, duration, datenum, stop id, radius
-                    # print "same stop so adding to the list of stops"
-
-                    stats[TRUCK_ID_KEY] = ml[1]
-                    stats[DATE_NUM_KEY] = ml[0]
-
-                    t1 = getTime(int(ml[5].split(":")[0]), int(ml[5].split(":")[1]))
-                    t2 = getTime(int(ml[6].split(":")[0]), int(ml[6].split(":")[1]))
-
-                    stats[TIME_KEY] = t1
-                    stats[DURATION_KEY] = getDuration(t1, t2)
-                    stats[LAT_KEY] = newPoint[LAT_KEY]
-                    stats[LON_KEY] = newPoint[LON_KEY]
-                    stats[RADIUS_KEY] = ml[4]
-                    stops[i].append(stats)
-                    stats = {}
-
-                    addRow = False
-
-            # if all keys have been checked and no matches found then
-            # if no, then it means its a differnet stop
-            #   add a new entry with an id.
-            #   add the truck id, datenum, stop time, and duration
-            if addRow:
-                stop_id += 1
-                pt = (stop_id, float(ml[2]), float(ml[3]))
-
-                stats[TRUCK_ID_KEY] = ml[1]
-                stats[DATE_NUM_KEY] = ml[0]
-                t1 = getTime(int(ml[5].split(":")[0]), int(ml[5].split(":")[1]))
-                t2 = getTime(int(ml[6].split(":")[0]), int(ml[6].split(":")[1]))
-                stats[TIME_KEY] = t1
-                stats[DURATION_KEY] = getDuration(t1, t2)
-                stats[LAT_KEY] = pt[1]
-                stats[LON_KEY] = pt[2]
-                stats[RADIUS_KEY] = ml[4]
-                stopList.append(stats)
-                stops[pt] = stopList
-                stats = {}
-                stopList = []
+        lat = float(ml[2])
+        lon = float(ml[3])
+
+        keys = index.query(lat, lon, CONSTRAINT)
+        for i in keys:
+            stops[i].append(getStopStats(ml, lat, lon))
+
+        if not keys:
+            stop_id += 1
+            pt = (stop_id, lat, lon)
+            stops[pt] = [getStopStats(ml, lat, lon)]
+            index.insert(pt, lat, lon)
 
     return stops
 
 
-def saveComputedStops(db=WATTS_DATA_DB_KEY):
-    computedStopData = computeStopData()
+# stop ID, lat, lon, time of day, duration
+def computeStopData(db=WATTS_DATA_DB_KEY, index=None):
+    print('processing stops for each truck and date - this will take time, please be patient')
+    with STOP_STAGE_SECONDS.labels('find').time():
+        masterList = findStopsAll(db)
+
+    with STOP_STAGE_SECONDS.labels('merge').time():
+        return mergeStops(masterList, index)
+
+
+# stop properties are stored without addresses and then back filled, so
+# computing stops does not wait on the geocoding service. geocode=False
+# skips the back fill, e.g. to run backfillStopAddresses later
+def saveComputedStops(db=WATTS_DATA_DB_KEY, geocode=True):
+    computedStopData = computeStopData(db)
 
     stopList = []
     stopPropList = []
@@ -289,7 +267,7 @@ def saveComputedStops(db=WATTS_DATA_DB_KEY):
             stopProp[TIME_KEY] = str(j[TIME_KEY])
             stopProp[STOP_PROP_ID_KEY] = i[0]
             stopProp[RADIUS_KEY] = j[RADIUS_KEY]
-            stopProp[ADDRESS_KEY] = revGeoCode(j[LAT_KEY], j[LON_KEY])
+            stopProp[ADDRESS_KEY] = None
 
             stopPropList.append(stopProp)
             cluster.append(Point(stopProp[LAT_KEY], stopProp[LON_KEY]))
@@ -301,18 +279,47 @@ def saveComputedStops(db=WATTS_DATA_DB_KEY):
         stop[LON_KEY] = centroid.lon
 
         stopList.append(stop)
-    saveStopsData(stopList, db, delete=True)
-    saveStopsPropsData(stopPropList, db, delete=True)
+    with STOP_STAGE_SECONDS.labels('save').time():
+        saveStopsData(stopList, db, delete=True)
+        saveStopsPropsData(stopPropList, db, delete=True)
+
+    if geocode:
+        with STOP_STAGE_SECONDS.labels('geocode').time():
+            addresses = backfillStopAddresses(db)
+        for prop in stopPropList:
+            prop[ADDRESS_KEY] = addresses.get(prop[ID_KEY])
+
     return stopPropList
 
 
+# looks up addresses for every stored stop property that has none, in one
+# batched geocoder call, and writes them back in one unordered bulk write.
+# returns stop property id -> address for the props it filled
+def backfillStopAddresses(db=WATTS_DATA_DB_KEY):
+    tbl = StopProperties.getTbl(db)
+    props = list(tbl.find({ADDRESS_KEY: None}, {ID_KEY: 1, LAT_KEY: 1, LON_KEY: 1}))
+    addresses = revGeoCodeMany([(prop[LAT_KEY], prop[LON_KEY]) for prop in props])
+
+    filled = {}
+    for prop, address in zip(props, addresses):
+        if address is not None:
+            filled[prop[ID_KEY]] = address
+
+    if filled:
+        tbl.bulk_write([UpdateOne({ID_KEY: propId}, {'$set': {ADDRESS_KEY: address}})
+                        for propId, address in filled.items()], ordered=False)
+
+    return filled
+
+
 # returns stops with stop duration greater than the specified time in minutes
 # input - drtn - minutes of duration
 def getStopByDuration(drtn, db=WATTS_DATA_DB_KEY):
     stops = Stop.getItemList(db)
+    propsByStop = getStopPropsFromStopIds([st.id for st in stops], db)
     retd = {}
     for st in stops:
-        props = getStopPropsFromStopId(st.id)
+        props = propsByStop[st.id]
         for prp in props:
             p = props[prp]
             if st.id in retd:
@@ -328,26 +335,24 @@ def getStopByDuration(drtn, db=WATTS_DATA_DB_KEY):
 
 
 def findPotentialDCs(db=WATTS_DATA_DB_KEY):
-    return getStopByDuration(DC_HOURS)
+    return getStopByDuration(DC_HOURS, db)
 
 
 def inSantiago(point):
-    santi = Point(SANTI_LAT, SANTI_LON)
-    if kilDist(point, santi) < SANTIAGO_RADIUS:
-        #print kilDist(point, santi)
-        return True
-    else:
-        return False
+    dist = kilDists(float(getLat(point)), float(getLon(point)), float(SANTI_LAT), float(SANTI_LON))
+    return bool(dist < SANTIAGO_RADIUS)
 
 
-def getStopStatistics(truckId=None, dateNum=None):
-    stprops = getStopPropsFromTruckDate(truckId, dateNum)
-    stops = getStopsFromTruckDate(truckId, dateNum)
+def getStopStatistics(truckId=None, dateNum=None, db=WATTS_DATA_DB_KEY):
+    stprops = getStopPropsFromTruckDate(truckId, dateNum, db)
+    # the same stops are shared by both lookups below
+    stopMap = IdentityMap(Stop, db)
+    stops = getStopsFromTruckDate(truckId, dateNum, db, stopMap)
 
     print("TOTAL STOP PROPS:", len(stprops))
     print("TOTAL STOPs:", len(stops))
     for s in stprops:
-        singStop = getStopFromStopPropId(s.id)
+        singStop = stopMap.get(s.stopPropId)
         print('--- TRUCK DATA ---')
         print('STOP PROP ID: ' + str(s.id))
         print('STOP ID: ' + str(singStop.id))
@@ -355,7 +360,7 @@ def getStopStatistics(truckId=None, dateNum=None):
         print('CENTROID LON: ' + str(singStop.lon))
         print('LAT: ' + str(s.lat))
         print('LON: ' + str(s.lon))
-        print('ADDRESS: ' + s.address)
+        print('ADDRESS: ' + str(s.address))
         print('TRUCK ID: ' + s.truckId)
         print('DATENUM: ' + str(s.dateNum))
         print('TIME: ' + s.time)
@@ -387,9 +392,7 @@ def getTimeWindows(db=WATTS_DATA_DB_KEY):
     # looking for window by truck and date
     #qry = ({TRUCK_ID_KEY:"VG-3837",DATE_NUM_KEY:314, STOP_PROP_ID_KEY:stopId})
 
-    ls = StopProperties.getItems(db)
-    for prop in ls:
-        i = ls[prop]
+    for i in StopProperties.iterItems(db):
         hour = float(i.duration) / 60
         if hour < 4:
             windowhelper(timewindow, hour, i)
@@ -399,12 +402,11 @@ def getTimeWindows(db=WATTS_DATA_DB_KEY):
 
 def getTruckList(db=WATTS_DATA_DB_KEY):
     tdict = {}
-    tlist = TruckPoint.getItemList(db)
-    for t in tlist:
-        if t.truckId in tdict:
-            tdict[t.truckId] += 1
+    for stats in getAvailabilityIndex(db).values():
+        if stats.truckId in tdict:
+            tdict[stats.truckId] += stats.count
         else:
-            tdict[t.truckId] = 1
+            tdict[stats.truckId] = stats.count
 
     return tdict
 
@@ -424,44 +426,39 @@ def getTruckScheduleForDay(truckId, dateNum):
     return ret
 
 
-def getTotalDistanceTraveled(truckId, datenum, db=WATTS_DATA_DB_KEY, ):
-    ts = getTruckPoints(truckId, datenum, db)
-    dist, tme = 0, 0
-    totalDistance = 0
-    first = True
-    for t in ts:
-        if first:
-            dist = t.point
-            first = False
-            continue
-        totalDistance += kilDist(dist, t.point)
+def getTruckPointColumns(truckId, datenum, db=WATTS_DATA_DB_KEY):
+    return TruckPointColumns.load({TRUCK_ID_KEY: truckId, DATE_NUM_KEY: datenum}, db)
 
-        dist = t.point
-    return totalDistance
 
+# ts is a TruckPointColumns or a list of TruckPoints
+def getDistanceTraveled(ts):
+    if len(ts) < 2:
+        return 0
+    lats, lons = getLatLons(ts)
+    return float(legKilDists(lats, lons).sum())
 
-def getTotalTimeOnRoad(truckId, datenum, db=WATTS_DATA_DB_KEY, ):
-    ts = getTruckPoints(truckId, datenum, db)
-    dist, tme = 0, 0
-    totalDistance = 0
-    totalTime = datetime.timedelta(hours=0, minutes=0, seconds=0)
-    first = True
-    for t in ts:
-        if first:
-            dist = t.point
-            tme = t.time
-            first = False
-            continue
-        curr = kilDist(dist, t.point)
-        totalDistance += curr
 
-        if curr > 0:
-            x = getTimeDeltas(t.time) - getTimeDeltas(tme)
-            totalTime = totalTime + x
-        dist = t.point
-        tme = t.time
+# hours spent on legs between consecutive points that moved
+def getTimeOnRoad(ts):
+    if len(ts) < 2:
+        return 0.0
+    lats, lons = getLatLons(ts)
+    moving = legKilDists(lats, lons) > 0
+
+    if isinstance(ts, TruckPointColumns):
+        seconds = ts.seconds.astype(np.int64)
+    else:
+        seconds = np.array([getTimeDeltas(t.time).total_seconds() for t in ts])
+
+    return float(np.diff(seconds)[moving].sum()) / 3600
 
-    return totalTime.total_seconds() / 3600
+
+def getTotalDistanceTraveled(truckId, datenum, db=WATTS_DATA_DB_KEY, ):
+    return getDistanceTraveled(getTruckPointColumns(truckId, datenum, db))
+
+
+def getTotalTimeOnRoad(truckId, datenum, db=WATTS_DATA_DB_KEY, ):
+    return getTimeOnRoad(getTruckPointColumns(truckId, datenum, db))
 
 def getAverageSpeedByDatenum(truckId, datenum):
     return getTotalDistanceTraveled(truckId, datenum) / getTotalTimeOnRoad(truckId, datenum)
@@ -1,10 +1,15 @@
 from init import *
 import glob
+import multiprocessing
+import numpy as np
 from computed import *
 import xlrd
 import datetime
-from util import (kilDist, mileDist, getDateNum, getClockTime, getSeconds,
-                  getMinutes, getHours, getDateTime, getExcelDate)
+from util import (kilDist, mileDist, meterDist, getDateNum, getClockTime, getSeconds,
+                  getMinutes, getHours, getDateTime, getExcelDate, getLatLons,
+                  pairwiseArcs, KIL_RADIUS, MILE_RADIUS)
+from bhulan.processing.stop_detection import StopDetector
+from columnar import TruckPointColumns, formatClockSeconds
 COMPUTED = None
 SAMPLE_RATE = 100
 MAX_DISTANCE = 5
@@ -34,25 +39,42 @@ def getCentroid(cluster):
     return Point(lat, lon)
 
 
-def getDistances(centroids, distFunc=kilDist):
+# earth radius to scale arcs by for the distance functions that have a
+# vectorized equivalent
+DIST_FUNC_RADII = {
+    kilDist: KIL_RADIUS,
+    mileDist: MILE_RADIUS,
+    meterDist: KIL_RADIUS * 1000,
+}
+
+
+def getDistanceMatrix(centroids, distFunc=kilDist):
+    if distFunc in DIST_FUNC_RADII:
+        lats, lons = getLatLons(centroids)
+        return pairwiseArcs(lats, lons) * DIST_FUNC_RADII[distFunc]
+
     num = len(centroids)
-    dists = []
+    matrix = np.zeros((num, num))
     for i in range(num):
-        dist = []
-        centroid1 = centroids[i]
         for j in range(num):
-            if i is not j:
-                centroid2 = centroids[j]
-                dist.append(distFunc(centroid1, centroid2))
+            if i != j:
+                matrix[i, j] = distFunc(centroids[i], centroids[j])
 
-        dists.append(dist)
+    return matrix
+
+
+def getDistances(centroids, distFunc=kilDist):
+    matrix = getDistanceMatrix(centroids, distFunc)
+    num = len(centroids)
+    offDiagonal = ~np.eye(num, dtype=bool)
 
-    return dists
+    return [matrix[i][offDiagonal[i]].tolist() for i in range(num)]
 
 
 def getDiameter(cluster, distFunc=kilDist):
-    distances = getDistances(cluster, distFunc)
-    return max([max(x) for x in distances])
+    if len(cluster) < 2:
+        return 0.0
+    return float(getDistanceMatrix(cluster, distFunc).max())
 
 
 def getStopTime(cluster):
@@ -139,103 +161,210 @@ def saveTruckDateCombo(combo, dateNum, db):
     TruckDates.saveItem(item, db)
 
 
+################# Begin Availability Index #######################
+
+# a single $group pass over the truck points. for every truck and date that
+# has points it gives the number of points, the first and last time and the
+# mean lat/lon (the route center)
+def getTruckDateStatsPipeline():
+    return [{'$group': {
+        MONGO_ID_KEY: {TRUCK_ID_KEY: '$' + TRUCK_ID_KEY, DATE_NUM_KEY: '$' + DATE_NUM_KEY},
+        COUNT_KEY: {'$sum': 1},
+        MIN_TIME_KEY: {'$min': '$' + TIME_KEY},
+        MAX_TIME_KEY: {'$max': '$' + TIME_KEY},
+        LAT_KEY: {'$avg': '$' + LAT_KEY},
+        LON_KEY: {'$avg': '$' + LON_KEY},
+    }}]
+
+
+def getAvailabilityKey(dateNum, truckId):
+    return (dateNum, truckId)
+
+
+# materializes the aggregation into the truckDateStats collection and returns
+# it as {(dateNum, truckId): TruckDateStats}
+def computeAvailabilityIndex(db=WATTS_DATA_DB_KEY):
+    TruckDateStats.deleteItems(db)
+
+    items = []
+    for row in TruckPoint.aggregate(getTruckDateStatsPipeline(), db):
+        item = {}
+        item[TRUCK_ID_KEY] = row[MONGO_ID_KEY][TRUCK_ID_KEY]
+        item[DATE_NUM_KEY] = row[MONGO_ID_KEY][DATE_NUM_KEY]
+        item[COUNT_KEY] = row[COUNT_KEY]
+        item[MIN_TIME_KEY] = row[MIN_TIME_KEY]
+        item[MAX_TIME_KEY] = row[MAX_TIME_KEY]
+        item[LAT_KEY] = row[LAT_KEY]
+        item[LON_KEY] = row[LON_KEY]
+        items.append(item)
+
+    if items:
+        TruckDateStats.saveItems(items, db)
+
+    return {getAvailabilityKey(i[DATE_NUM_KEY], i[TRUCK_ID_KEY]): TruckDateStats(i, db) for i in items}
+
+
+# reads the materialized index, computing it if it has not been built since
+# points were last written (TruckPoint batch writes clear it)
+def getAvailabilityIndex(db=WATTS_DATA_DB_KEY):
+    stats = TruckDateStats.getItemList(db)
+    if not stats:
+        return computeAvailabilityIndex(db)
+
+    return {getAvailabilityKey(s.dateNum, s.truckId): s for s in stats}
+
+
+################# End Availability Index #######################
+
 def computeTruckDateCombos(db=WATTS_DATA_DB_KEY):
     TruckDates.deleteItems(db)
-    dateNums = getDateNums(db)
-    truckIds = getTrucks(db)
+    index = computeAvailabilityIndex(db)
+
+    dateNums = []
+    truckIds = []
+    for dateNum, truckId in index:
+        if dateNum not in dateNums:
+            dateNums.append(dateNum)
+        if truckId not in truckIds:
+            truckIds.append(truckId)
+
     for dateNum in dateNums:
         truckDateCombo = {}
         for truckId in truckIds:
-            item = TruckPoint.findOne({TRUCK_ID_KEY: truckId, DATE_NUM_KEY: dateNum}, db)
-            if item is not None:
-                truckDateCombo[truckId] = True
-            else:
-                truckDateCombo[truckId] = False
+            truckDateCombo[truckId] = getAvailabilityKey(dateNum, truckId) in index
 
         saveTruckDateCombo(truckDateCombo, dateNum, db)
 
 
 def computeRouteCenters(db=WATTS_DATA_DB_KEY):
-    dateNums = getDateNums(db)
-    for dateNum in dateNums:
-        truckDates = TruckDates.findItem(DATE_NUM_KEY, dateNum, db)
+    index = getAvailabilityIndex(db)
+    for truckDates in TruckDates.getItemList(db):
         availability = truckDates.availability
         centers = {}
         for truckId in availability:
-            if availability[truckId]:
-                points = getTruckPoints(truckId, db, dateNum)
-                center = getCentroid(points)
-                centers[truckId] = center.getItem()
+            stats = index.get(getAvailabilityKey(truckDates.dateNum, truckId))
+            if availability[truckId] and stats is not None:
+                centers[truckId] = Point(stats.lat, stats.lon).getItem()
             else:
                 centers[truckId] = None
 
         truckDates.routeCenters = centers
         truckDates.save()
 
-def findStops(truckId, dateNum, db=WATTS_DATA_DB_KEY, constraint=None):
+def getStopDuration(minTime, maxTime):
+    return getMinutes(maxTime) - getMinutes(minTime)
+
+# getStopDuration for clock times in seconds since midnight
+def getSecondsStopDuration(minSeconds, maxSeconds):
+    return int(maxSeconds) // 60 - int(minSeconds) // 60
+
+
+# single pass over the points of a truck-day, see StopDetector. the centroid
+# is kept as running sums and the radius is half the diagonal of the
+# cluster's bounding box, an upper bound on half its diameter.
+# points is a list of TruckPoints or a TruckPointColumns.
+def detectStops(points, constraint=None):
     if constraint is None:
         constraint = CONSTRAINT
-    points = getTruckPoints(truckId, db, dateNum)
-    numPoints = len(points)
 
-    first = None
-    last = None
-    cluster = []
-    clusters = []
-    for i in range(0, numPoints):
-        point = points[i]
-        if first is None:
-            first = point
-            cluster.append(first)
-        else:
-            if kilDist(first, point) < constraint:
-                last = point
-                cluster.append(last)
-                first = getCentroid(cluster)
-            else:
-                if len(cluster) > 1:
-                    clusters.append(cluster)
-                last = None
-                first = point
-                cluster = [first]
-    if len(cluster) > 1:
-        clusters.append(cluster)
-
-    lengths = [len(i) for i in clusters]
-    zeros = [getNumZeros(i) for i in clusters]
-    times = [getStopTime(i) for i in clusters]
-    centroids = [getCentroid(i) for i in clusters]
-    diameters = [getDiameter(i) for i in clusters]
-    distances = getDistances(centroids, kilDist)
-    startStops = [getStartStop(i, timeFunc=getClockTime) for i in clusters]
+    if isinstance(points, TruckPointColumns):
+        detector = StopDetector(constraint, MIN_STOP_TIME, getSecondsStopDuration)
+        trace = zip(points.lats.tolist(), points.lons.tolist(), points.seconds.tolist())
+        clockTime = lambda seconds: getClockTime(formatClockSeconds(seconds))
+    else:
+        detector = StopDetector(constraint, MIN_STOP_TIME, getStopDuration)
+        trace = ((point.lat, point.lon, point.time) for point in points)
+        clockTime = getClockTime
 
     filtered = []
-    for i in range(len(clusters)):
-        if times[i] >= MIN_STOP_TIME:
-            stop = {}
-            stop[POINT_KEY] = centroids[i]
-            stop[RADIUS_KEY] = diameters[i] / 2
-            stop[START_STOP_KEY] = startStops[i]
-            filtered.append(stop)
+    for s in detector.detect(trace):
+        stop = {}
+        stop[POINT_KEY] = Point(s.lat, s.lon)
+        stop[RADIUS_KEY] = s.radius_km
+        stop[START_STOP_KEY] = (clockTime(s.start), clockTime(s.end))
+        filtered.append(stop)
 
     return filtered
 
 
-def findStopsAll(db=WATTS_DATA_DB_KEY, constraint=None, trucks=None,datenums=None):
+def findStops(truckId, dateNum, db=WATTS_DATA_DB_KEY, constraint=None):
+    points = TruckPointColumns.load({TRUCK_ID_KEY: truckId, DATE_NUM_KEY: dateNum}, db)
+    return detectStops(points, constraint)
+
+
+# returns truckId -> TruckPointColumns for the trucks with points on dateNum
+def getTruckPointsForDate(dateNum, trucks, db):
+    query = {DATE_NUM_KEY: dateNum, TRUCK_ID_KEY: {'$in': list(trucks)}}
+    return TruckPointColumns.load(query, db).groupBy(TRUCK_ID_KEY)
+
+
+# a partition is one dateNum and a list of trucks. all of its points are
+# loaded with a single query and the stops are returned in truck order, so
+# concatenating partitions in order gives the same rows as the serial loop.
+def findStopsPartition(partition):
+    db, constraint, dns, trucks = partition
+    print('processing: '+str(len(trucks))+' trucks for date: '+str(dns))
+    truckPoints = getTruckPointsForDate(dns, trucks, db)
+
+    stopsAll = []
+    for truckId in trucks:
+        stops = detectStops(truckPoints.get(truckId, []), constraint)
+        for s in stops:
+            dat = [dns,truckId, s['point'].lat, s['point'].lon, s['radius'],s['startStop'][0],s['startStop'][1]]
+            stopsAll.append(dat)
+
+    return stopsAll
+
+
+# only truck/date pairs present in the availability index get a partition
+def getStopPartitions(db, constraint, trucks, datenums, index, trucksPerPartition=None):
+    if not trucksPerPartition:
+        trucksPerPartition = max(len(trucks), 1)
+
+    partitions = []
+    for dns in datenums:
+        dayTrucks = [t for t in trucks if getAvailabilityKey(dns, t) in index]
+        for i in range(0, len(dayTrucks), trucksPerPartition):
+            partitions.append((db, constraint, dns, dayTrucks[i:i + trucksPerPartition]))
+
+    return partitions
+
+
+# workers inherit the parent's mongo client; pymongo resets its connection
+# pools in the child after a fork. fork is preferred where available so the
+# workers see the same client setup as the parent.
+def getPoolContext():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def findStopsAll(db=WATTS_DATA_DB_KEY, constraint=None, trucks=None,datenums=None,
+                 workers=None, trucksPerPartition=None):
     if datenums is None:
         datenums = getDateNums(db)
     if trucks is None:
         trucks = getTrucks(db)
+    if workers is None:
+        workers = STOP_WORKERS
 
-    stopsAll = []
+    index = getAvailabilityIndex(db)
+    partitions = getStopPartitions(db, constraint, list(trucks), list(datenums), index,
+                                   trucksPerPartition)
 
-    for dns in datenums:
-        for truckId in trucks:
-            print('processing: '+str(truckId)+' for date: '+str(dns))
-            stops = findStops(truckId, dns, db, constraint)
-            for s in stops:
-                dat = [dns,truckId, s['point'].lat, s['point'].lon, s['radius'],s['startStop'][0],s['startStop'][1]]
-                stopsAll.append(dat)
+    if workers > 1 and len(partitions) > 1:
+        pool = getPoolContext().Pool(min(workers, len(partitions)))
+        try:
+            results = pool.map(findStopsPartition, partitions)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [findStopsPartition(partition) for partition in partitions]
+
+    stopsAll = []
+    for rows in results:
+        stopsAll.extend(rows)
 
     return stopsAll
 
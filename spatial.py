@@ -0,0 +1,116 @@
+import math
+from abc import ABC, abstractmethod
+from constants import LAT_KEY, LON_KEY
+from util import kilDist, addIfKey, KIL_RADIUS
+
+# km covered by one degree of latitude on the sphere used by kilDist
+KM_PER_DEGREE = KIL_RADIUS * math.pi / 180.0
+
+# extra search distance in km. kilDist uses the spherical law of cosines,
+# which is off by a few cm at the 20 meter scale, so candidates are gathered
+# slightly past the radius and then filtered with kilDist itself.
+SEARCH_TOLERANCE = .001
+
+################ Begin Spatial Indexes ################
+
+# a spatial index stores (key, lat, lon) entries and answers "which keys are
+# within radius km of this lat/lon" (in no particular order) using kilDist,
+# so swapping indexes never changes which entries match.
+class SpatialIndex(ABC):
+    @abstractmethod
+    def insert(self, key, lat, lon):
+        pass
+
+    @abstractmethod
+    def query(self, lat, lon, radius):
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    def isWithin(self, entry, lat, lon, radius):
+        key, entryLat, entryLon = entry
+        oldPoint = {LAT_KEY: entryLat, LON_KEY: entryLon}
+        newPoint = {LAT_KEY: lat, LON_KEY: lon}
+        return kilDist(oldPoint, newPoint) <= radius
+
+
+# brute force index, compares against every entry
+class LinearIndex(SpatialIndex):
+    def __init__(self):
+        self.entries = []
+
+    def insert(self, key, lat, lon):
+        self.entries.append((key, lat, lon))
+
+    def query(self, lat, lon, radius):
+        return [entry[0] for entry in self.entries if self.isWithin(entry, lat, lon, radius)]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# uniform lat/lon grid. a query only looks at the cells that can contain
+# points within the radius, so lookups cost O(points per cell) instead of
+# O(entries).
+class GridIndex(SpatialIndex):
+    def __init__(self, cellSize):
+        # cellSize is the cell edge in km
+        self.cellDeg = (cellSize + SEARCH_TOLERANCE) / KM_PER_DEGREE
+        # longitude cells are sized to divide the globe evenly so that
+        # neighbours wrap around the date line
+        self.numLonCells = int(math.ceil(360.0 / self.cellDeg))
+        self.lonCellDeg = 360.0 / self.numLonCells
+        self.numLatCells = int(math.ceil(180.0 / self.cellDeg))
+        self.cells = {}
+        self.rows = {}
+        self.size = 0
+
+    def getCellId(self, lat, lon):
+        latCell = min(int(math.floor((lat + 90.0) / self.cellDeg)), self.numLatCells - 1)
+        lonCell = int(math.floor((lon + 180.0) / self.lonCellDeg)) % self.numLonCells
+        return (latCell, lonCell)
+
+    def insert(self, key, lat, lon):
+        cellId = self.getCellId(lat, lon)
+        addIfKey(self.cells, cellId, (key, lat, lon))
+        self.rows.setdefault(cellId[0], set()).add(cellId[1])
+        self.size += 1
+
+    def getLonCells(self, latCell, lonCell, lat, searchDeg):
+        # a fixed distance spans more degrees of longitude towards the poles
+        maxLat = min(abs(lat) + searchDeg, 90.0)
+        cos = math.cos(math.radians(maxLat))
+        lonSpan = None
+        if cos > 0:
+            lonSpan = int(math.ceil(searchDeg / cos / self.lonCellDeg))
+
+        row = self.rows.get(latCell)
+        if row is None:
+            return set()
+        # near the poles (or in sparse rows) it is cheaper to visit every
+        # occupied cell of the row than to walk the span
+        if lonSpan is None or 2 * lonSpan + 1 >= len(row):
+            return row
+
+        return set((lonCell + i) % self.numLonCells for i in range(-lonSpan, lonSpan + 1))
+
+    def query(self, lat, lon, radius):
+        searchDeg = (radius + SEARCH_TOLERANCE) / KM_PER_DEGREE
+        latSpan = int(math.ceil(searchDeg / self.cellDeg))
+        latCell, lonCell = self.getCellId(lat, lon)
+
+        keys = []
+        for i in range(max(latCell - latSpan, 0), min(latCell + latSpan, self.numLatCells - 1) + 1):
+            for j in self.getLonCells(i, lonCell, lat, searchDeg):
+                for entry in self.cells.get((i, j), ()):
+                    if self.isWithin(entry, lat, lon, radius):
+                        keys.append(entry[0])
+
+        return keys
+
+    def __len__(self):
+        return self.size
+
+################ End Spatial Indexes ################
@@ -8,7 +8,9 @@ and health checks with real MongoDB interactions.
 import pytest
 from fastapi.testclient import TestClient
 from datetime import datetime
+from bhulan.api import app as api
 from bhulan.api.app import app
+from bhulan.api.ingest_queue import IngestQueue
 from bhulan.storage.mongo_repo import MongoTrackPointRepository, MongoJobRegistry
 from bhulan.config.settings import settings
 
@@ -282,6 +284,52 @@ class TestJobStatusEndpoint:
         assert response.status_code == 404
 
 
+@pytest.mark.integration
+class TestQueuedIngestion:
+    """Test webhook ingestion through the background queue."""
+    
+    payload = {
+        "device_id": "TRK-101",
+        "timestamp": "2024-05-01T12:00:00Z",
+        "lat": 37.7749,
+        "lon": -122.4194
+    }
+    
+    def test_queued_then_ingested(self, client, mongo_repo, job_registry, monkeypatch):
+        """Test 202 is returned at once and the job completes in the background."""
+        queue = IngestQueue(api.track_repo, api.job_registry, maxsize=10, workers=1)
+        monkeypatch.setattr(api, "ingest_queue", queue)
+        monkeypatch.setattr(settings, "WEBHOOK_ASYNC", True)
+        
+        response = client.post("/ingest/trackpoints?vendor=generic", json=self.payload)
+        
+        assert response.status_code == 202
+        data = response.json()
+        assert data["status"] == "queued"
+        assert data["record_count"] == 1
+        
+        queue.close()
+        job_data = client.get(f"/jobs/{data['ingest_id']}").json()
+        assert job_data["status"] == "succeeded"
+        assert job_data["point_count_in_db"] == 1
+    
+    def test_full_queue_throttled(self, client, monkeypatch):
+        """Test 429 with Retry-After once the queue is full."""
+        queue = IngestQueue(api.track_repo, api.job_registry, maxsize=1)
+        # no workers, so the first batch stays queued
+        monkeypatch.setattr(queue, "_start", lambda: None)
+        monkeypatch.setattr(api, "ingest_queue", queue)
+        monkeypatch.setattr(settings, "WEBHOOK_ASYNC", True)
+        
+        first = client.post("/ingest/trackpoints?vendor=generic&ingest_id=queued-1", json=self.payload)
+        second = client.post("/ingest/trackpoints?vendor=generic", json=self.payload)
+        
+        assert first.status_code == 202
+        assert second.status_code == 429
+        assert second.headers["Retry-After"] == str(settings.WEBHOOK_RETRY_AFTER_SECONDS)
+        assert client.get("/jobs/queued-1").json()["status"] == "queued"
+
+
 @pytest.mark.integration
 class TestAPIAuthentication:
     """Test API authentication if configured."""
@@ -3,25 +3,33 @@
 FakeDB - In-memory database implementation for system testing.
 
 Mimics pymongo behaviors needed by bhulan without requiring a real MongoDB instance.
-Supports: find, find_one, insert, save, remove, distinct, and cursor operations.
+Supports: find, find_one, insert, save, bulk_write, remove, distinct, aggregate and cursor operations.
+Queries support equality and the $in and $lt operators.
 """
 
 import copy
 
 
 class FakeCursor:
-    """Mimics pymongo cursor with sort and limit support"""
+    """Mimics pymongo cursor with sort, limit and batch_size support"""
     
     def __init__(self, items):
         self.items = list(items)
-        self._sort_key = None
-        self._sort_order = 1
+        self._sort_keys = []
         self._limit_count = None
+        self.batch_size_hint = None
     
     def sort(self, key, order=1):
-        """Sort cursor results by key in ascending (1) or descending (-1) order"""
-        self._sort_key = key
-        self._sort_order = order
+        """Sort by key and order (1/-1) or by a list of (key, order) pairs"""
+        if isinstance(key, list):
+            self._sort_keys = key
+        else:
+            self._sort_keys = [(key, order)]
+        return self
+    
+    def batch_size(self, size):
+        """Record the batch size hint (results are already in memory)"""
+        self.batch_size_hint = size
         return self
     
     def limit(self, count):
@@ -33,9 +41,8 @@ class FakeCursor:
         """Iterate over cursor results with sorting and limiting applied"""
         items = self.items
         
-        if self._sort_key:
-            items = sorted(items, key=lambda x: x.get(self._sort_key, 0), 
-                          reverse=(self._sort_order == -1))
+        for key, order in reversed(self._sort_keys):
+            items = sorted(items, key=lambda x: x.get(key, 0), reverse=(order == -1))
         
         if self._limit_count is not None:
             items = items[:self._limit_count]
@@ -46,6 +53,15 @@ class FakeCursor:
         return len(self.items)
 
 
+class UpdateOne:
+    """Mimics pymongo.UpdateOne"""
+    
+    def __init__(self, filter, update, upsert=False):
+        self._filter = filter
+        self._doc = update
+        self._upsert = upsert
+
+
 class FakeCollection:
     """Mimics pymongo collection with CRUD operations"""
     
@@ -53,6 +69,7 @@ class FakeCollection:
         self.name = name
         self.documents = []
         self._id_counter = 1
+        self.bulk_writes = []
     
     def find(self, query=None, projection=None):
         """Find documents matching query"""
@@ -107,6 +124,15 @@ class FakeCollection:
         
         self._insert_one(doc)
     
+    def bulk_write(self, requests, ordered=True):
+        """Apply UpdateOne $set requests, each to the first matching document"""
+        self.bulk_writes.append(len(requests))
+        for request in requests:
+            for doc in self.documents:
+                if self._matches_query(doc, request._filter):
+                    doc.update(copy.deepcopy(request._doc['$set']))
+                    break
+    
     def remove(self, query=None):
         """Remove documents matching query"""
         if query is None:
@@ -123,19 +149,90 @@ class FakeCollection:
                 values.add(doc[key])
         return list(values)
     
+    def aggregate(self, pipeline):
+        """Run an aggregation pipeline of $match, $group and $sort stages"""
+        docs = [copy.deepcopy(doc) for doc in self.documents]
+        
+        for stage in pipeline:
+            if '$match' in stage:
+                docs = [doc for doc in docs if self._matches_query(doc, stage['$match'])]
+            elif '$group' in stage:
+                docs = self._group(docs, stage['$group'])
+            elif '$sort' in stage:
+                for key, order in reversed(list(stage['$sort'].items())):
+                    docs.sort(key=lambda x: x.get(key), reverse=(order == -1))
+            else:
+                raise NotImplementedError(f"Unsupported stage: {list(stage)}")
+        
+        return FakeCursor(docs)
+    
+    def _resolve(self, doc, expr):
+        """Resolve a '$field' reference, a dict of references or a literal"""
+        if isinstance(expr, str) and expr.startswith('$'):
+            return doc.get(expr[1:])
+        if isinstance(expr, dict):
+            return {k: self._resolve(doc, v) for k, v in expr.items()}
+        return expr
+    
+    def _group(self, docs, spec):
+        """Group documents with $sum, $min, $max and $avg accumulators"""
+        groups = {}
+        for doc in docs:
+            group_id = self._resolve(doc, spec['_id'])
+            key = repr(group_id)
+            if key not in groups:
+                groups[key] = {'_id': group_id, 'docs': []}
+            groups[key]['docs'].append(doc)
+        
+        results = []
+        for group in groups.values():
+            result = {'_id': group['_id']}
+            for field, accumulator in spec.items():
+                if field == '_id':
+                    continue
+                op, expr = list(accumulator.items())[0]
+                values = [self._resolve(doc, expr) for doc in group['docs']]
+                values = [v for v in values if v is not None]
+                if op == '$sum':
+                    result[field] = sum(values)
+                elif op == '$min':
+                    result[field] = min(values) if values else None
+                elif op == '$max':
+                    result[field] = max(values) if values else None
+                elif op == '$avg':
+                    result[field] = sum(values) / len(values) if values else None
+                else:
+                    raise NotImplementedError(f"Unsupported accumulator: {op}")
+            results.append(result)
+        
+        return results
+    
     def _matches_query(self, doc, query):
-        """Check if document matches query"""
+        """Check if document matches query (equality, $in and $lt)"""
         for key, value in query.items():
-            if key not in doc or doc[key] != value:
+            if key not in doc:
+                return False
+            if isinstance(value, dict) and '$in' in value:
+                if doc[key] not in value['$in']:
+                    return False
+            elif isinstance(value, dict) and '$lt' in value:
+                if not doc[key] < value['$lt']:
+                    return False
+            elif doc[key] != value:
                 return False
         return True
     
     def _apply_projection(self, doc, projection):
-        """Apply projection to document"""
-        if '_id' in projection and projection['_id'] == 0:
-            result = {k: v for k, v in doc.items() if k != '_id'}
+        """Apply an inclusion projection, or just exclude _id"""
+        included = [k for k, v in projection.items() if v and k != '_id']
+        if included:
+            result = {k: copy.deepcopy(doc[k]) for k in included if k in doc}
+            if projection.get('_id', 1) and '_id' in doc:
+                result['_id'] = doc['_id']
         else:
             result = copy.deepcopy(doc)
+            if projection.get('_id', 1) == 0:
+                result.pop('_id', None)
         return result
 
 
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+System tests for the truck/date availability index.
+
+Tests that the aggregated index matches the raw truck points and that the
+truck date combos, route centers and truck list built from it are correct.
+"""
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tests.system.test_helpers import setup_stubs, restore_modules, generate_gps_route, generate_single_stop_route
+from tests.system.fake_db import FakeMongoClient
+
+setup_stubs()
+
+import mongo
+from classes import TruckPoint, TruckDates, TruckDateStats
+from processVehicles import (computeAvailabilityIndex, getAvailabilityIndex, computeTruckDateCombos,
+                             computeRouteCenters, getStopPartitions, findStopsAll)
+from processStops import getTruckList
+from constants import TRUCK_ID_KEY
+
+restore_modules()
+
+
+class TestAvailabilityIndex(unittest.TestCase):
+    """Test availability index built from one aggregation pass"""
+
+    def setUp(self):
+        """Setup fake database with two trucks on overlapping dates"""
+        self.fake_client = FakeMongoClient()
+        mongo.client = self.fake_client
+        self.db = 'test_db'
+
+        self.route_a = generate_gps_route("TRUCK-A", 230, num_stops=2)
+        self.route_b = generate_single_stop_route("TRUCK-B", 231, duration_minutes=15)
+        TruckPoint.saveItems(self.route_a, self.db)
+        TruckPoint.saveItems(self.route_b, self.db)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.fake_client.reset()
+
+    def test_index_contains_only_populated_pairs(self):
+        """Only truck/date pairs with points should be indexed"""
+        index = computeAvailabilityIndex(self.db)
+
+        self.assertEqual(sorted(index.keys()), [(230, "TRUCK-A"), (231, "TRUCK-B")])
+
+    def test_index_stats(self):
+        """Counts, first/last time and mean position should match the points"""
+        stats = computeAvailabilityIndex(self.db)[(231, "TRUCK-B")]
+
+        self.assertEqual(stats.count, len(self.route_b))
+        self.assertEqual(stats.minTime, "09:00:00")
+        self.assertEqual(stats.maxTime, "09:15:00")
+        self.assertAlmostEqual(stats.lat, sum(p['lat'] for p in self.route_b) / len(self.route_b))
+
+    def test_index_is_materialized(self):
+        """The index should be stored and reused until points are written"""
+        computeAvailabilityIndex(self.db)
+        self.assertEqual(len(TruckDateStats.getItemList(self.db)), 2)
+
+        TruckDateStats.getTbl(self.db).remove({TRUCK_ID_KEY: "TRUCK-B"})
+        self.assertEqual(len(getAvailabilityIndex(self.db)), 1)
+
+    def test_index_rebuilt_after_writes(self):
+        """Points written after the index was built should be indexed"""
+        self.fake_client.reset()
+        TruckPoint.saveItems(self.route_a, self.db)
+        self.assertEqual(len(findStopsAll(self.db, trucks=["TRUCK-A", "TRUCK-B"], workers=1)), 2)
+
+        TruckPoint.saveItems(self.route_b, self.db)
+        self.assertEqual(len(findStopsAll(self.db, trucks=["TRUCK-A", "TRUCK-B"], workers=1)), 3)
+        self.assertEqual(getTruckList(self.db), {"TRUCK-A": len(self.route_a), "TRUCK-B": len(self.route_b)})
+
+        TruckPoint.deleteItems(self.db)
+        self.assertEqual(getAvailabilityIndex(self.db), {})
+
+    def test_truck_date_combos(self):
+        """Availability should be True only for dates a truck has points on"""
+        computeTruckDateCombos(self.db)
+        combos = {td.dateNum: td.availability for td in TruckDates.getItemList(self.db)}
+
+        self.assertEqual(combos[230], {"TRUCK-A": True, "TRUCK-B": False})
+        self.assertEqual(combos[231], {"TRUCK-A": False, "TRUCK-B": True})
+
+    def test_route_centers(self):
+        """Route centers should come from the index for available trucks"""
+        computeTruckDateCombos(self.db)
+        computeRouteCenters(self.db)
+        truckDates = TruckDates.findItem('dateNum', 230, self.db)
+
+        self.assertIsNone(truckDates.routeCenters["TRUCK-B"])
+        center = truckDates.routeCenters["TRUCK-A"]
+        self.assertAlmostEqual(center['lat'], sum(p['lat'] for p in self.route_a) / len(self.route_a))
+
+    def test_truck_list_counts(self):
+        """Truck list should count points per truck"""
+        self.assertEqual(getTruckList(self.db), {"TRUCK-A": len(self.route_a), "TRUCK-B": len(self.route_b)})
+
+    def test_partitions_skip_empty_pairs(self):
+        """Stop partitions should not include trucks without points that day"""
+        index = getAvailabilityIndex(self.db)
+        partitions = getStopPartitions(self.db, None, ["TRUCK-A", "TRUCK-B"], [230, 231, 232], index)
+
+        self.assertEqual([(p[2], p[3]) for p in partitions], [(230, ["TRUCK-A"]), (231, ["TRUCK-B"])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+System tests for the columnar truck point store.
+
+Tests that points loaded column by column read back the same values as the
+stored documents, and that stop detection and metrics give the same results
+for columns as for lists of TruckPoint objects.
+"""
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tests.system.test_helpers import setup_stubs, restore_modules, generate_gps_route, generate_single_stop_route
+from tests.system.fake_db import FakeMongoClient
+
+setup_stubs()
+
+import mongo
+from classes import TruckPoint
+from columnar import TruckPointColumns, TruckPointRow
+from processVehicles import detectStops, getTruckPointsForDate
+from processStops import getDistanceTraveled, getTimeOnRoad
+
+restore_modules()
+
+
+class TestTruckPointColumns(unittest.TestCase):
+    """Test loading and reading columnar truck points"""
+
+    def setUp(self):
+        """Setup fake database with two trucks on one date"""
+        self.fake_client = FakeMongoClient()
+        mongo.client = self.fake_client
+        self.db = 'test_db'
+
+        self.route_a = generate_gps_route("TRUCK-A", 230, num_stops=2)
+        self.route_b = generate_single_stop_route("TRUCK-B", 230)
+        TruckPoint.saveItems(self.route_a + self.route_b, self.db)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.fake_client.reset()
+
+    def test_rows_match_documents(self):
+        """Every loaded field should read back as stored"""
+        columns = TruckPointColumns.load({'truckId': "TRUCK-A"}, self.db, fields=None)
+        route = self.route_a
+
+        self.assertEqual(len(columns), len(route))
+        for row, doc in zip(columns, route):
+            expected = {k: v for k, v in doc.items() if k != '_id'}
+            self.assertEqual(row.getItem(), expected)
+
+    def test_row_view_attributes(self):
+        """Rows should expose TruckPoint attribute names"""
+        columns = TruckPointColumns.load({'truckId': "TRUCK-B"}, self.db)
+        row = columns[-1]
+
+        self.assertIsInstance(row, TruckPointRow)
+        self.assertEqual(row.truckId, "TRUCK-B")
+        self.assertEqual(row.time, self.route_b[-1]['time'])
+        self.assertEqual(row.lat, self.route_b[-1]['lat'])
+        with self.assertRaises(AttributeError):
+            row.velocity
+
+    def test_slices_share_categories(self):
+        """Slicing and masking should return columns with the same values"""
+        columns = TruckPointColumns.load({}, self.db)
+        subset = columns[columns.lats > columns.lats.mean()]
+
+        self.assertIsInstance(subset, TruckPointColumns)
+        self.assertTrue(all(row.lat > columns.lats.mean() for row in subset))
+        self.assertEqual(subset.categories, columns.categories)
+
+    def test_group_by_truck(self):
+        """Grouping should keep point order and first appearance order"""
+        groups = getTruckPointsForDate(230, ["TRUCK-A", "TRUCK-B"], self.db)
+
+        self.assertEqual(list(groups.keys()), ["TRUCK-A", "TRUCK-B"])
+        self.assertEqual(groups["TRUCK-B"].getValues('time'), [p['time'] for p in self.route_b])
+
+    def test_empty_load(self):
+        """No matching points should give empty columns and no groups"""
+        columns = TruckPointColumns.load({'truckId': "NONE"}, self.db)
+
+        self.assertEqual(len(columns), 0)
+        self.assertEqual(columns.groupBy('truckId'), {})
+        self.assertEqual(detectStops(columns), [])
+
+    def test_smaller_than_documents(self):
+        """Track fields should take a few bytes per point"""
+        columns = TruckPointColumns.load({}, self.db)
+
+        self.assertLessEqual(columns.nbytes, 32 * len(columns))
+
+
+class TestColumnarProcessing(unittest.TestCase):
+    """Test that columnar points give the same stops and metrics"""
+
+    def setUp(self):
+        """Setup fake database with one route"""
+        self.fake_client = FakeMongoClient()
+        mongo.client = self.fake_client
+        self.db = 'test_db'
+        TruckPoint.saveItems(generate_gps_route("TRUCK-A", 230, num_stops=3), self.db)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.fake_client.reset()
+
+    def test_detect_stops_matches_truck_points(self):
+        """Stops from columns should match stops from TruckPoint objects"""
+        objects = detectStops(TruckPoint.find({}, self.db))
+        columns = detectStops(TruckPointColumns.load({}, self.db))
+
+        self.assertEqual(len(columns), 3)
+        self.assertEqual([(s['point'].lat, s['point'].lon, s['radius'], s['startStop']) for s in columns],
+                         [(s['point'].lat, s['point'].lon, s['radius'], s['startStop']) for s in objects])
+
+    def test_metrics_match_truck_points(self):
+        """Distance and time on road should not depend on the container"""
+        objects = TruckPoint.find({}, self.db)
+        columns = TruckPointColumns.load({}, self.db)
+
+        self.assertAlmostEqual(getDistanceTraveled(columns), getDistanceTraveled(objects))
+        self.assertAlmostEqual(getTimeOnRoad(columns), getTimeOnRoad(objects))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+System tests for the DBItem query helpers.
+
+Tests lazy iteration with sort and projection hints and the server side
+count helpers against the fake database.
+"""
+
+import unittest
+import types
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tests.system.test_helpers import setup_stubs, restore_modules, generate_gps_route, generate_single_stop_route
+from tests.system.fake_db import FakeMongoClient
+
+setup_stubs()
+
+import mongo
+from classes import TruckPoint
+from processStops import getDateByDatenum
+
+restore_modules()
+
+
+class TestDBItemQueries(unittest.TestCase):
+    """Test DBItem cursor options and aggregation helpers"""
+
+    def setUp(self):
+        """Setup fake database with two trucks over two dates"""
+        self.fake_client = FakeMongoClient()
+        mongo.client = self.fake_client
+        self.db = 'test_db'
+
+        self.route_a = generate_gps_route("TRUCK-A", 230, num_stops=2)
+        self.route_b = generate_single_stop_route("TRUCK-B", 231, duration_minutes=5)
+        TruckPoint.saveItems(self.route_a + self.route_b, self.db)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.fake_client.reset()
+
+    def test_iter_find_is_lazy(self):
+        """iterFind should return a generator of TruckPoints"""
+        points = TruckPoint.iterFind({'truckId': "TRUCK-B"}, self.db)
+
+        self.assertIsInstance(points, types.GeneratorType)
+        self.assertEqual([p.time for p in points], [p['time'] for p in self.route_b])
+
+    def test_sort_and_batch_size(self):
+        """Sort hints should order results, batch size should reach the cursor"""
+        points = TruckPoint.find({}, self.db, sort=[('dateNum', -1), ('time', 1)], batchSize=50)
+        self.assertEqual(points[0].truckId, "TRUCK-B")
+        self.assertEqual(points[0].time, self.route_b[0]['time'])
+
+        cursor = TruckPoint.getCursor(self.db, batchSize=50)
+        self.assertEqual(cursor.batch_size_hint, 50)
+
+    def test_projection(self):
+        """Projected documents should only carry the requested fields"""
+        items = list(TruckPoint.iterMongoItems(self.db, {'dateNum': 231}, {'lat': 1, 'lon': 1, '_id': 0}))
+
+        self.assertEqual(len(items), len(self.route_b))
+        self.assertEqual(set(items[0].keys()), {'lat', 'lon'})
+
+    def test_count_by(self):
+        """countBy should count points per value or per value tuple"""
+        self.assertEqual(TruckPoint.countBy('truckId', self.db),
+                         {"TRUCK-A": len(self.route_a), "TRUCK-B": len(self.route_b)})
+        self.assertEqual(TruckPoint.countBy(['truckId', 'dateNum'], self.db, {'dateNum': 231}),
+                         {("TRUCK-B", 231): len(self.route_b)})
+
+    def test_distinct_with_counts(self):
+        """Distinct values should come most common first"""
+        self.assertEqual(TruckPoint.distinctWithCounts('dateNum', self.db),
+                         [(230, len(self.route_a)), (231, len(self.route_b))])
+
+    def test_date_by_datenum(self):
+        """The date should come from one projected point"""
+        self.assertEqual(getDateByDatenum(231, self.db), self.route_b[0]['timestamp'].split('T')[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
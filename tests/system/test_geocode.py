@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+System tests for the cached reverse geocoder.
+
+Tests that lookups are deduplicated, served from the in-memory and
+persistent caches, expire after the TTL, are rate limited and that stop
+addresses are back filled after the stops are saved.
+"""
+
+import unittest
+import threading
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tests.system.test_helpers import setup_stubs, restore_modules, generate_gps_route
+from tests.system.fake_db import FakeMongoClient
+from tests.unit.fakes import FakeClock
+
+setup_stubs()
+
+import mongo
+from classes import GeoAddress, TruckPoint, StopProperties
+from geocode import GeoCoder, GeoProvider, OfflineProvider, MemoryCache, TokenBucket, setGeoCoder
+from processStops import saveComputedStops, backfillStopAddresses
+from util import revGeoCode
+
+restore_modules()
+
+
+class CountingProvider(OfflineProvider):
+    """Offline provider that records every lookup"""
+
+    def __init__(self, addresses=None, default="Somewhere"):
+        OfflineProvider.__init__(self, addresses, default)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def reverse(self, lat, lon):
+        with self.lock:
+            self.calls.append((lat, lon))
+        return OfflineProvider.reverse(self, lat, lon)
+
+
+class TestGeoCoder(unittest.TestCase):
+    """Test geocoder caching with a fake database"""
+
+    def setUp(self):
+        """Setup fake database and an offline geocoder"""
+        self.fake_client = FakeMongoClient()
+        mongo.client = self.fake_client
+        self.db = 'test_db'
+        self.clock = FakeClock(1000000.0)
+        self.provider = CountingProvider({(37.4419, -122.143): "1 Main St"})
+        self.coder = self.make_coder()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.fake_client.reset()
+        setGeoCoder(None)
+
+    def make_coder(self, **kwargs):
+        kwargs.setdefault('workers', 1)
+        return GeoCoder(self.provider, db=self.db, rate=None, clock=self.clock, **kwargs)
+
+    def test_rounded_coordinates_share_lookup(self):
+        """Points within the rounding precision should use one lookup"""
+        addresses = self.coder.reverseMany([(37.44191, -122.14301), (37.44189, -122.14299), (37.4419, -122.143)])
+
+        self.assertEqual(addresses, ["1 Main St"] * 3)
+        self.assertEqual(self.provider.calls, [(37.4419, -122.143)])
+
+    def test_memory_cache_hit(self):
+        """Repeated lookups should not reach the provider"""
+        self.coder.reverse(37.4419, -122.143)
+        self.coder.reverse(37.4419, -122.143)
+
+        self.assertEqual(len(self.provider.calls), 1)
+
+    def test_persistent_cache_survives_new_geocoder(self):
+        """A new geocoder on the same db should read the stored address"""
+        self.coder.reverseMany([(37.4419, -122.143), (-33.47, -70.6422)])
+        self.assertEqual(len(GeoAddress.getItemList(self.db)), 2)
+
+        coder = self.make_coder()
+        self.assertEqual(coder.reverse(37.4419, -122.143), "1 Main St")
+        self.assertEqual(len(self.provider.calls), 2)
+
+    def test_ttl_expires_entries(self):
+        """Entries older than the TTL should be looked up again and purged"""
+        coder = self.make_coder(ttlDays=1)
+        coder.reverse(37.4419, -122.143)
+        self.clock.now += 2 * 86400
+
+        coder.reverse(37.4419, -122.143)
+        self.assertEqual(len(self.provider.calls), 2)
+        self.assertEqual(len(GeoAddress.getItemList(self.db)), 1)
+
+        coder.reverse(-33.47, -70.6422)
+        self.clock.now += 2 * 86400
+        coder.purge()
+        self.assertEqual(GeoAddress.getItemList(self.db), [])
+
+    def test_missing_address_not_cached(self):
+        """Coordinates without an address should be retried"""
+        self.provider.default = None
+        self.assertIsNone(self.coder.reverse(1.0, 1.0))
+        self.coder.reverse(1.0, 1.0)
+
+        self.assertEqual(len(self.provider.calls), 2)
+        self.assertEqual(GeoAddress.getItemList(self.db), [])
+
+    def test_thread_pool_lookups(self):
+        """Misses should be fetched by several threads and returned in order"""
+        coder = self.make_coder(workers=4)
+        latLons = [(10.0 + i, 20.0) for i in range(20)]
+        self.provider.addresses = {(10.0 + i, 20.0): "Street %d" % i for i in range(20)}
+
+        self.assertEqual(coder.reverseMany(latLons), ["Street %d" % i for i in range(20)])
+        self.assertEqual(len(self.provider.calls), 20)
+        self.assertEqual(len(GeoAddress.getItemList(self.db)), 20)
+
+    def test_rev_geo_code_uses_shared_geocoder(self):
+        """util.revGeoCode should go through the shared geocoder"""
+        setGeoCoder(self.coder)
+
+        self.assertEqual(revGeoCode(37.4419, -122.143), "1 Main St")
+        self.assertEqual(revGeoCode(37.4419, -122.143), "1 Main St")
+        self.assertEqual(len(self.provider.calls), 1)
+
+    def test_provider_without_reverse_rejected(self):
+        """A provider that cannot look up addresses should not be created"""
+        class EmptyProvider(GeoProvider):
+            pass
+
+        with self.assertRaises(TypeError):
+            EmptyProvider()
+
+
+class TestMemoryCache(unittest.TestCase):
+    """Test the LRU front cache"""
+
+    def test_evicts_least_recently_used(self):
+        """The oldest unused key should be evicted first"""
+        cache = MemoryCache(2, ttl=100)
+        cache.put("a", "A", 0)
+        cache.put("b", "B", 0)
+        cache.get("a", 1)
+        cache.put("c", "C", 1)
+
+        self.assertIsNone(cache.get("b", 1))
+        self.assertEqual(cache.get("a", 1), ("A", 0))
+        self.assertEqual(len(cache), 2)
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test the rate limit on provider calls"""
+
+    def test_waits_for_token(self):
+        """Calls beyond the available tokens should sleep until one refills"""
+        clock = FakeClock()
+        bucket = TokenBucket(1.0, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        clock.now += 0.25
+        bucket.acquire()
+        bucket.acquire()
+
+        self.assertEqual(clock.sleeps, [0.75, 1.0])
+
+    def test_burst(self):
+        """A full bucket should allow capacity calls without waiting"""
+        clock = FakeClock()
+        bucket = TokenBucket(2.0, capacity=3, clock=clock, sleep=clock.sleep)
+        for i in range(4):
+            bucket.acquire()
+
+        self.assertEqual(clock.sleeps, [0.5])
+
+    def test_no_rate_never_waits(self):
+        """A rate of None should disable limiting"""
+        clock = FakeClock()
+        bucket = TokenBucket(None, clock=clock, sleep=clock.sleep)
+        for i in range(5):
+            bucket.acquire()
+
+        self.assertEqual(clock.sleeps, [])
+
+
+class TestAddressBackfill(unittest.TestCase):
+    """Test that stop addresses are filled in after stops are stored"""
+
+    def setUp(self):
+        """Setup fake database with one truck making two stops"""
+        self.fake_client = FakeMongoClient()
+        mongo.client = self.fake_client
+        self.db = 'test_db'
+        TruckPoint.saveItems(generate_gps_route("TRUCK-A", 230, num_stops=2), self.db)
+        self.provider = CountingProvider()
+        setGeoCoder(GeoCoder(self.provider, db=self.db, rate=None, workers=2))
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.fake_client.reset()
+        setGeoCoder(None)
+
+    def test_save_computed_stops_backfills(self):
+        """Stored and returned stop properties should have addresses"""
+        props = saveComputedStops(self.db)
+
+        self.assertTrue(props)
+        self.assertEqual({p['address'] for p in props}, {"Somewhere"})
+        self.assertEqual({p.address for p in StopProperties.getItemList(self.db)}, {"Somewhere"})
+
+    def test_deferred_backfill(self):
+        """Stops saved without geocoding should be filled by a later backfill"""
+        props = saveComputedStops(self.db, geocode=False)
+        self.assertEqual(self.provider.calls, [])
+        self.assertEqual({p.address for p in StopProperties.getItemList(self.db)}, {None})
+
+        filled = backfillStopAddresses(self.db)
+        self.assertEqual(sorted(filled), sorted(p['id'] for p in props))
+        self.assertEqual(StopProperties.getTbl(self.db).bulk_writes, [len(props)])
+        self.assertEqual({p.address for p in StopProperties.getItemList(self.db)}, {"Somewhere"})
+        self.assertEqual(backfillStopAddresses(self.db), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,14 +11,24 @@ import types
 from datetime import datetime, timedelta
 
 
+# Modules replaced by setup_stubs, put back by restore_modules
+_replaced_modules = {}
+
+
+def _stub_module(name, module):
+    _replaced_modules.setdefault(name, sys.modules.get(name))
+    sys.modules[name] = module
+
+
 def setup_stubs():
     """Setup stubs for external dependencies (geopy, xlrd, requests, pymongo)"""
     
-    from tests.system.fake_db import FakeMongoClient
+    from tests.system.fake_db import FakeMongoClient, UpdateOne
     
     pymongo = types.ModuleType('pymongo')
     pymongo.MongoClient = FakeMongoClient
-    sys.modules['pymongo'] = pymongo
+    pymongo.UpdateOne = UpdateOne
+    _stub_module('pymongo', pymongo)
     
     geopy = types.ModuleType('geopy')
     geocoders = types.ModuleType('geopy.geocoders')
@@ -33,12 +43,12 @@ def setup_stubs():
             return MockLocation()
     
     geocoders.Nominatim = MockNominatim
-    sys.modules['geopy'] = geopy
-    sys.modules['geopy.geocoders'] = geocoders
+    _stub_module('geopy', geopy)
+    _stub_module('geopy.geocoders', geocoders)
     
     xlrd = types.ModuleType('xlrd')
     xlrd.xldate_as_tuple = lambda value, datemode: (2014, 8, 11, 0, 0, 0)
-    sys.modules['xlrd'] = xlrd
+    _stub_module('xlrd', xlrd)
     
     requests = types.ModuleType('requests')
     
@@ -49,7 +59,7 @@ def setup_stubs():
         return MockResponse()
     
     requests.post = mock_post
-    sys.modules['requests'] = requests
+    _stub_module('requests', requests)
     
     gridfs = types.ModuleType('gridfs')
     
@@ -70,7 +80,22 @@ def setup_stubs():
             pass
     
     gridfs.GridFS = MockGridFS
-    sys.modules['gridfs'] = gridfs
+    _stub_module('gridfs', gridfs)
+
+
+def restore_modules():
+    """
+    Put back the modules replaced by setup_stubs.
+    
+    Call once the legacy modules are imported, so they keep the stubs
+    while the bhulan package and later tests get the real modules.
+    """
+    for name, module in _replaced_modules.items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
+    _replaced_modules.clear()
 
 
 def generate_gps_route(truck_id, date_num, num_stops=3):
@@ -15,7 +15,7 @@ import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from tests.system.test_helpers import setup_stubs, generate_gps_route
+from tests.system.test_helpers import setup_stubs, restore_modules, generate_gps_route
 from tests.system.fake_db import FakeMongoClient
 
 setup_stubs()
@@ -24,6 +24,8 @@ import mongo
 from classes import TruckPoint
 from processStops import getTotalDistanceTraveled, getTotalTimeOnRoad, getAverageSpeedByDatenum
 
+restore_modules()
+
 
 class TestMetricsCalculations(unittest.TestCase):
     """Test metrics calculation functions with synthetic GPS data"""
@@ -12,7 +12,7 @@ import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from tests.system.test_helpers import setup_stubs, generate_gps_route, generate_single_stop_route, assert_stop_near, assert_duration_near
+from tests.system.test_helpers import setup_stubs, restore_modules, generate_gps_route, generate_single_stop_route, assert_stop_near, assert_duration_near
 from tests.system.fake_db import FakeMongoClient
 
 setup_stubs()
@@ -22,6 +22,8 @@ from classes import TruckPoint
 from processVehicles import findStops, findStopsAll, getGPSFrequency
 from init import MIN_STOP_TIME, CONSTRAINT
 
+restore_modules()
+
 
 class TestStopDetection(unittest.TestCase):
     """Test stop detection algorithm with synthetic GPS data"""
@@ -179,6 +181,34 @@ class TestStopDetection(unittest.TestCase):
             self.assertIsInstance(lon, float)
             self.assertGreater(radius, 0)
 
+    def test_findStopsAll_parallel_matches_serial(self):
+        """Test that worker processes return the same ordered rows as the serial run"""
+        trucks = ["TRUCK-A", "TRUCK-B", "TRUCK-C"]
+        dates = [230, 231]
+        
+        for truck_id in trucks:
+            for date_num in dates:
+                points = generate_gps_route(truck_id, date_num, num_stops=2)
+                TruckPoint.saveItems(points, self.db)
+        
+        serial = findStopsAll(self.db, constraint=CONSTRAINT, trucks=trucks,
+                              datenums=dates, workers=1)
+        parallel = findStopsAll(self.db, constraint=CONSTRAINT, trucks=trucks,
+                                datenums=dates, workers=3, trucksPerPartition=2)
+        
+        self.assertEqual(len(serial), 12)
+        self.assertEqual(parallel, serial)
+    
+    def test_findStopsAll_skips_trucks_without_points(self):
+        """Test that trucks with no points for a date produce no rows"""
+        points = generate_gps_route("TRUCK-A", 230, num_stops=2)
+        TruckPoint.saveItems(points, self.db)
+        
+        all_stops = findStopsAll(self.db, constraint=CONSTRAINT,
+                                 trucks=["TRUCK-A", "TRUCK-Z"], datenums=[230])
+        
+        self.assertEqual([row[1] for row in all_stops], ["TRUCK-A", "TRUCK-A"])
+
 
 class TestGPSFrequency(unittest.TestCase):
     """Test GPS frequency calculation"""
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+System tests for merging detected stops across trucks and dates.
+
+Tests that the grid spatial index used by mergeStops/computeStopData
+returns exactly what the brute force scan over every stop returns.
+"""
+
+import unittest
+import random
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tests.system.test_helpers import setup_stubs, restore_modules
+
+setup_stubs()
+
+from spatial import GridIndex, LinearIndex, SpatialIndex
+from processStops import mergeStops
+from init import CONSTRAINT
+from constants import DURATION_KEY
+
+restore_modules()
+
+
+def generate_stop_rows(center_lat, center_lon, num_rows=500, num_sites=20, seed=7):
+    """Generate findStopsAll style rows scattered around a few stop sites"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(num_rows):
+        site = rng.randrange(num_sites)
+        lat = center_lat + (site % 5) * 0.0002 + rng.gauss(0, 0.00008)
+        lon = center_lon + (site // 5) * 0.0002 + rng.gauss(0, 0.00008)
+        lat = max(-90.0, min(90.0, lat))
+        lon = ((lon + 180.0) % 360.0) - 180.0
+        rows.append([230 + i % 3, "TRUCK-%d" % (i % 4), lat, lon, 0.01, "8:05", "8:25"])
+    return rows
+
+
+class TestGridIndex(unittest.TestCase):
+    """Test grid index neighbour lookups"""
+
+    def test_query_finds_point_in_neighbouring_cell(self):
+        """Points on either side of a cell boundary should find each other"""
+        index = GridIndex(CONSTRAINT)
+        index.insert("a", 37.4419, -122.1430)
+        index.insert("b", 37.4419 + 0.0001, -122.1430)
+
+        self.assertEqual(sorted(index.query(37.4419, -122.1430, CONSTRAINT)), ["a", "b"])
+        self.assertEqual(len(index), 2)
+
+    def test_query_excludes_far_points(self):
+        """Points beyond the radius should not be returned"""
+        index = GridIndex(CONSTRAINT)
+        index.insert("near", 37.4419, -122.1430)
+        index.insert("far", 37.4519, -122.1430)
+
+        self.assertEqual(index.query(37.4419, -122.1430, CONSTRAINT), ["near"])
+
+    def test_query_across_date_line(self):
+        """Longitude cells should wrap around at +/-180"""
+        index = GridIndex(CONSTRAINT)
+        index.insert("east", 0.0, 179.99995)
+
+        self.assertEqual(index.query(0.0, -179.99995, CONSTRAINT), ["east"])
+
+    def test_query_empty_index(self):
+        """Querying an empty index should return no keys"""
+        self.assertEqual(GridIndex(CONSTRAINT).query(0.0, 0.0, CONSTRAINT), [])
+
+    def test_incomplete_index_rejected(self):
+        """An index missing part of the interface should not be created"""
+        class InsertOnlyIndex(SpatialIndex):
+            def insert(self, key, lat, lon):
+                pass
+
+        with self.assertRaises(TypeError):
+            InsertOnlyIndex()
+
+
+class TestMergeStops(unittest.TestCase):
+    """Test that grid based merging matches the brute force merge"""
+
+    def assert_same_merge(self, rows):
+        grid = mergeStops(rows)
+        linear = mergeStops(rows, LinearIndex())
+
+        self.assertEqual(list(grid.keys()), list(linear.keys()))
+        self.assertEqual(grid, linear)
+
+    def test_merge_matches_linear_scan(self):
+        """Same stop IDs and stats lists as scanning every stop"""
+        self.assert_same_merge(generate_stop_rows(-33.469994, -70.642193))
+
+    def test_merge_matches_linear_scan_at_date_line(self):
+        """Same result when stops straddle the date line"""
+        self.assert_same_merge(generate_stop_rows(0.0, 179.9999))
+
+    def test_merge_matches_linear_scan_near_pole(self):
+        """Same result where longitude cells collapse near the pole"""
+        self.assert_same_merge(generate_stop_rows(89.9995, 10.0))
+
+    def test_first_row_starts_stop_one(self):
+        """Stop IDs should start at 1 and increase for each new location"""
+        rows = [
+            [230, "TRUCK-A", 37.4419, -122.1430, 0.01, "8:05", "8:25"],
+            [230, "TRUCK-B", 37.44191, -122.1430, 0.01, "9:05", "9:25"],
+            [230, "TRUCK-A", 37.4519, -122.1430, 0.01, "10:05", "10:25"],
+        ]
+        stops = mergeStops(rows)
+
+        self.assertEqual([key[0] for key in stops], [1, 2])
+        self.assertEqual(len(stops[(1, 37.4419, -122.1430)]), 2)
+        self.assertEqual(stops[(1, 37.4419, -122.1430)][1][DURATION_KEY], 20.0)
+
+    def test_empty_master_list(self):
+        """No rows should give no stops"""
+        self.assertEqual(mergeStops([]), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+System tests for stop / stop property reporting queries.
+
+Tests that the reporting functions resolve stops and stop properties with
+a fixed number of queries and return the same results as looking each one
+up individually.
+"""
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from tests.system.test_helpers import setup_stubs, restore_modules
+from tests.system.fake_db import FakeMongoClient
+
+setup_stubs()
+
+import mongo
+from mongo import IdentityMap
+from classes import Stop, StopProperties
+from processStops import (getStopsFromTruckDate, getStopByDuration, getStopStatistics,
+                          getStopPropsFromStopId, getStopPropsFromStopIds)
+
+restore_modules()
+
+SANTI_LAT = -33.469994
+SANTI_LON = -70.642193
+
+
+def make_stop_data(num_stops=5, props_per_stop=4):
+    """Build stops near Santiago and props spread over two trucks"""
+    stops = []
+    props = []
+    prop_id = 1
+    for stop_id in range(1, num_stops + 1):
+        lat = SANTI_LAT + stop_id * 0.01
+        stops.append({'id': stop_id, 'lat': lat, 'lon': SANTI_LON})
+        for i in range(props_per_stop):
+            props.append({
+                'id': prop_id,
+                'stopPropId': stop_id,
+                'lat': lat,
+                'lon': SANTI_LON,
+                'truckId': "TRUCK-%d" % (i % 2),
+                'dateNum': 230 + i // 2,
+                'duration': str(60 * (stop_id + i)),
+                'time': "8:%02d" % i,
+                'radius': 0.01,
+                'address': None,
+            })
+            prop_id += 1
+    return stops, props
+
+
+class CountingFind:
+    """Wraps a fake collection's find to count queries"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.original = collection.find
+        self.calls = 0
+        collection.find = self
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.original(*args, **kwargs)
+
+
+class TestStopQueries(unittest.TestCase):
+    """Test batched stop lookups"""
+
+    def setUp(self):
+        """Setup fake database with stops and stop properties"""
+        self.fake_client = FakeMongoClient()
+        mongo.client = self.fake_client
+        self.db = 'test_db'
+
+        stops, props = make_stop_data()
+        Stop.saveItems(stops, self.db)
+        StopProperties.saveItems(props, self.db)
+        self.stop_finds = CountingFind(self.fake_client[self.db]['stops'])
+        self.prop_finds = CountingFind(self.fake_client[self.db]['stopProps'])
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.fake_client.reset()
+
+    def test_stops_from_truck_date(self):
+        """One prop per distinct stop, with one stop query"""
+        stops = getStopsFromTruckDate("TRUCK-0", 230, self.db)
+
+        self.assertEqual(sorted(stops.keys()), [1, 2, 3, 4, 5])
+        self.assertTrue(all(prop.stopPropId == stop_id for stop_id, prop in stops.items()))
+        self.assertEqual(self.stop_finds.calls, 1)
+
+    def test_stops_from_truck_all_dates(self):
+        """Without a date the first prop of each stop should be kept"""
+        stops = getStopsFromTruckDate("TRUCK-1", db=self.db)
+
+        self.assertEqual(len(stops), 5)
+        self.assertEqual(stops[1].dateNum, 230)
+        self.assertEqual(self.stop_finds.calls, 1)
+
+    def test_props_from_stop_ids(self):
+        """Grouped props should match per stop lookups"""
+        grouped = getStopPropsFromStopIds([1, 2, 3], self.db)
+        self.assertEqual(self.prop_finds.calls, 1)
+
+        for stop_id in [1, 2, 3]:
+            single = getStopPropsFromStopId(stop_id, self.db)
+            self.assertEqual(sorted(grouped[stop_id].keys()), sorted(single.keys()))
+
+    def test_stop_by_duration(self):
+        """Long stops should be found with one query per collection"""
+        retd = getStopByDuration(5, self.db)
+
+        self.assertEqual(sorted(retd.keys()), [3, 4, 5])
+        self.assertEqual([row[0] for row in retd[3]], [12])
+        self.assertEqual(len(retd[5]), 3)
+        self.assertEqual(self.stop_finds.calls, 1)
+        self.assertEqual(self.prop_finds.calls, 1)
+
+    def test_stop_statistics(self):
+        """Statistics should read each stop once"""
+        stprops, stops = getStopStatistics("TRUCK-0", 231, self.db)
+
+        self.assertEqual(len(stprops), 5)
+        self.assertEqual(len(stops), 5)
+        self.assertEqual(self.stop_finds.calls, 1)
+
+
+class TestIdentityMap(unittest.TestCase):
+    """Test the per request object cache"""
+
+    def setUp(self):
+        """Setup fake database with stops"""
+        self.fake_client = FakeMongoClient()
+        mongo.client = self.fake_client
+        self.db = 'test_db'
+        Stop.saveItems(make_stop_data()[0], self.db)
+        self.finds = CountingFind(self.fake_client[self.db]['stops'])
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.fake_client.reset()
+
+    def test_objects_loaded_once(self):
+        """Known keys, found or not, should not be queried again"""
+        stop_map = IdentityMap(Stop, self.db)
+        first = stop_map.getMany([1, 2, 99])
+
+        self.assertEqual(sorted(first.keys()), [1, 2])
+        self.assertIs(stop_map.get(1), first[1])
+        self.assertIsNone(stop_map.get(99))
+        self.assertEqual(self.finds.calls, 1)
+
+        stop_map.getMany([2, 3])
+        self.assertEqual(self.finds.calls, 2)
+        self.assertEqual(len(stop_map), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,8 @@
 Smoke test to verify all modules can be imported under Python 3.
 
 This test stubs external dependencies (pymongo, geopy, xlrd) to avoid
-requiring database connections or network calls.
+requiring database connections or network calls. The stubs are only
+installed while the tests of this module run.
 """
 
 import unittest
@@ -43,7 +44,6 @@ class MockCollection:
         return []
 
 pymongo.MongoClient = MockMongoClient
-sys.modules['pymongo'] = pymongo
 
 gridfs = types.ModuleType('gridfs')
 
@@ -64,7 +64,6 @@ class MockGridFS:
         pass
 
 gridfs.GridFS = MockGridFS
-sys.modules['gridfs'] = gridfs
 
 geopy = types.ModuleType('geopy')
 geocoders = types.ModuleType('geopy.geocoders')
@@ -79,8 +78,6 @@ class MockNominatim:
         return MockLocation()
 
 geocoders.Nominatim = MockNominatim
-sys.modules['geopy'] = geopy
-sys.modules['geopy.geocoders'] = geocoders
 
 xlrd = types.ModuleType('xlrd')
 xlrd.xldate_as_tuple = lambda value, datemode: (1900, 1, 1, 0, 0, 0)
@@ -99,7 +96,6 @@ class MockWorksheet:
         return [MockCell() for _ in range(11)]
 
 xlrd.open_workbook = lambda filename: MockWorkbook()
-sys.modules['xlrd'] = xlrd
 
 requests = types.ModuleType('requests')
 
@@ -110,7 +106,33 @@ def mock_post(*args, **kwargs):
     return MockResponse()
 
 requests.post = mock_post
-sys.modules['requests'] = requests
+
+STUBS = {
+    'pymongo': pymongo,
+    'gridfs': gridfs,
+    'geopy': geopy,
+    'geopy.geocoders': geocoders,
+    'xlrd': xlrd,
+    'requests': requests,
+}
+replaced_modules = {}
+
+
+def setUpModule():
+    """Install the stubs while this module's tests import the legacy modules"""
+    for name, module in STUBS.items():
+        replaced_modules[name] = sys.modules.get(name)
+        sys.modules[name] = module
+
+
+def tearDownModule():
+    """Put back the real modules, so later tests do not import the stubs"""
+    for name, module in replaced_modules.items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
+    replaced_modules.clear()
 
 
 class TestPython3Imports(unittest.TestCase):
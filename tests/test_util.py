@@ -31,10 +31,14 @@ xlrd = types.ModuleType('xlrd')
 xlrd.xldate_as_tuple = lambda value, datemode: (1900, 1, 1, 0, 0, 0)
 sys.modules['xlrd'] = xlrd
 
+import numpy as np
+
 from util import (
     kilDist, mileDist, meterDist, findArc, euclidean,
     getMeters, getCoord, getLineForItems, getTimeDeltas,
-    addIfKey, getIfKey, getLat, getLon
+    addIfKey, getIfKey, getLat, getLon,
+    getLatLons, kilDists, mileDists, meterDists, kilDistsFrom,
+    pairwiseKilDists, legKilDists
 )
 
 
@@ -255,5 +259,66 @@ class TestEdgeCases(unittest.TestCase):
         self.assertGreaterEqual(arc, 0)
 
 
+class TestVectorizedDistanceFunctions(unittest.TestCase):
+    """Test the batched numpy distance kernel against the scalar functions"""
+    
+    def setUp(self):
+        self.points = [
+            {'lat': 37.4419, 'lon': -122.1430},
+            {'lat': 37.4467, 'lon': -122.1589},
+            {'lat': 37.4419, 'lon': -122.1430},
+            {'lat': 0.0, 'lon': 179.0},
+            {'lat': 0.0, 'lon': -179.0},
+        ]
+        self.lats, self.lons = getLatLons(self.points)
+    
+    def test_getLatLons_returns_arrays(self):
+        """Lat/lon extraction should give float arrays in point order"""
+        self.assertEqual(self.lats.dtype, np.float64)
+        self.assertEqual(list(self.lats), [p['lat'] for p in self.points])
+        self.assertEqual(list(self.lons), [p['lon'] for p in self.points])
+    
+    def test_point_to_point_matches_kilDist(self):
+        """Elementwise distances should match the scalar kilDist"""
+        dists = kilDists(self.lats[:-1], self.lons[:-1], self.lats[1:], self.lons[1:])
+        for i in range(len(self.points) - 1):
+            expected = kilDist(self.points[i], self.points[i + 1])
+            self.assertAlmostEqual(dists[i], expected, delta=1e-6)
+    
+    def test_units_are_consistent(self):
+        """Mile and meter variants should scale the same arcs"""
+        km = kilDists(0.0, 0.0, 1.0, 0.0)
+        self.assertAlmostEqual(float(km), 111.19, delta=0.6)
+        self.assertAlmostEqual(float(meterDists(0.0, 0.0, 1.0, 0.0)), float(km) * 1000, delta=1e-6)
+        self.assertAlmostEqual(float(mileDists(0.0, 0.0, 1.0, 0.0)), mileDist({'lat': 0.0, 'lon': 0.0}, {'lat': 1.0, 'lon': 0.0}), delta=1e-6)
+    
+    def test_point_to_many(self):
+        """Distances from one point to many should match per-pair kilDist"""
+        dists = kilDistsFrom(self.points[0], self.points)
+        self.assertEqual(dists.shape, (len(self.points),))
+        self.assertEqual(dists[0], 0)
+        self.assertEqual(dists[2], 0)
+        self.assertAlmostEqual(dists[1], kilDist(self.points[0], self.points[1]), delta=1e-6)
+    
+    def test_pairwise_matrix(self):
+        """Pairwise matrix should be symmetric with a zero diagonal"""
+        matrix = pairwiseKilDists(self.lats, self.lons)
+        self.assertEqual(matrix.shape, (5, 5))
+        self.assertTrue(np.allclose(matrix, matrix.T))
+        self.assertTrue(np.all(np.diag(matrix) == 0))
+        self.assertAlmostEqual(matrix[3, 4], kilDist(self.points[3], self.points[4]), delta=1e-6)
+    
+    def test_short_distances_are_stable(self):
+        """Meter scale distances should be resolved without rounding to zero"""
+        dist = meterDists(37.4419, -122.1430, 37.44192, -122.1430)
+        self.assertAlmostEqual(float(dist), 2.224, delta=0.01)
+    
+    def test_legKilDists(self):
+        """Leg distances should have one entry per consecutive pair"""
+        legs = legKilDists(self.lats, self.lons)
+        self.assertEqual(legs.shape, (4,))
+        self.assertAlmostEqual(legs.sum(), sum(kilDist(self.points[i], self.points[i + 1]) for i in range(4)), delta=1e-5)
+
+
 if __name__ == '__main__':
     unittest.main()
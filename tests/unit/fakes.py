@@ -0,0 +1,141 @@
+"""
+Fakes for unit testing ingestion and storage without MongoDB.
+
+Provides an in-memory track point collection, a repository built on it,
+a job registry matching the queries used by backfill, a hand-advanced
+clock and sample source records.
+"""
+
+from datetime import datetime, timedelta
+from pymongo.errors import BulkWriteError
+from bhulan.models.canonical import TrackPoint
+from bhulan.storage.mongo_repo import MongoTrackPointRepository
+
+
+class FakeBulkResult:
+    """Minimal stand-in for pymongo's BulkWriteResult."""
+
+    def __init__(self, counts):
+        self.bulk_api_result = counts
+
+
+class FakeInsertResult:
+    """Minimal stand-in for pymongo's InsertManyResult."""
+
+    def __init__(self, ids):
+        self.inserted_ids = ids
+
+
+class FakeTrackCollection:
+    """In-memory collection with a unique _hash index."""
+
+    def __init__(self):
+        self.docs = {}
+        self.bulk_calls = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.bulk_calls.append((len(operations), ordered))
+        counts = {'nUpserted': 0, 'nMatched': 0, 'nModified': 0}
+        for op in operations:
+            doc = op._doc['$set']
+            existing = self.docs.get(doc['_hash'])
+            if existing is None:
+                self.docs[doc['_hash']] = dict(doc)
+                counts['nUpserted'] += 1
+            else:
+                counts['nMatched'] += 1
+                if existing != doc:
+                    existing.update(doc)
+                    counts['nModified'] += 1
+        return FakeBulkResult(counts)
+
+    def insert_many(self, docs, ordered=True):
+        self.bulk_calls.append((len(docs), ordered))
+        ids = []
+        errors = []
+        for i, doc in enumerate(docs):
+            if doc['_hash'] in self.docs:
+                errors.append({'index': i, 'code': 11000, 'errmsg': 'E11000 duplicate key'})
+            else:
+                self.docs[doc['_hash']] = dict(doc)
+                ids.append(doc['_hash'])
+        if errors:
+            raise BulkWriteError({'nInserted': len(ids), 'writeErrors': errors})
+        return FakeInsertResult(ids)
+
+
+def make_points(n, device_id="TRK-001"):
+    return [
+        TrackPoint(
+            device_id=device_id,
+            ts_utc=datetime(2024, 5, 1, 12, 0, 0) + timedelta(seconds=i),
+            lat=37.7749,
+            lon=-122.4194,
+            ingest_id="test",
+            seq_no=i
+        )
+        for i in range(n)
+    ]
+
+
+def make_repo(**kwargs):
+    repo = MongoTrackPointRepository(mongo_uri="mongodb://localhost:27017", db_name="bhulan_test", **kwargs)
+    repo.collection = FakeTrackCollection()
+    return repo
+
+
+class FakeJobRegistry:
+    """In-memory job registry matching equality and $in queries."""
+    
+    def __init__(self):
+        self.jobs = {}
+    
+    def create_job(self, ingest_id, source, params):
+        self.jobs[ingest_id] = {'ingest_id': ingest_id, 'source': source, 'params': params, 'status': 'running'}
+    
+    def update_job_status(self, ingest_id, status, stats=None, error_sample=None):
+        self.jobs[ingest_id].update(status=status, stats=stats, error_sample=error_sample)
+    
+    def get_job(self, ingest_id):
+        return self.jobs.get(ingest_id)
+    
+    def find_job(self, query):
+        for job in reversed(list(self.jobs.values())):
+            if all(self._matches(job, key, value) for key, value in query.items()):
+                return job
+        return None
+    
+    def _matches(self, job, key, value):
+        for part in key.split('.'):
+            job = job.get(part) if isinstance(job, dict) else None
+        if isinstance(value, dict):
+            return job in value['$in']
+        return job == value
+
+
+class FakeClock:
+    """Clock advanced by hand, or by sleep."""
+    
+    def __init__(self, now=0.0):
+        self.now = now
+        self.sleeps = []
+    
+    def __call__(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_records(n=3, device_id='TRK-1', lat=None):
+    """Source records one second apart along a short track, at a fixed lat if given."""
+    return [
+        {
+            'device_id': device_id,
+            'timestamp': f'2024-05-01T12:00:{i:02d}Z',
+            'lat': 37.0 + i / 1000 if lat is None else lat,
+            'lon': -122.5 + i / 1000
+        }
+        for i in range(n)
+    ]
@@ -0,0 +1,132 @@
+"""
+Unit tests for directory and glob ingestion.
+"""
+
+import os
+import pytest
+import pandas as pd
+from bhulan.ingestion import backfill
+from bhulan.ingestion.backfill import ingest_directory, list_source_files
+from tests.unit.fakes import FakeJobRegistry, make_records, make_repo
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    pd.DataFrame(make_records(5, 'TRK-1')).to_csv(tmp_path / "a.csv", index=False)
+    pd.DataFrame(make_records(5, 'TRK-2')).to_json(tmp_path / "b.json", orient='records')
+    (tmp_path / "~$a.xlsx").write_text("lock")
+    (tmp_path / "notes.txt").write_text("not gps")
+    (tmp_path / "sub").mkdir()
+    pd.DataFrame(make_records(5, 'TRK-3')).to_csv(tmp_path / "sub" / "c.csv", index=False)
+    return tmp_path
+
+
+class TestListSourceFiles:
+    """Test expansion of directories and patterns."""
+    
+    def test_directory(self, data_dir):
+        """Test lock files and unsupported types are left out."""
+        assert list_source_files(str(data_dir)) == [str(data_dir / "a.csv"), str(data_dir / "b.json")]
+    
+    def test_recursive_and_glob(self, data_dir):
+        """Test subdirectories and glob patterns."""
+        assert len(list_source_files(str(data_dir), recursive=True)) == 3
+        assert list_source_files(str(data_dir / "**" / "*.csv")) == [str(data_dir / "a.csv"), str(data_dir / "sub" / "c.csv")]
+
+
+class TestIngestDirectory:
+    """Test parallel ingestion of a directory with one job per file."""
+    
+    def setup_method(self):
+        self.repo = make_repo()
+        self.registry = FakeJobRegistry()
+    
+    def ingest(self, source, **kwargs):
+        return ingest_directory(str(source), repo=self.repo, job_registry=self.registry, max_inflight=2, **kwargs)
+    
+    def test_jobs_per_file(self, data_dir):
+        """Test every file gets a job under the parent job."""
+        result = self.ingest(data_dir, ingest_id='parent')
+        
+        assert sorted(result.ingested) == [str(data_dir / "a.csv"), str(data_dir / "b.json")]
+        assert (result.accepted, result.rejected) == (10, 0)
+        assert len(self.repo.collection.docs) == 10
+        
+        parent = self.registry.get_job('parent')
+        assert parent['status'] == 'succeeded'
+        assert parent['stats']['files'] == 2 and parent['stats']['accepted'] == 10
+        for path, ingest_id in result.ingested.items():
+            params = self.registry.get_job(ingest_id)['params']
+            assert params['parent_id'] == 'parent'
+            assert params['file_path'] == path
+            assert params['size'] == os.path.getsize(path)
+    
+    def test_rerun_skips_unchanged(self, data_dir, monkeypatch):
+        """Test unchanged files are skipped without reading them."""
+        first = self.ingest(data_dir)
+        
+        def no_hash(path, block_size=0):
+            raise AssertionError("unchanged file was read")
+        
+        monkeypatch.setattr(backfill, 'file_sha256', no_hash)
+        second = self.ingest(data_dir)
+        
+        assert second.ingested == {}
+        assert second.skipped == first.ingested
+    
+    def test_touched_and_changed_files(self, data_dir):
+        """Test touched files are skipped by content hash and changed files ingested."""
+        self.ingest(data_dir)
+        stat = os.stat(data_dir / "a.csv")
+        os.utime(data_dir / "a.csv", (stat.st_atime, stat.st_mtime + 60))
+        pd.DataFrame(make_records(3, 'TRK-9')).to_json(data_dir / "b.json", orient='records')
+        
+        result = self.ingest(data_dir)
+        
+        assert list(result.skipped) == [str(data_dir / "a.csv")]
+        assert list(result.ingested) == [str(data_dir / "b.json")]
+        assert result.accepted == 3
+    
+    def test_failed_file_retried(self, data_dir):
+        """Test failed files mark the parent partial and are retried."""
+        (data_dir / "bad.json").write_text("[{")
+        
+        result = self.ingest(data_dir, ingest_id='parent')
+        
+        assert list(result.failed) == [str(data_dir / "bad.json")]
+        assert self.registry.get_job('parent')['status'] == 'partial'
+        assert 2 in self.registry.get_job('parent')['error_sample']
+        
+        assert list(self.ingest(data_dir).failed) == [str(data_dir / "bad.json")]
+    
+    def test_force(self, data_dir):
+        """Test force ingests files again."""
+        self.ingest(data_dir)
+        
+        result = self.ingest(data_dir, force=True)
+        
+        assert len(result.ingested) == 2
+        assert result.skipped == {}
+    
+    def test_registry_error_marks_job_failed(self, data_dir, monkeypatch):
+        """Test a job is marked failed when ingestion fails outside the file."""
+        def failing_ingest(file_path, ingest_id, job_registry, **kwargs):
+            job_registry.create_job(ingest_id=ingest_id, source='file', params={'file_path': file_path})
+            raise RuntimeError("registry unavailable")
+        
+        monkeypatch.setattr(backfill, 'ingest_file', failing_ingest)
+        result = self.ingest(data_dir)
+        
+        assert len(result.failed) == 2
+        statuses = [job['status'] for job in self.registry.jobs.values() if job['source'] == 'file']
+        assert statuses == ['failed', 'failed']
+    
+    def test_worker_resources_reused(self, data_dir, monkeypatch):
+        """Test files ingested by a worker process share its repository and registry."""
+        monkeypatch.setitem(backfill._worker_resources, 'repo', self.repo)
+        monkeypatch.setitem(backfill._worker_resources, 'job_registry', self.registry)
+        
+        for path in list_source_files(str(data_dir)):
+            assert backfill._ingest_in_worker(path, 'parent', None, 'generic', False)['status'] == 'ingested'
+        
+        assert len(self.repo.collection.docs) == 10
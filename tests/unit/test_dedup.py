@@ -0,0 +1,139 @@
+"""
+Unit tests for in-process deduplication of recently written points.
+"""
+
+import os
+import threading
+import pytest
+from pymongo.errors import BulkWriteError
+from bhulan.storage.dedup import RecentHashFilter
+from tests.unit.fakes import FakeClock, make_points, make_repo
+
+
+def hashes(n, start=0):
+    return [i.to_bytes(16, 'big') for i in range(start, start + n)]
+
+
+class TestRecentHashFilter:
+    """Test the two-generation hash set."""
+
+    def test_filter_and_add(self):
+        """Added hashes are dropped from later documents."""
+        recent = RecentHashFilter(capacity=100, window_seconds=60)
+        recent.add(hashes(3))
+
+        fresh, dropped = recent.filter([{'_hash': h} for h in hashes(5)])
+
+        assert dropped == 3
+        assert [doc['_hash'] for doc in fresh] == hashes(2, start=3)
+
+    def test_capacity(self):
+        """The oldest generation is forgotten once newer hashes fill half the capacity."""
+        recent = RecentHashFilter(capacity=10, window_seconds=60)
+        for key in hashes(15):
+            recent.add([key])
+
+        assert hashes(1)[0] not in recent
+        assert all(key in recent for key in hashes(10, start=5))
+        assert len(recent) <= 10
+
+    def test_window(self):
+        """Hashes expire within the window."""
+        clock = FakeClock()
+        recent = RecentHashFilter(capacity=100, window_seconds=60, clock=clock)
+        recent.add(hashes(1))
+
+        clock.now = 40
+        recent.add(hashes(1, start=1))
+        assert all(key in recent for key in hashes(2))
+
+        clock.now = 90
+        recent.add([])
+        assert hashes(1)[0] not in recent
+        assert hashes(1, start=1)[0] in recent
+
+        clock.now = 200
+        recent.add([])
+        assert len(recent) == 0
+
+    def test_persistence(self, tmp_path):
+        """Saved hashes are remembered after a restart."""
+        path = str(tmp_path / "recent.bin")
+        recent = RecentHashFilter(capacity=100, window_seconds=60, path=path)
+        recent.add(hashes(5))
+        recent.save()
+
+        restarted = RecentHashFilter(capacity=100, window_seconds=60, path=path)
+
+        assert all(key in restarted for key in hashes(5))
+        assert len(restarted) == 5
+
+    def test_concurrent_saves(self, tmp_path):
+        """Filters saving to the same path at once each replace the whole file."""
+        path = str(tmp_path / "recent.bin")
+        filters = [RecentHashFilter(capacity=100, window_seconds=60, path=path) for _ in range(4)]
+        for i, recent in enumerate(filters):
+            recent.add(hashes(10, start=10 * i))
+
+        errors = []
+
+        def save_repeatedly(recent):
+            try:
+                for _ in range(50):
+                    recent.save()
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save_repeatedly, args=(recent,)) for recent in filters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert os.listdir(tmp_path) == ["recent.bin"]
+        assert len(RecentHashFilter(capacity=100, window_seconds=60, path=path)) == 10
+
+
+class TestRepositoryDedup:
+    """Test the filter in front of repository writes."""
+
+    def test_resends_not_sent(self):
+        """Points written recently are dropped before any bulk write."""
+        repo = make_repo(chunk_size=4)
+        points = make_points(6)
+        repo.write_batch(points)
+        calls = len(repo.collection.bulk_calls)
+
+        result = repo.write_batch(points[2:])
+
+        assert (result.inserted, result.modified, result.duplicates) == (0, 0, 4)
+        assert len(repo.collection.bulk_calls) == calls
+
+    def test_failed_write_not_remembered(self):
+        """Points of a failed write are written again on retry."""
+        repo = make_repo(insert_only=True)
+        points = make_points(3)
+        insert_many = repo.collection.insert_many
+
+        def failing_insert(docs, ordered=True):
+            raise BulkWriteError({'nInserted': 0, 'writeErrors': [{'index': 0, 'code': 121}]})
+
+        repo.collection.insert_many = failing_insert
+        with pytest.raises(BulkWriteError):
+            repo.write_batch(points)
+
+        repo.collection.insert_many = insert_many
+        assert repo.write_batch(points).inserted == 3
+
+    def test_shared_filter(self):
+        """A filter shared by repositories drops points written by either."""
+        recent = RecentHashFilter(capacity=100, window_seconds=60)
+        first = make_repo(dedup_filter=recent)
+        second = make_repo(dedup_filter=recent)
+        points = make_points(3)
+
+        first.write_batch(points)
+
+        assert second.write_batch(points).duplicates == 3
+        assert second.collection.bulk_calls == []
@@ -0,0 +1,174 @@
+"""
+Unit tests for streaming file readers.
+"""
+
+import io
+import json
+import pytest
+import pandas as pd
+from bhulan.ingestion.files import (
+    iter_json_array,
+    read_json_file,
+    read_excel_file,
+    detect_file_type,
+    read_parquet_file,
+    read_file_headers,
+    read_csv_frames,
+    read_parquet_frames,
+    infer_mapping_from_file,
+    ingest_file
+)
+from tests.unit.fakes import FakeJobRegistry, make_repo
+
+
+RECORDS = [
+    {'device_id': f'TRK-{i % 3}', 'timestamp': f'2024-05-01T12:00:{i:02d}', 'lat': 37.0 + i / 1000, 'lon': -122.5}
+    for i in range(25)
+]
+
+
+class TestJSONReaders:
+    """Test incremental JSON and NDJSON reading."""
+    
+    def test_json_array_chunks(self, tmp_path):
+        """Test JSON arrays are read in chunks."""
+        path = tmp_path / "points.json"
+        path.write_text(json.dumps(RECORDS, indent=2))
+        
+        chunks = list(read_json_file(str(path), chunk_size=10))
+        
+        assert [len(c) for c in chunks] == [10, 10, 5]
+        assert sum(chunks, []) == RECORDS
+    
+    def test_ndjson_chunks(self, tmp_path):
+        """Test NDJSON is read line by line, skipping blank lines."""
+        path = tmp_path / "points.jsonl"
+        path.write_text("\n".join(json.dumps(r) for r in RECORDS) + "\n\n")
+        
+        chunks = list(read_json_file(str(path), chunk_size=10))
+        
+        assert sum(chunks, []) == RECORDS
+    
+    def test_array_split_across_buffers(self):
+        """Test elements cut by the read buffer are parsed whole."""
+        text = ' [{"a": 1.5e3, "b": "x]"}, -12.25 ,[1, {}], "s"] '
+        
+        for buffer_size in [1, 2, 5, 64]:
+            values = list(iter_json_array(io.StringIO(text), buffer_size=buffer_size))
+            assert values == json.loads(text)
+    
+    def test_malformed_array(self):
+        """Test malformed arrays raise JSON errors."""
+        for text in ['[1 2]', '[1,]', '[1', '{"a": 1}', '[1]x', '[1,2]]', '[]   \n {}']:
+            with pytest.raises(json.JSONDecodeError):
+                list(iter_json_array(io.StringIO(text), buffer_size=2))
+
+
+class TestTabularReaders:
+    """Test Excel and Parquet streaming."""
+    
+    def test_excel_chunks(self, tmp_path):
+        """Test Excel rows are streamed in chunks."""
+        path = tmp_path / "points.xlsx"
+        pd.DataFrame(RECORDS).to_excel(path, index=False)
+        
+        chunks = list(read_excel_file(str(path), chunk_size=10))
+        
+        assert [len(c) for c in chunks] == [10, 10, 5]
+        assert sum(chunks, []) == RECORDS
+    
+    def test_xls_read_with_pandas(self, tmp_path, monkeypatch):
+        """Test legacy .xls workbooks, which openpyxl cannot open, are read with pandas."""
+        path = tmp_path / "points.xls"
+        path.write_bytes(b"BIFF workbook")
+        df = pd.DataFrame(RECORDS + [{}] + [dict(RECORDS[0], lon=None)])
+        monkeypatch.setattr(pd, 'read_excel', lambda file_path, nrows=None: df.head(nrows))
+        
+        chunks = list(read_excel_file(str(path), chunk_size=10))
+        
+        assert [len(c) for c in chunks] == [10, 10, 6]
+        assert sum(chunks, [])[:25] == RECORDS
+        assert chunks[-1][-1]['lon'] is None
+        assert read_file_headers(str(path), detect_file_type(str(path))) == ['device_id', 'timestamp', 'lat', 'lon']
+    
+    def test_parquet_chunks(self, tmp_path):
+        """Test Parquet row batches are streamed in chunks."""
+        pytest.importorskip("pyarrow")
+        path = tmp_path / "points.parquet"
+        pd.DataFrame(RECORDS).to_parquet(path, index=False)
+        
+        chunks = list(read_parquet_file(str(path), chunk_size=10))
+        
+        assert [len(c) for c in chunks] == [10, 10, 5]
+        assert sum(chunks, []) == RECORDS
+    
+    @pytest.mark.parametrize("file_type", ["csv", "parquet"])
+    def test_frame_chunks(self, tmp_path, file_type):
+        """Test CSV and Parquet are streamed as DataFrame chunks."""
+        if file_type == "parquet":
+            pytest.importorskip("pyarrow")
+        path = tmp_path / f"points.{file_type}"
+        write = getattr(pd.DataFrame(RECORDS), f"to_{file_type}")
+        write(path, index=False)
+        reader = read_csv_frames if file_type == "csv" else read_parquet_frames
+        
+        chunks = list(reader(str(path), chunk_size=10))
+        
+        assert [len(c) for c in chunks] == [10, 10, 5]
+        assert pd.concat(chunks, ignore_index=True).to_dict('records') == RECORDS
+
+
+class TestColumnarIngestion:
+    """Test the column-wise file ingestion path."""
+    
+    def ingest(self, path, columnar):
+        repo = make_repo()
+        registry = FakeJobRegistry()
+        result = ingest_file(str(path), ingest_id='test', repo=repo, job_registry=registry, columnar=columnar)
+        return result, registry.get_job('test'), repo.collection.docs
+    
+    def test_same_documents(self, tmp_path):
+        """Test columnar and record ingestion store the same documents."""
+        path = tmp_path / "points.csv"
+        records = RECORDS + [{'device_id': 'TRK-9', 'timestamp': 'never', 'lat': 1.0, 'lon': 1.0}]
+        pd.DataFrame(records).to_csv(path, index=False)
+        
+        result, job, docs = self.ingest(path, columnar=True)
+        expected_result, _, expected_docs = self.ingest(path, columnar=False)
+        
+        assert result.model_dump() == expected_result.model_dump()
+        assert job['status'] == 'partial'
+        assert {k: job['stats'][k] for k in ['read', 'accepted', 'rejected']} == {'read': 26, 'accepted': 25, 'rejected': 1}
+        assert docs == expected_docs
+
+
+class TestHeaderInference:
+    """Test header inference reads only headers."""
+    
+    @pytest.mark.parametrize("file_type", ["csv", "json", "xlsx", "parquet"])
+    def test_headers(self, tmp_path, file_type):
+        """Test headers are read for every file type."""
+        if file_type == "parquet":
+            pytest.importorskip("pyarrow")
+        path = tmp_path / f"points.{file_type}"
+        df = pd.DataFrame(RECORDS)
+        if file_type == "csv":
+            df.to_csv(path, index=False)
+        elif file_type == "json":
+            path.write_text(json.dumps(RECORDS))
+        elif file_type == "xlsx":
+            df.to_excel(path, index=False)
+        else:
+            df.to_parquet(path, index=False)
+        
+        assert read_file_headers(str(path), file_type) == ['device_id', 'timestamp', 'lat', 'lon']
+        
+        mapping = infer_mapping_from_file(str(path), file_type)
+        assert mapping.field_map['timestamp'] == 'ts_utc'
+    
+    def test_empty_json(self, tmp_path):
+        """Test an empty JSON array has no headers."""
+        path = tmp_path / "empty.json"
+        path.write_text("[]")
+        
+        assert read_file_headers(str(path), "json") == []
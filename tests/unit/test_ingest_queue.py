@@ -0,0 +1,80 @@
+"""
+Unit tests for queued webhook ingestion.
+"""
+
+import threading
+import time
+import pytest
+from bhulan.api.ingest_queue import IngestQueue, IngestQueueClosedError, IngestQueueFullError
+from bhulan.models.vendor.generic import create_generic_mapping
+from tests.unit.fakes import FakeJobRegistry, make_records, make_repo
+
+
+class BlockingJobRegistry(FakeJobRegistry):
+    """Job registry whose workers wait for release before creating jobs."""
+    
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+    
+    def create_job(self, ingest_id, source, params):
+        self.release.wait()
+        super().create_job(ingest_id, source, params)
+
+
+class TestIngestQueue:
+    """Test the bounded background queue."""
+    
+    def setup_method(self):
+        self.repo = make_repo()
+        self.registry = BlockingJobRegistry()
+        self.queue = IngestQueue(self.repo, self.registry, maxsize=2, workers=1)
+        self.mapping = create_generic_mapping()
+    
+    def teardown_method(self):
+        self.registry.release.set()
+        self.queue.close()
+    
+    def test_full_queue_refused(self):
+        """Test batches beyond maxsize are refused while the worker is busy."""
+        self.queue.submit(make_records(), self.mapping, 'job-0', {'record_count': 3})
+        while len(self.queue):
+            time.sleep(0.01)
+        
+        # job-0 is held by the worker, so only two more batches fit
+        self.queue.submit(make_records(), self.mapping, 'job-1', {'record_count': 3})
+        self.queue.submit(make_records(), self.mapping, 'job-2', {'record_count': 3})
+        with pytest.raises(IngestQueueFullError):
+            self.queue.submit(make_records(), self.mapping, 'job-3', {'record_count': 3})
+        
+        assert self.queue.get_pending('job-3') is None
+        assert self.queue.get_pending('job-2') == {'record_count': 3}
+    
+    def test_close_drains(self):
+        """Test close ingests queued batches and then refuses new ones."""
+        self.queue.submit(make_records(), self.mapping, 'ok', {})
+        self.queue.submit(make_records(lat=95.0), self.mapping, 'rejected', {})
+        self.registry.release.set()
+        self.queue.close()
+        
+        assert self.registry.get_job('ok')['status'] == 'succeeded'
+        assert self.registry.get_job('rejected')['status'] == 'partial'
+        assert len(self.repo.collection.docs) == 3
+        assert self.queue.get_pending('ok') is None
+        
+        with pytest.raises(IngestQueueClosedError):
+            self.queue.submit(make_records(), self.mapping, 'late', {})
+    
+    def test_failed_batch(self):
+        """Test a failed write marks the job failed and the worker goes on."""
+        def failing_upsert(points):
+            raise RuntimeError("write failed")
+        
+        self.repo.upsert_batch = failing_upsert
+        self.queue.submit(make_records(), self.mapping, 'failed', {})
+        self.registry.release.set()
+        self.queue.close()
+        
+        assert self.registry.get_job('failed')['status'] == 'failed'
+        assert self.registry.get_job('failed')['error_sample'] == {0: "write failed"}
+
@@ -0,0 +1,267 @@
+"""
+Unit tests for the Kafka consumer against an in-memory broker.
+"""
+
+import threading
+import time
+from collections import namedtuple
+import pytest
+
+pytest.importorskip("kafka")
+
+from kafka import TopicPartition
+from bhulan.ingestion.kafka_consumer import KAFKA_BUFFERED, KAFKA_LAG, KafkaGPSConsumer
+from tests.unit.fakes import FakeClock, FakeJobRegistry, make_repo
+
+
+Message = namedtuple('Message', ['topic', 'partition', 'offset', 'value'])
+
+P0 = TopicPartition('gps.raw', 0)
+P1 = TopicPartition('gps.raw', 1)
+
+
+class FakeKafkaConsumer:
+    """In-memory broker and consumer for one consumer group."""
+    
+    def __init__(self):
+        self.logs = {}
+        self.positions = {}
+        self.paused = set()
+        self.committed = {}
+        self.revoked = set()
+        self.closed = False
+    
+    def produce(self, tp, n, device_id='TRK-1'):
+        log = self.logs.setdefault(tp, [])
+        self.positions.setdefault(tp, 0)
+        for _ in range(n):
+            i = len(log)
+            value = {'device_id': f'{device_id}-{tp.partition}', 'timestamp': f'2024-05-01T12:{i // 60:02d}:{i % 60:02d}Z',
+                     'lat': 37.0, 'lon': -122.0}
+            log.append(Message(tp.topic, tp.partition, i, value))
+    
+    def poll(self, timeout_ms=0, max_records=None):
+        polled = {}
+        for tp, log in self.logs.items():
+            if tp in self.paused or tp in self.revoked:
+                continue
+            messages = log[self.positions[tp]:self.positions[tp] + max_records]
+            if messages:
+                polled[tp] = messages
+                self.positions[tp] += len(messages)
+        return polled
+    
+    def highwater(self, tp):
+        return len(self.logs[tp])
+    
+    def assignment(self):
+        return set(self.logs) - self.revoked
+    
+    def revoke(self, *partitions):
+        self.revoked.update(partitions)
+        self.paused.difference_update(partitions)
+    
+    def _check_assigned(self, partitions):
+        # kafka-python looks partitions up in the assignment
+        for tp in partitions:
+            if tp not in self.assignment():
+                raise KeyError(tp)
+    
+    def seek(self, tp, offset):
+        self._check_assigned([tp])
+        self.positions[tp] = offset
+    
+    def pause(self, *partitions):
+        self._check_assigned(partitions)
+        self.paused.update(partitions)
+    
+    def resume(self, *partitions):
+        self._check_assigned(partitions)
+        self.paused.difference_update(partitions)
+    
+    def commit_async(self, offsets, callback=None):
+        self.commit(offsets)
+        if callback:
+            callback(offsets, None)
+    
+    def commit(self, offsets):
+        self.committed.update({tp: om.offset for tp, om in offsets.items()})
+    
+    def close(self):
+        self.closed = True
+
+
+class TestKafkaConsumer:
+    """Test batching, offset commits and back-pressure."""
+    
+    def setup_method(self):
+        self.broker = FakeKafkaConsumer()
+        self.repo = make_repo()
+        self.registry = FakeJobRegistry()
+        self.clock = FakeClock()
+    
+    def make_consumer(self, **kwargs):
+        kwargs.setdefault('batch_size', 10)
+        kwargs.setdefault('linger_ms', 200)
+        return KafkaGPSConsumer(
+            consumer=self.broker,
+            track_repo=self.repo,
+            job_registry=self.registry,
+            clock=self.clock,
+            **kwargs
+        )
+    
+    def consume_until(self, consumer, done):
+        for _ in range(200):
+            consumer.consume_batch()
+            if done():
+                return
+            time.sleep(0.01)
+            self.clock.now += 0.1
+        raise AssertionError("consumer did not finish")
+    
+    def test_partial_batch_lingers(self):
+        """A partial batch is written once it lingered, without more messages."""
+        self.broker.produce(P0, 3)
+        consumer = self.make_consumer()
+        
+        consumer.consume_batch()
+        assert not consumer.in_flight
+        
+        self.clock.now = 0.25
+        self.consume_until(consumer, lambda: self.broker.committed.get(P0) == 3)
+        assert len(self.repo.collection.docs) == 3
+    
+    def test_partitions_in_parallel(self):
+        """Partitions are written by separate workers and committed separately."""
+        self.broker.produce(P0, 25)
+        self.broker.produce(P1, 25)
+        release = threading.Event()
+        upsert_batch = self.repo.upsert_batch
+        
+        def blocked_upsert(points):
+            release.wait()
+            return upsert_batch(points)
+        
+        self.repo.upsert_batch = blocked_upsert
+        consumer = self.make_consumer(workers=2)
+        consumer.consume_batch()
+        
+        assert set(consumer.in_flight) == {P0, P1}
+        assert self.broker.committed == {}
+        
+        release.set()
+        self.consume_until(consumer, lambda: self.broker.committed == {P0: 25, P1: 25})
+        
+        assert len(self.repo.collection.docs) == 50
+        partitions = [job['params']['partition'] for job in self.registry.jobs.values()]
+        assert sorted(partitions) == [0, 0, 0, 1, 1, 1]
+    
+    def test_failed_batch_retried(self):
+        """A failed batch is not committed and is consumed again after the backoff."""
+        self.broker.produce(P0, 10)
+        upsert_batch = self.repo.upsert_batch
+        calls = []
+        
+        def failing_once(points):
+            calls.append(len(points))
+            if len(calls) == 1:
+                raise RuntimeError("write failed")
+            return upsert_batch(points)
+        
+        self.repo.upsert_batch = failing_once
+        consumer = self.make_consumer()
+        self.consume_until(consumer, lambda: P0 in consumer.retry_at)
+        
+        assert self.broker.committed == {}
+        assert P0 in self.broker.paused
+        assert self.broker.positions[P0] == 0
+        
+        self.clock.now = 5.0
+        self.consume_until(consumer, lambda: self.broker.committed.get(P0) == 10)
+        
+        assert calls == [10, 10]
+        statuses = sorted(job['status'] for job in self.registry.jobs.values())
+        assert statuses == ['failed', 'succeeded']
+    
+    def test_back_pressure(self):
+        """A partition is paused while its buffer is full and resumed after."""
+        self.broker.produce(P0, 40)
+        release = threading.Event()
+        upsert_batch = self.repo.upsert_batch
+        
+        def blocked_upsert(points):
+            release.wait()
+            return upsert_batch(points)
+        
+        self.repo.upsert_batch = blocked_upsert
+        consumer = self.make_consumer(batch_size=5, max_pending=2)
+        consumer.consume_batch()
+        
+        # one batch in flight and more than max_pending batches buffered
+        assert P0 in self.broker.paused
+        assert len(consumer.buffers[P0]) == 35
+        assert KAFKA_BUFFERED.labels('gps.raw', 0).value == 35
+        assert KAFKA_LAG.labels('gps.raw', 0).value == 0
+        
+        release.set()
+        self.consume_until(consumer, lambda: self.broker.committed.get(P0) == 40)
+        assert not self.broker.paused
+    
+    def test_drain(self):
+        """Draining writes buffered messages and commits synchronously."""
+        self.broker.produce(P0, 3)
+        self.broker.produce(P1, 4)
+        consumer = self.make_consumer()
+        consumer.consume_batch()
+        
+        consumer.drain()
+        
+        assert self.broker.committed == {P0: 3, P1: 4}
+        assert len(self.repo.collection.docs) == 7
+    
+    def test_revoke_in_flight(self):
+        """A revoked partition's batch is finished and committed and its state dropped."""
+        self.broker.produce(P0, 25)
+        self.broker.produce(P1, 25)
+        release = threading.Event()
+        upsert_batch = self.repo.upsert_batch
+        
+        def blocked_upsert(points):
+            release.wait()
+            return upsert_batch(points)
+        
+        self.repo.upsert_batch = blocked_upsert
+        consumer = self.make_consumer(workers=2, batch_size=10, max_pending=1)
+        consumer.consume_batch()
+        assert P0 in consumer.in_flight and P0 in self.broker.paused
+        
+        self.broker.revoke(P0)
+        threading.Timer(0.05, release.set).start()
+        consumer.on_partitions_revoked([P0])
+        
+        assert self.broker.committed[P0] == 10
+        assert P0 not in consumer.buffers and P0 not in consumer.in_flight and P0 not in consumer.paused
+        
+        self.consume_until(consumer, lambda: self.broker.committed.get(P1) == 25)
+        assert self.broker.committed[P0] == 10
+    
+    def test_revoke_failed_batch(self):
+        """A failed batch of a revoked partition is neither retried nor rewound."""
+        self.broker.produce(P0, 10)
+        
+        def failing_upsert(points):
+            raise RuntimeError("write failed")
+        
+        self.repo.upsert_batch = failing_upsert
+        consumer = self.make_consumer()
+        consumer.consume_batch()
+        _, future = consumer.in_flight[P0]
+        assert isinstance(future.exception(), RuntimeError)
+        
+        # revoked without the listener, e.g. when the consumer lost its group
+        self.broker.revoke(P0)
+        consumer.consume_batch()
+        
+        assert P0 not in consumer.retry_at
+        assert self.broker.committed == {}
@@ -0,0 +1,140 @@
+"""
+Unit tests for Prometheus metrics.
+"""
+
+import pytest
+from bhulan.core.metrics import REGISTRY, Counter, Gauge, Histogram, Registry
+from bhulan.ingestion.normalize import NORMALIZE_RECORDS, MappingPlan, normalize_batch
+from bhulan.ingestion.pipeline import IngestPipeline, InlineExecutor, create_normalize_pool
+from tests.unit.fakes import make_repo
+
+
+class TestMetrics:
+    """Test metric values and the text format."""
+    
+    def setup_method(self):
+        self.registry = Registry()
+    
+    def test_counter_and_gauge(self):
+        """Test labelled counters and gauges render one sample per label set."""
+        counter = Counter('test_records_total', 'Records seen', ['vendor'], registry=self.registry)
+        gauge = Gauge('test_queued', 'Queued messages', registry=self.registry)
+        counter.labels('geotab').inc(3)
+        counter.labels('geotab').inc()
+        counter.labels('sam"sara').inc(0.5)
+        gauge.set(7)
+        
+        assert self.registry.render() == (
+            '# HELP test_records_total Records seen\n'
+            '# TYPE test_records_total counter\n'
+            'test_records_total{vendor="geotab"} 4\n'
+            'test_records_total{vendor="sam\\"sara"} 0.5\n'
+            '# HELP test_queued Queued messages\n'
+            '# TYPE test_queued gauge\n'
+            'test_queued 7\n'
+        )
+    
+    def test_histogram(self):
+        """Test buckets are cumulative and bounds inclusive."""
+        histogram = Histogram('test_seconds', 'Latency', buckets=(0.1, 1), registry=self.registry)
+        for value in [0.05, 0.1, 0.5, 3]:
+            histogram.observe(value)
+        
+        assert histogram.samples() == [
+            'test_seconds_bucket{le="0.1"} 2',
+            'test_seconds_bucket{le="1"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            'test_seconds_sum 3.65',
+            'test_seconds_count 4'
+        ]
+    
+    def test_timer(self):
+        """Test time observes the block once."""
+        histogram = Histogram('test_seconds', 'Latency', ['stage'], registry=self.registry)
+        
+        with histogram.labels('merge').time():
+            pass
+        
+        assert histogram.samples()[-1] == 'test_seconds_count{stage="merge"} 1'
+    
+    def test_disabled(self):
+        """Test a disabled registry ignores observations."""
+        registry = Registry(enabled=False)
+        counter = Counter('test_total', 'Count', ['vendor'], registry=registry)
+        histogram = Histogram('test_seconds', 'Latency', registry=registry)
+        
+        counter.labels('geotab').inc()
+        with histogram.time():
+            histogram.observe(1)
+        
+        assert counter.values == {} and histogram.values == {}
+        assert registry.render().count('\n') == 4
+    
+    def test_drain_and_merge(self):
+        """Test drained counters and histograms are added to another registry."""
+        worker = Registry()
+        Counter('test_total', 'Count', ['vendor'], registry=worker).labels('geotab').inc(2)
+        Histogram('test_seconds', 'Latency', buckets=(1,), registry=worker).observe(0.5)
+        Gauge('test_queued', 'Queued', registry=worker).set(3)
+        counter = Counter('test_total', 'Count', ['vendor'], registry=self.registry)
+        histogram = Histogram('test_seconds', 'Latency', buckets=(1,), registry=self.registry)
+        gauge = Gauge('test_queued', 'Queued', registry=self.registry)
+        counter.labels('geotab').inc()
+        
+        drained = worker.drain()
+        self.registry.merge(drained)
+        
+        assert counter.labels('geotab').value == 3
+        assert histogram.samples()[-1] == 'test_seconds_count 1'
+        assert gauge.values == {}
+        assert worker.drain() == {}
+    
+    def test_errors(self):
+        """Test duplicate names and wrong label counts are rejected."""
+        counter = Counter('test_total', 'Count', ['vendor'], registry=self.registry)
+        
+        with pytest.raises(ValueError):
+            Counter('test_total', 'Count', registry=self.registry)
+        with pytest.raises(ValueError):
+            counter.labels('geotab', 'extra')
+
+
+class TestInstrumentation:
+    """Test ingestion updates the default registry."""
+    
+    def test_normalize_counts(self):
+        """Test accepted and rejected records are counted per vendor."""
+        mapping = MappingPlan(field_map={'id': 'device_id', 'ts': 'ts_utc', 'lat': 'lat', 'lon': 'lon'},
+                              vendor='metrics-test')
+        records = [
+            {'id': 'TRK-1', 'ts': '2024-05-01T12:00:00Z', 'lat': 37.0, 'lon': -122.0},
+            {'id': 'TRK-1', 'ts': '2024-05-01T12:00:01Z', 'lat': 95.0, 'lon': -122.0}
+        ]
+        
+        normalize_batch(records, mapping, 'test')
+        normalize_batch(records, mapping, 'test', fast=False)
+        
+        assert NORMALIZE_RECORDS.labels('metrics-test', 'accepted').value == 2
+        assert NORMALIZE_RECORDS.labels('metrics-test', 'rejected').value == 2
+    
+    @pytest.mark.parametrize("pool", ["inline", "processes"])
+    def test_pipeline_normalize_counts(self, pool):
+        """Test chunks normalized in worker processes are counted once in this process."""
+        vendor = f'pipeline-{pool}'
+        mapping = MappingPlan(field_map={'id': 'device_id', 'ts': 'ts_utc', 'lat': 'lat', 'lon': 'lon'},
+                              vendor=vendor)
+        chunks = [
+            [{'id': 'TRK-1', 'ts': f'2024-05-01T12:00:{c * 2 + i:02d}Z', 'lat': 95.0 if i else 37.0, 'lon': -122.0}
+             for i in range(2)]
+            for c in range(3)
+        ]
+        executor = InlineExecutor() if pool == 'inline' else create_normalize_pool(2)
+        try:
+            IngestPipeline(make_repo(), normalize_pool=executor).run(chunks, mapping, 'test')
+        finally:
+            executor.shutdown()
+        
+        rendered = REGISTRY.render()
+        assert f'bhulan_normalize_records_total{{vendor="{vendor}",outcome="accepted"}} 3\n' in rendered
+        assert f'bhulan_normalize_records_total{{vendor="{vendor}",outcome="rejected"}} 3\n' in rendered
+        assert f'bhulan_normalize_seconds_count{{vendor="{vendor}"}} 3\n' in rendered
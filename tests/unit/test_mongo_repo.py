@@ -0,0 +1,371 @@
+"""
+Unit tests for bulk writes in the MongoDB track point repository.
+"""
+
+import hashlib
+import bson
+import time
+import pytest
+from datetime import datetime, timedelta
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+from bhulan.cli import migrate_hashes
+from bhulan.models.canonical import epoch_ms
+from bhulan.storage.mongo_repo import MongoJobRegistry
+from tests.unit.fakes import FakeBulkResult, make_points, make_repo
+
+
+class TestBulkUpsert:
+    """Test unordered bulk upserts."""
+
+    def test_chunks_and_counts(self):
+        """Points are written in unordered chunks and counted once."""
+        repo = make_repo(chunk_size=4)
+        result = repo.write_batch(make_points(10))
+
+        assert repo.collection.bulk_calls == [(4, False), (4, False), (2, False)]
+        assert (result.inserted, result.modified, result.duplicates) == (10, 0, 0)
+
+    def test_rewrite_counts_duplicates(self):
+        """Unchanged points are duplicates, changed ones are modified."""
+        repo = make_repo(dedup=False)
+        points = make_points(5)
+        repo.upsert_batch(points)
+
+        changed = [p.model_copy(update={'ingest_id': 'second'}) for p in points[:2]]
+        result = repo.write_batch(changed + points[2:])
+
+        assert (result.inserted, result.modified, result.duplicates) == (0, 2, 3)
+
+    def test_repeats_within_batch(self):
+        """Repeated hashes in one batch are written once."""
+        repo = make_repo()
+        point = make_points(1)[0]
+        repeats = [point.model_copy(update={'seq_no': i}) for i in range(10)]
+
+        assert repo.upsert_batch(repeats) == 1
+        assert len(repo.collection.docs) == 1
+        assert list(repo.collection.docs.values())[0]['seq_no'] == 9
+
+    def test_prebuilt_documents(self):
+        """Documents built outside the repository are written like points."""
+        repo = make_repo(chunk_size=4)
+        docs = []
+        for point in make_points(6):
+            doc = point.to_mongo_doc()
+            doc['_hash'] = point.compute_hash()
+            docs.append(doc)
+
+        result = repo.write_documents(docs + docs[:2])
+
+        assert (result.inserted, result.modified, result.duplicates) == (6, 0, 2)
+        assert sorted(repo.collection.docs) == sorted(doc['_hash'] for doc in docs)
+
+    def test_empty_batch(self):
+        """No points means no writes."""
+        repo = make_repo()
+
+        assert repo.upsert_batch([]) == 0
+        assert repo.collection.bulk_calls == []
+
+
+class TestInsertOnly:
+    """Test insert-only writes that rely on the unique hash index."""
+
+    def test_duplicates_dropped(self):
+        """Already stored points are counted as duplicates."""
+        repo = make_repo(insert_only=True, chunk_size=3, dedup=False)
+        points = make_points(5)
+        repo.write_batch(points[:2])
+
+        result = repo.write_batch(points)
+
+        assert (result.inserted, result.modified, result.duplicates) == (3, 0, 2)
+        assert len(repo.collection.docs) == 5
+
+    def test_other_errors_raised(self):
+        """Write errors other than duplicate keys are not swallowed."""
+        repo = make_repo(insert_only=True)
+
+        def failing_insert(docs, ordered=True):
+            raise BulkWriteError({'nInserted': 0, 'writeErrors': [{'index': 0, 'code': 121}]})
+
+        repo.collection.insert_many = failing_insert
+
+        with pytest.raises(BulkWriteError):
+            repo.write_batch(make_points(1))
+
+
+class FakeLegacyCollection:
+    """In-memory collection keyed by _id with a unique _hash index."""
+
+    def __init__(self, docs):
+        self.docs = {doc['_id']: doc for doc in docs}
+
+    def find(self, query, projection):
+        matches = [dict(doc) for doc in self.docs.values() if isinstance(doc['_hash'], str)]
+        return FakeCursor(matches)
+
+    def find_one(self, query, projection):
+        return next(iter(self.find(query, projection)), None)
+
+    def bulk_write(self, operations, ordered=True):
+        errors = []
+        modified = 0
+        for i, op in enumerate(operations):
+            new_hash = op._doc['$set']['_hash']
+            if any(doc['_hash'] == new_hash for doc in self.docs.values()):
+                errors.append({'index': i, 'code': 11000, 'errmsg': 'E11000 duplicate key'})
+                continue
+            self.docs[op._filter['_id']]['_hash'] = new_hash
+            modified += 1
+        if errors:
+            raise BulkWriteError({'nModified': modified, 'writeErrors': errors})
+        return FakeBulkResult({'nModified': modified})
+
+    def delete_many(self, query):
+        for _id in query['_id']['$in']:
+            del self.docs[_id]
+
+
+class FakeCursor(list):
+    """List standing in for a pymongo cursor."""
+
+    def batch_size(self, size):
+        return self
+
+
+class TestPointHash:
+    """Test the compact deduplication key."""
+
+    def test_compact_binary(self):
+        """Hashes are 16 bytes and equal for equal points."""
+        point = make_points(1)[0]
+
+        assert isinstance(point.compute_hash(), bytes)
+        assert len(point.compute_hash()) == 16
+        assert point.compute_hash() == point.model_copy(update={'seq_no': 99}).compute_hash()
+
+    def test_key_fields(self):
+        """Device, millisecond and microdegree changes give new hashes."""
+        point = make_points(1)[0]
+        changes = [
+            {'device_id': 'TRK-002'},
+            {'ts_utc': point.ts_utc + timedelta(milliseconds=1)},
+            {'lat': point.lat + 1e-6},
+            {'lon': point.lon - 1e-6}
+        ]
+
+        hashes = {point.model_copy(update=change).compute_hash() for change in changes}
+
+        assert len(hashes | {point.compute_hash()}) == 5
+
+    def test_stored_precision(self):
+        """Timestamps are keyed at the millisecond precision MongoDB stores."""
+        point = make_points(1)[0]
+        later = point.model_copy(update={'ts_utc': point.ts_utc + timedelta(microseconds=999)})
+
+        assert later.compute_hash() == point.compute_hash()
+        assert epoch_ms(datetime(1970, 1, 1, 0, 0, 1, 2500)) == 1002
+
+
+class TestHashMigration:
+    """Test rekeying points stored with hex SHA-256 hashes."""
+
+    def legacy_doc(self, _id, point):
+        key = f"{point.device_id}:{point.ts_utc.isoformat()}:{point.lat:.6f}:{point.lon:.6f}"
+        doc = point.to_mongo_doc()
+        doc.update(_id=_id, _hash=hashlib.sha256(key.encode()).hexdigest())
+        return doc
+
+    def test_rekey_and_remove_duplicates(self):
+        """Old points are rekeyed, and dropped when already stored under the new key."""
+        points = make_points(5)
+        docs = [self.legacy_doc(i, p) for i, p in enumerate(points)]
+        rewritten = points[3].to_mongo_doc()
+        rewritten.update(_id=99, _hash=points[3].compute_hash())
+
+        repo = make_repo()
+        repo.collection = FakeLegacyCollection(docs + [rewritten])
+
+        counts = repo.migrate_hashes(batch_size=2)
+
+        assert counts == {'rekeyed': 4, 'removed': 1}
+        assert sorted(repo.collection.docs) == [0, 1, 2, 4, 99]
+        assert {doc['_hash'] for doc in repo.collection.docs.values()} == {p.compute_hash() for p in points}
+        assert repo.migrate_hashes() == {'rekeyed': 0, 'removed': 0}
+
+    def test_has_legacy_hashes(self):
+        """Old points are found until migrated."""
+        repo = make_repo()
+        repo.collection = FakeLegacyCollection([self.legacy_doc(0, make_points(1)[0])])
+
+        assert repo.has_legacy_hashes()
+        repo.migrate_hashes()
+        assert not repo.has_legacy_hashes()
+
+    def test_command(self, monkeypatch):
+        """The migration command rekeys the configured database and closes it."""
+        repo = make_repo()
+        repo.collection = FakeLegacyCollection([self.legacy_doc(0, make_points(1)[0])])
+        opened = []
+        monkeypatch.setattr(migrate_hashes, 'MongoTrackPointRepository', lambda **kwargs: opened.append(kwargs) or repo)
+        monkeypatch.setattr(repo, 'close', lambda: opened.append('closed'))
+
+        assert migrate_hashes.main(['--db', 'fleet', '--batch-size', '10']) == 0
+        assert opened[0]['db_name'] == 'fleet' and opened[-1] == 'closed'
+        assert not repo.has_legacy_hashes()
+
+
+class FakeJobCollection:
+    """In-memory ingest_jobs collection recording each write."""
+
+    def __init__(self):
+        self.docs = {}
+        self.writes = []
+
+    def insert_one(self, doc):
+        bson.encode(doc)
+        self.writes.append('insert_one')
+        self.docs[doc['ingest_id']] = dict(doc)
+
+    def update_one(self, query, update):
+        bson.encode(update)
+        self.writes.append('update_one')
+        self.docs[query['ingest_id']].update(update['$set'])
+
+    def bulk_write(self, operations, ordered=True):
+        for op in operations:
+            bson.encode(op._doc)
+        self.writes.append(('bulk_write', len(operations)))
+        for op in operations:
+            self.docs[op._filter['ingest_id']] = dict(op._doc)
+
+    def find_one(self, query, projection=None, sort=None):
+        return self.docs.get(query.get('ingest_id'))
+
+
+class TestBufferedJobRegistry:
+    """Test coalesced job bookkeeping."""
+
+    @pytest.fixture(autouse=True)
+    def no_indexes(self, monkeypatch):
+        monkeypatch.setattr(Collection, 'create_index', lambda self, *args, **kwargs: None)
+
+    def make_registry(self, **kwargs):
+        registry = MongoJobRegistry(mongo_uri="mongodb://localhost:27017", db_name="bhulan_test", **kwargs)
+        registry.collection = FakeJobCollection()
+        return registry
+
+    def run_batches(self, registry, n):
+        for i in range(n):
+            registry.create_job(ingest_id=f'job-{i}', source='mqtt', params={'batch_size': 10})
+            registry.update_job_status(ingest_id=f'job-{i}', status='succeeded', stats={'read': 10})
+
+    def test_unbuffered_writes_each_call(self):
+        """Without buffering every create and update is written at once."""
+        registry = self.make_registry()
+
+        self.run_batches(registry, 3)
+
+        assert registry.collection.writes == ['insert_one', 'update_one'] * 3
+
+    def test_coalesced_flush(self):
+        """Jobs created and finished between flushes are written in one bulk write."""
+        registry = self.make_registry(buffered=True, flush_seconds=3600)
+
+        self.run_batches(registry, 50)
+
+        assert registry.collection.writes == []
+        assert registry.get_job('job-7')['status'] == 'succeeded'
+
+        assert registry.flush() == 50
+        assert registry.flush() == 0
+        assert registry.collection.writes == [('bulk_write', 50)]
+        assert registry.collection.docs['job-7']['stats'] == {'read': 10}
+        registry.close()
+
+    def test_running_stats_flushed(self):
+        """Stats of a running job are flushed again after each change."""
+        registry = self.make_registry(buffered=True, flush_seconds=3600)
+        registry.create_job(ingest_id='long', source='kafka', params={})
+        registry.flush()
+
+        registry.update_job_status(ingest_id='long', status='running', stats={'read': 5})
+        registry.flush()
+
+        assert registry.collection.docs['long']['stats'] == {'read': 5}
+        assert registry.collection.writes == [('bulk_write', 1), ('bulk_write', 1)]
+        registry.close()
+
+    def test_failed_flush_retried(self):
+        """Jobs are kept for the next flush when a flush fails."""
+        registry = self.make_registry(buffered=True, flush_seconds=3600)
+        self.run_batches(registry, 2)
+        bulk_write = registry.collection.bulk_write
+
+        def failing_write(operations, ordered=True):
+            raise RuntimeError("flush failed")
+
+        registry.collection.bulk_write = failing_write
+        with pytest.raises(RuntimeError):
+            registry.flush()
+
+        registry.collection.bulk_write = bulk_write
+        assert registry.flush() == 2
+        registry.close()
+
+    def test_error_sample_keys(self):
+        """Error samples keyed by record index are stored with string keys."""
+        for buffered in [False, True]:
+            registry = self.make_registry(buffered=buffered, flush_seconds=3600)
+            registry.create_job(ingest_id='job-0', source='kafka', params={})
+            registry.update_job_status(ingest_id='job-0', status='partial', error_sample={3: 'bad lat'})
+            registry.flush()
+
+            assert registry.collection.docs['job-0']['error_sample'] == {'3': 'bad lat'}
+            registry.close()
+
+    def test_unwritable_job_dropped(self):
+        """A job MongoDB would reject is dropped without holding back the others."""
+        registry = self.make_registry(buffered=True, flush_seconds=3600, cache_size=1)
+        registry.create_job(ingest_id='bad', source='file', params={'paths': {'a', 'b'}})
+        self.run_batches(registry, 2)
+
+        assert registry.flush() == 2
+        assert set(registry.collection.docs) == {'job-0', 'job-1'}
+        assert not registry.dirty
+
+        registry.create_job(ingest_id='job-2', source='mqtt', params={})
+        assert list(registry.jobs) == ['job-2']
+        registry.close()
+
+    def test_cache_evicts_written_jobs(self):
+        """Only written jobs are evicted, and evicted jobs are read from MongoDB."""
+        registry = self.make_registry(buffered=True, flush_seconds=3600, cache_size=2)
+        self.run_batches(registry, 3)
+
+        assert len(registry.jobs) == 3
+
+        registry.flush()
+        registry.create_job(ingest_id='job-3', source='mqtt', params={})
+
+        assert list(registry.jobs) == ['job-2', 'job-3']
+        assert registry.get_job('job-0')['status'] == 'succeeded'
+
+        registry.update_job_status(ingest_id='job-0', status='failed')
+        assert registry.collection.writes[-1] == 'update_one'
+        registry.close()
+
+    def test_background_flush(self):
+        """The flusher thread writes jobs without explicit flushes."""
+        registry = self.make_registry(buffered=True, flush_seconds=0.01)
+        self.run_batches(registry, 1)
+
+        for _ in range(100):
+            if registry.collection.docs:
+                break
+            time.sleep(0.01)
+
+        assert registry.collection.docs['job-0']['status'] == 'succeeded'
+        registry.close()
@@ -0,0 +1,160 @@
+"""
+Unit tests for the MQTT consumer's queue and workers.
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import namedtuple
+import pytest
+
+pytest.importorskip("paho.mqtt")
+
+from bhulan.config.settings import settings
+from bhulan.ingestion.mqtt_consumer import MIN_IDLE_WAIT_SECONDS, MQTTGPSConsumer
+from tests.unit.fakes import FakeJobRegistry, make_repo
+
+
+Message = namedtuple('Message', ['topic', 'payload'])
+
+
+def make_messages(n, start=0):
+    return [
+        Message('devices/TRK-1/gps', json.dumps({
+            'device_id': 'TRK-1',
+            'timestamp': f'2024-05-01T12:{i // 60:02d}:{i % 60:02d}Z',
+            'lat': 37.0,
+            'lon': -122.0
+        }).encode())
+        for i in range(start, start + n)
+    ]
+
+
+class TestMQTTConsumer:
+    """Test enqueue-only callbacks, batching and overflow policies."""
+    
+    def setup_method(self):
+        self.repo = make_repo()
+        self.registry = FakeJobRegistry()
+    
+    def make_consumer(self, **kwargs):
+        kwargs.setdefault('batch_size', 10)
+        kwargs.setdefault('flush_ms', 50)
+        kwargs.setdefault('workers', 1)
+        return MQTTGPSConsumer(track_repo=self.repo, job_registry=self.registry, **kwargs)
+    
+    def deliver(self, consumer, messages):
+        for msg in messages:
+            consumer._on_message(consumer.client, None, msg)
+    
+    def test_callback_only_queues(self):
+        """The callback returns without writing while no worker runs."""
+        consumer = self.make_consumer()
+        
+        self.deliver(consumer, make_messages(25))
+        
+        assert consumer.get_stats()['queued'] == 25
+        assert self.repo.collection.docs == {}
+    
+    def test_batches_and_flush(self):
+        """Full batches are written at once and a partial one after flush_ms."""
+        consumer = self.make_consumer()
+        consumer.start()
+        
+        self.deliver(consumer, make_messages(23))
+        for _ in range(100):
+            if len(self.repo.collection.docs) == 23:
+                break
+            time.sleep(0.01)
+        consumer.stop()
+        
+        assert len(self.repo.collection.docs) == 23
+        assert sorted(job['params']['batch_size'] for job in self.registry.jobs.values()) == [3, 10, 10]
+        assert consumer.get_stats()['accepted'] == 23
+    
+    def test_idle_wait_without_flush(self, monkeypatch):
+        """An idle worker still waits for messages with flush_ms=0."""
+        consumer = self.make_consumer(flush_ms=0)
+        timeouts = []
+        
+        def get(timeout=None):
+            timeouts.append(timeout)
+            raise queue.Empty
+        
+        monkeypatch.setattr(consumer.messages, 'get', get)
+        
+        assert consumer._next_batch() == []
+        assert timeouts == [MIN_IDLE_WAIT_SECONDS]
+    
+    def test_malformed_counted(self):
+        """Unparseable payloads are counted and the rest of the batch written."""
+        consumer = self.make_consumer()
+        self.deliver(consumer, make_messages(2) + [Message('devices/x/gps', b'{not json')])
+        
+        consumer.start()
+        consumer.stop()
+        
+        stats = consumer.get_stats()
+        assert (stats['malformed'], stats['accepted']) == (1, 2)
+    
+    @pytest.mark.parametrize("policy, kept", [('drop_newest', range(0, 5)), ('drop_oldest', range(3, 8))])
+    def test_drop_policies(self, policy, kept):
+        """A full queue drops the newest or the oldest messages and counts them."""
+        consumer = self.make_consumer(queue_size=5, overflow_policy=policy)
+        self.deliver(consumer, make_messages(8))
+        
+        consumer.start()
+        consumer.stop()
+        
+        assert consumer.get_stats()['dropped'] == 3
+        seconds = sorted(doc['ts_utc'].second for doc in self.repo.collection.docs.values())
+        assert seconds == list(kept)
+    
+    def test_block_policy_waits(self):
+        """With block, the callback waits for room instead of dropping."""
+        consumer = self.make_consumer(queue_size=5, overflow_policy='block')
+        self.deliver(consumer, make_messages(5))
+        delivered = threading.Event()
+        
+        def deliver_more():
+            self.deliver(consumer, make_messages(3, start=5))
+            delivered.set()
+        
+        threading.Thread(target=deliver_more, daemon=True).start()
+        assert not delivered.wait(0.1)
+        
+        consumer.start()
+        assert delivered.wait(5)
+        consumer.stop()
+        
+        assert consumer.get_stats()['dropped'] == 0
+        assert len(self.repo.collection.docs) == 8
+    
+    def test_write_retried(self, monkeypatch):
+        """A failed write is retried before the batch is counted as failed."""
+        monkeypatch.setattr(settings, 'MQTT_RETRY_BACKOFF_MS', 1)
+        upsert_batch = self.repo.upsert_batch
+        calls = []
+        
+        def failing_twice(points):
+            calls.append(len(points))
+            if len(calls) <= 2:
+                raise RuntimeError("write failed")
+            return upsert_batch(points)
+        
+        self.repo.upsert_batch = failing_twice
+        consumer = self.make_consumer()
+        self.deliver(consumer, make_messages(4))
+        
+        consumer.start()
+        consumer.stop()
+        
+        assert calls == [4, 4, 4]
+        assert consumer.get_stats()['failed'] == 0
+        assert [job['status'] for job in self.registry.jobs.values()] == ['succeeded']
+    
+    def test_unknown_policy(self):
+        """An unknown overflow policy is rejected."""
+        with pytest.raises(ValueError):
+            self.make_consumer(overflow_policy='spill')
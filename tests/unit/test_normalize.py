@@ -3,6 +3,7 @@ Unit tests for normalization module.
 """
 
 import pytest
+import pandas as pd
 from datetime import datetime
 from bhulan.ingestion.normalize import (
     MappingPlan,
@@ -10,9 +11,11 @@ from bhulan.ingestion.normalize import (
     convert_altitude_to_meters,
     apply_mapping,
     normalize_record,
-    normalize_batch
+    normalize_batch,
+    normalize_frame
 )
 from bhulan.ingestion.validate import ValidationError
+from bhulan.models.canonical import TrackPoint
 
 
 class TestUnitConversions:
@@ -87,6 +90,51 @@ class TestMappingPlan:
         result = apply_mapping(record, mapping)
         
         assert abs(result['speed_mps'] - 10.0) < 0.01
+    
+    def test_compiled_mapping_per_record_layout(self):
+        """Records with different keys get their own field pairs."""
+        mapping = MappingPlan(
+            field_map={'unit': 'device_id', 'device': 'device_id', 'alt': 'alt_m'},
+            unit_map={'alt_m': 'ft'},
+            defaults={'alt_m': 0.0},
+            vendor='test'
+        )
+        compiled = mapping.compile()
+        
+        assert mapping.compile() is compiled
+        assert compiled({'unit': 'A', 'device': 'B', 'alt': 10.0}) == {
+            'device_id': 'B', 'alt_m': 3.048, 'src': 'test'
+        }
+        assert compiled({'unit': 'A'}) == {'device_id': 'A', 'alt_m': 0.0, 'src': 'test'}
+        assert compiled({'unit': 'C', 'device': 'D', 'alt': 0.0})['device_id'] == 'D'
+    
+    def test_compiled_mapping_unknown_unit(self):
+        """Unknown units fail when a record has the field."""
+        mapping = MappingPlan(
+            field_map={'speed': 'speed_mps'},
+            unit_map={'speed_mps': 'furlongs'},
+            vendor='test'
+        )
+        
+        assert apply_mapping({}, mapping) == {'src': 'test'}
+        with pytest.raises(ValueError, match="Unknown speed unit"):
+            apply_mapping({'speed': 1.0}, mapping)
+    
+    def test_apply_frame(self):
+        """DataFrame mapping matches mapping each row."""
+        mapping = MappingPlan(
+            field_map={'device': 'device_id', 'speed': 'speed_mps', 'extra': 'hdop'},
+            unit_map={'speed_mps': 'mph'},
+            defaults={'heading_deg': 0.0},
+            vendor='test'
+        )
+        frame = pd.DataFrame({'device': ['A', 'B'], 'speed': [10.0, 20.0], 'other': [1, 2]})
+        
+        mapped = mapping.compile().apply_frame(frame)
+        
+        assert mapped.to_dict('records') == [
+            apply_mapping(record, mapping) for record in frame.to_dict('records')
+        ]
 
 
 class TestNormalization:
@@ -208,3 +256,128 @@ class TestNormalization:
         assert result.rejected == 1
         assert len(points) == 1
         assert 1 in result.errors
+
+
+class TestFastNormalization:
+    """Test that the column-wise fast path matches per-record normalization."""
+    
+    def make_records(self):
+        records = [
+            {'id': 'TRK-1', 'ts': f'2024-05-01T12:{i:02d}:00', 'lat': 37.0 + i * 0.001,
+             'lon': -122.0, 'speed': 36.0, 'heading': 90.0, 'hdop': 1.2}
+            for i in range(20)
+        ]
+        records[3]['lat'] = 91.0            # rejected
+        records[5]['speed'] = 500.0         # flagged and dropped
+        records[7]['heading'] = 400.0       # flagged and dropped
+        records[9]['hdop'] = -1.0           # flagged and dropped
+        records[11]['speed'] = 'fast'       # rejected by the record path
+        records[13]['ts'] = 'not a date'    # rejected
+        records[15]['ts'] = '2024-05-01T12:15:00Z'
+        del records[17]['hdop']
+        records[19]['speed'] = None
+        return records
+    
+    def test_fast_matches_record_path(self):
+        """Accepted points, rejected rows and errors are the same."""
+        mapping = MappingPlan(
+            field_map={'id': 'device_id', 'ts': 'ts_utc', 'lat': 'lat', 'lon': 'lon',
+                       'speed': 'speed_mps', 'heading': 'heading_deg', 'hdop': 'hdop'},
+            unit_map={'speed_mps': 'kph'},
+            vendor='test'
+        )
+        records = self.make_records()
+        
+        slow, slow_points = normalize_batch(records, mapping, 'test-ingest-id', fast=False)
+        fast, fast_points = normalize_batch(records, mapping, 'test-ingest-id', fast=True)
+        
+        assert fast.model_dump() == slow.model_dump()
+        assert [p.model_dump() for p in fast_points] == [p.model_dump() for p in slow_points]
+        spike = next(p for p in fast_points if p.seq_no == 5)
+        assert spike.speed_mps is None
+        assert spike.raw['meta']['quality_flags'] == {'flag_speed_spike': True}
+    
+    def test_fast_points_are_track_points(self):
+        """Fast points behave like validated TrackPoints."""
+        mapping = MappingPlan(
+            field_map={'id': 'device_id', 'ts': 'ts_utc', 'lat': 'lat', 'lon': 'lon'},
+            vendor='test'
+        )
+        records = [{'id': 42, 'ts': '2024-05-01T12:00:00', 'lat': 1, 'lon': 2}]
+        
+        result, points = normalize_batch(records, mapping, 'test-ingest-id', fast=True)
+        
+        assert result.accepted == 1
+        assert points[0].device_id == '42'
+        assert isinstance(points[0].lat, float)
+        assert points[0].compute_hash() == TrackPoint(**points[0].model_dump()).compute_hash()
+
+
+class TestFrameNormalization:
+    """Test column-wise normalization of DataFrames to documents."""
+    
+    def make_mapping(self):
+        return MappingPlan(
+            field_map={'id': 'device_id', 'ts': 'ts_utc', 'lat': 'lat', 'lon': 'lon',
+                       'speed': 'speed_mps', 'hdop': 'hdop'},
+            unit_map={'speed_mps': 'kph'},
+            vendor='test'
+        )
+    
+    def expected_docs(self, records, mapping):
+        result, points = normalize_batch(records, mapping, 'test-ingest-id', fast=False)
+        docs = []
+        for point in points:
+            doc = point.to_mongo_doc()
+            doc['_hash'] = point.compute_hash()
+            docs.append(doc)
+        return result, docs
+    
+    def test_frame_matches_records(self):
+        """Documents, rejections and errors match normalize_batch."""
+        mapping = self.make_mapping()
+        frame = pd.DataFrame({
+            'id': ['TRK-1', 'TRK-1', '', 'TRK-2', 'TRK-2'],
+            'ts': ['2024-05-01T12:00:00Z', '2024-05-01T12:00:30.250000Z', '2024-05-01T12:01:00Z',
+                   'bad', '2024-05-01T12:02:00Z'],
+            'lat': [37.0, 37.1, 37.2, 37.3, 95.0],
+            'lon': [-122.0, -122.1, -122.2, -122.3, -122.4],
+            'speed': [36.0, 900.0, None, 10.0, 10.0],
+            'hdop': [1.0, None, 1.0, 1.0, 1.0]
+        })
+        
+        result, docs = normalize_frame(frame, mapping, 'test-ingest-id')
+        expected_result, expected_docs = self.expected_docs(
+            frame.astype(object).where(frame.notna(), None).to_dict('records'), mapping
+        )
+        
+        assert result.model_dump() == expected_result.model_dump()
+        assert docs == expected_docs
+        assert result.accepted == 2
+        assert docs[1]['raw']['meta']['quality_flags'] == {'flag_speed_spike': True}
+    
+    def test_null_cells_are_missing(self):
+        """Null optional cells are stored as None, not rejected."""
+        frame = pd.DataFrame({
+            'id': ['TRK-1'], 'ts': ['2024-05-01T12:00:00'], 'lat': [1.0], 'lon': [2.0],
+            'speed': [float('nan')], 'hdop': [None]
+        })
+        
+        result, docs = normalize_frame(frame, self.make_mapping(), 'test-ingest-id')
+        
+        assert result.accepted == 1
+        assert docs[0]['speed_mps'] is None
+        assert docs[0]['raw']['original']['speed'] is None
+    
+    def test_text_in_numeric_column(self):
+        """Columns that cannot be converted fall back to per-row errors."""
+        frame = pd.DataFrame({
+            'id': ['TRK-1', 'TRK-1'], 'ts': ['2024-05-01T12:00:00', '2024-05-01T12:00:01'],
+            'lat': [1.0, 1.0], 'lon': [2.0, 2.0], 'speed': [10.0, 'fast']
+        })
+        
+        result, docs = normalize_frame(frame, self.make_mapping(), 'test-ingest-id')
+        
+        assert result.accepted == 1
+        assert list(result.errors) == [1]
+        assert docs[0]['speed_mps'] == pytest.approx(10.0 / 3.6)
@@ -0,0 +1,150 @@
+"""
+Unit tests for the pipelined ingestion executor.
+"""
+
+import pickle
+import threading
+import pytest
+import pandas as pd
+from bhulan.ingestion.normalize import MappingPlan, normalize_batch
+from bhulan.ingestion.pipeline import IngestPipeline, InlineExecutor, create_normalize_pool, get_normalize_pool
+from tests.unit.fakes import make_repo
+
+
+MAPPING = MappingPlan(
+    field_map={'id': 'device_id', 'ts': 'ts_utc', 'lat': 'lat', 'lon': 'lon'},
+    vendor='test'
+)
+
+
+def make_chunks(num_chunks=6, chunk_size=5):
+    """Build record chunks with one invalid row in every other chunk."""
+    chunks = []
+    for c in range(num_chunks):
+        chunk = []
+        for i in range(chunk_size):
+            n = c * chunk_size + i
+            lat = 95.0 if c % 2 and i == 2 else 37.0 + n / 1000
+            chunk.append({'id': 'TRK-1', 'ts': f'2024-05-01T12:{n // 60:02d}:{n % 60:02d}', 'lat': lat, 'lon': -122.0})
+        chunks.append(chunk)
+    return chunks
+
+
+class TestIngestPipeline:
+    """Test pipelined normalization and writes."""
+    
+    def run(self, chunks, **kwargs):
+        repo = make_repo()
+        result, stats = IngestPipeline(repo, **kwargs).run(chunks, MAPPING, 'test')
+        return result, stats, repo.collection.docs
+    
+    @pytest.mark.parametrize("write_workers, max_pending", [(2, 1), (3, 2), (1, 8)])
+    def test_matches_sequential(self, write_workers, max_pending):
+        """Error indexes, counts and documents match a sequential run."""
+        chunks = make_chunks()
+        
+        result, stats, docs = self.run(chunks, normalize_workers=0, write_workers=write_workers,
+                                       max_pending=max_pending)
+        expected, _, expected_docs = self.run(chunks, normalize_workers=0, write_workers=0)
+        
+        assert result.model_dump() == expected.model_dump()
+        assert list(result.errors) == [7, 17, 27]
+        assert (result.accepted, result.rejected) == (27, 3)
+        assert (stats.chunks, stats.rows) == (6, 30)
+        assert docs == expected_docs
+    
+    def test_frame_chunks_in_processes(self):
+        """DataFrame chunks are normalized in worker processes."""
+        chunks = [pd.DataFrame(chunk) for chunk in make_chunks(num_chunks=4)]
+        
+        result, stats, docs = self.run(chunks, normalize_workers=2)
+        expected, _, expected_docs = self.run(chunks, normalize_workers=0, write_workers=0)
+        
+        assert result.model_dump() == expected.model_dump()
+        assert docs == expected_docs
+        assert stats.normalize_seconds > 0
+    
+    def test_back_pressure(self):
+        """The reader stops while writes are blocked and pending stages are full."""
+        release = threading.Event()
+        read = []
+        
+        def chunks():
+            for chunk in make_chunks(num_chunks=20):
+                read.append(chunk)
+                yield chunk
+        
+        repo = make_repo()
+        write_documents = repo.write_documents
+        
+        def blocked_write(docs):
+            release.wait()
+            return write_documents(docs)
+        
+        repo.write_documents = blocked_write
+        pipeline = IngestPipeline(repo, normalize_workers=0, write_workers=1, max_pending=2)
+        runner = threading.Thread(target=pipeline.run, args=(chunks(), MAPPING, 'test'))
+        runner.start()
+        runner.join(timeout=0.5)
+        
+        # two chunks queued for writing, two waiting for normalization
+        assert runner.is_alive()
+        assert len(read) == 4
+        
+        release.set()
+        runner.join()
+        assert len(read) == 20
+        assert len(repo.collection.docs) == 90
+    
+    def test_write_error_raised(self):
+        """A failed write is raised and later chunks are not written."""
+        repo = make_repo()
+        calls = []
+        
+        def failing_write(docs):
+            calls.append(len(docs))
+            raise RuntimeError("write failed")
+        
+        repo.write_documents = failing_write
+        
+        with pytest.raises(RuntimeError, match="write failed"):
+            IngestPipeline(repo, normalize_workers=0, write_workers=0).run(make_chunks(), MAPPING, 'test')
+        assert calls == [5]
+
+
+class TestNormalizePool:
+    """Test normalization executor selection."""
+    
+    def test_single_worker_inline(self):
+        """Fewer than two workers normalize on the calling thread."""
+        assert isinstance(create_normalize_pool(1), InlineExecutor)
+    
+    def test_inline_exception(self):
+        """Inline calls keep their exception in the future."""
+        future = InlineExecutor().submit(int, 'x')
+        
+        with pytest.raises(ValueError):
+            future.result()
+    
+    def test_shared_pool(self):
+        """Pipelines reuse one process pool per worker count."""
+        pool = get_normalize_pool(2)
+        
+        assert get_normalize_pool(2) is pool
+        assert isinstance(get_normalize_pool(1), InlineExecutor)
+        
+        for _ in range(2):
+            result, stats = IngestPipeline(make_repo(), normalize_workers=2).run(make_chunks(), MAPPING, 'test')
+            assert (result.accepted, result.rejected) == (27, 3)
+        assert get_normalize_pool(2) is pool
+    
+    def test_timestamp_format_pickled(self):
+        """A plan sent to a worker keeps the timestamp format it sniffed."""
+        mapping = MappingPlan(field_map=dict(MAPPING.field_map), vendor='test')
+        normalize_batch(make_chunks(1)[0], mapping, 'test')
+        sniffed = mapping.compile().timestamps.format
+        
+        copy = pickle.loads(pickle.dumps(mapping))
+        
+        assert sniffed is not None
+        assert copy.compile().timestamps.format == sniffed
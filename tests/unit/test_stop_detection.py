@@ -0,0 +1,127 @@
+"""
+Unit tests for streaming stop detection.
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from bhulan.models.canonical import TrackPoint
+from bhulan.processing.stop_detection import (
+    StopDetector,
+    detect_stops,
+    haversine_km
+)
+
+
+def make_trace(start, stops, minutes_per_stop=15, travel_points=5):
+    """Build (lat, lon, ts) tuples dwelling at each stop then driving to the next."""
+    points = []
+    ts = start
+    for idx, (lat, lon) in enumerate(stops):
+        for i in range(minutes_per_stop + 1):
+            jitter = ((i % 3) - 1) * 0.00002
+            points.append((lat + jitter, lon + jitter, ts))
+            ts += timedelta(minutes=1)
+        if idx < len(stops) - 1:
+            next_lat, next_lon = stops[idx + 1]
+            for j in range(1, travel_points + 1):
+                frac = j / (travel_points + 1)
+                points.append((lat + (next_lat - lat) * frac, lon + (next_lon - lon) * frac, ts))
+                ts += timedelta(minutes=1)
+    return points
+
+
+class TestHaversine:
+    """Test scalar distance helper."""
+
+    def test_zero_distance(self):
+        """Same point is 0 km apart."""
+        assert haversine_km(37.4419, -122.1430, 37.4419, -122.1430) == 0
+
+    def test_one_degree_latitude(self):
+        """One degree of latitude is about 111 km."""
+        assert abs(haversine_km(0.0, 0.0, 1.0, 0.0) - 111.2) < 0.6
+
+
+class TestStopDetector:
+    """Test incremental stop detection."""
+
+    def test_detects_each_stop(self):
+        """Every dwell longer than the minimum is reported once."""
+        trace = make_trace(datetime(2024, 5, 1, 8), [(37.4419, -122.1430), (37.4519, -122.1330), (37.4619, -122.1230)])
+        stops = list(StopDetector().detect(trace))
+
+        assert len(stops) == 3
+        assert abs(stops[0].lat - 37.4419) < 0.0001
+        assert abs(stops[2].lon - (-122.1230)) < 0.0001
+        assert all(s.duration_minutes == 15 for s in stops)
+
+    def test_stop_emitted_when_cluster_closes(self):
+        """A stop is returned by the first point that leaves the cluster."""
+        trace = make_trace(datetime(2024, 5, 1, 8), [(37.4419, -122.1430), (37.4519, -122.1330)])
+        detector = StopDetector()
+
+        emitted_at = [i for i, (lat, lon, ts) in enumerate(trace) if detector.push(lat, lon, ts)]
+
+        assert emitted_at == [16]
+        assert detector.flush() is not None
+
+    def test_short_dwell_filtered(self):
+        """Clusters shorter than the minimum duration are dropped."""
+        trace = make_trace(datetime(2024, 5, 1, 8), [(37.4419, -122.1430)], minutes_per_stop=8)
+        assert list(StopDetector(min_stop_minutes=10).detect(trace)) == []
+
+    def test_single_point_is_not_a_stop(self):
+        """One point never forms a stop."""
+        assert list(StopDetector(min_stop_minutes=0).detect([(37.4419, -122.1430, datetime(2024, 5, 1))])) == []
+
+    def test_radius_bounds_cluster(self):
+        """Radius estimate is positive and covers the cluster spread."""
+        trace = make_trace(datetime(2024, 5, 1, 8), [(37.4419, -122.1430)])
+        stop = list(StopDetector().detect(trace))[0]
+
+        spread = haversine_km(37.4419 - 0.00002, -122.1430 - 0.00002, 37.4419 + 0.00002, -122.1430 + 0.00002)
+        assert stop.radius_km == pytest.approx(spread / 2)
+        assert stop.num_points == 16
+
+    def test_start_and_end_are_min_and_max(self):
+        """Start/end come from the earliest and latest times in the cluster."""
+        t0 = datetime(2024, 5, 1, 8)
+        trace = [
+            (37.4419, -122.1430, t0 + timedelta(minutes=5)),
+            (37.4419, -122.1430, t0),
+            (37.4419, -122.1430, t0 + timedelta(minutes=12)),
+        ]
+        stop = list(StopDetector().detect(trace))[0]
+
+        assert stop.start == t0
+        assert stop.end == t0 + timedelta(minutes=12)
+
+    def test_custom_duration_func(self):
+        """Legacy clock strings can be used with a matching duration function."""
+        def minutes(t):
+            h, m, s = t.split(":")
+            return int(h) * 60 + int(m)
+
+        detector = StopDetector(duration_func=lambda a, b: minutes(b) - minutes(a))
+        trace = [(37.4419, -122.1430, "09:%02d:00" % i) for i in range(11)]
+        stop = list(detector.detect(trace))[0]
+
+        assert (stop.start, stop.end, stop.duration_minutes) == ("09:00:00", "09:10:00", 10)
+
+
+class TestDetectStopsFromTrackPoints:
+    """Test detection over canonical TrackPoints."""
+
+    def test_trackpoint_stream(self):
+        """Stops are detected from a generator of TrackPoints."""
+        trace = make_trace(datetime(2024, 5, 1, 8), [(37.4419, -122.1430), (37.4519, -122.1330)])
+        points = (
+            TrackPoint(device_id="TRK-1", ts_utc=ts, lat=lat, lon=lon, ingest_id="test")
+            for lat, lon, ts in trace
+        )
+
+        stops = list(detect_stops(points))
+
+        assert len(stops) == 2
+        assert stops[0].start == datetime(2024, 5, 1, 8)
+        assert stops[0].end == datetime(2024, 5, 1, 8, 15)
@@ -0,0 +1,70 @@
+"""
+Unit tests for batch timestamp parsing.
+"""
+
+import numpy as np
+from datetime import datetime
+from bhulan.ingestion.timestamps import TimestampParser, sniff_timestamp_format
+from bhulan.ingestion.validate import repair_timestamp
+
+
+class TestFormatSniffing:
+    """Test timestamp format detection."""
+    
+    def test_sniff_iso(self):
+        """Test ISO timestamps are detected."""
+        values = ["2024-05-01T12:00:00", "2024-05-01T12:00:05"]
+        assert sniff_timestamp_format(values) == '%Y-%m-%dT%H:%M:%S'
+    
+    def test_sniff_us_format(self):
+        """Test month-first timestamps are detected."""
+        values = ["05/01/2024 12:00", "05/01/2024 12:01", "05/13/2024 08:30"]
+        assert sniff_timestamp_format(values) == '%m/%d/%Y %H:%M'
+    
+    def test_sniff_mostly_matching(self):
+        """Test a few odd values do not prevent detection."""
+        values = ["2024-05-01 12:00:00"] * 5 + ["garbage"]
+        assert sniff_timestamp_format(values) == '%Y-%m-%d %H:%M:%S'
+    
+    def test_sniff_unknown(self):
+        """Test no format is returned for unparseable values."""
+        assert sniff_timestamp_format(["garbage", "more garbage"]) is None
+
+
+class TestTimestampParser:
+    """Test column-wise timestamp parsing."""
+    
+    def test_parse_matches_repair(self):
+        """Test parsed values match repair_timestamp."""
+        values = ["05/01/2024 12:00:00", "05/01/2024 12:00:30", 1714568400, 1714568400123]
+        parser = TimestampParser()
+        
+        parsed, ok = parser.parse(values)
+        
+        assert ok.all()
+        assert parsed.dtype == np.dtype('datetime64[us]')
+        assert parsed.tolist() == [repair_timestamp(v) for v in values]
+        assert parser.format == '%m/%d/%Y %H:%M:%S'
+    
+    def test_unparsed_values_left_for_repair(self):
+        """Test values outside the format are not parsed."""
+        values = ["2024-05-01T12:00:00", "2024-05-01T12:00:00+02:00", 1.5, None, True]
+        
+        parsed, ok = TimestampParser().parse(values)
+        
+        assert ok.tolist() == [True, False, False, False, False]
+        assert parsed[0] == np.datetime64(datetime(2024, 5, 1, 12))
+    
+    def test_format_cached_between_batches(self):
+        """Test the format is reused, and sniffed again when the feed changes."""
+        parser = TimestampParser(sample_size=2)
+        parser.parse(["2024-05-01 12:00:00", "2024-05-01 12:00:01"])
+        assert parser.format == '%Y-%m-%d %H:%M:%S'
+        
+        parsed, ok = parser.parse(["2024-05-01 13:00:00", "05/01/2024"])
+        assert ok.tolist() == [True, False]
+        assert parser.format == '%Y-%m-%d %H:%M:%S'
+        
+        parsed, ok = parser.parse(["05/01/2024", "05/02/2024"])
+        assert ok.all()
+        assert parser.format == '%m/%d/%Y'
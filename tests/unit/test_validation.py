@@ -192,6 +192,12 @@ class TestTimestampRepair:
         assert result.month == 5
         assert result.day == 1
     
+    def test_repair_offset_to_naive_utc(self):
+        """Test repair converts UTC offsets to naive UTC."""
+        assert repair_timestamp("2024-05-01T12:00:00Z") == datetime(2024, 5, 1, 12, 0, 0)
+        assert repair_timestamp("2024-05-01T12:00:00+02:00") == datetime(2024, 5, 1, 10, 0, 0)
+        assert repair_timestamp("May 1 2024 12:00 -0300") == datetime(2024, 5, 1, 15, 0, 0)
+    
     def test_repair_invalid_type(self):
         """Test repair fails with invalid type."""
         with pytest.raises(ValidationError):
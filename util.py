@@ -1,9 +1,9 @@
 from constants import *
 import xlrd
 import math
+import numpy as np
 from datetime import *
 import time
-from geopy.geocoders import Nominatim
 
 HEAP_ID_KEY = "heapId"
 PRIORITY_KEY = "priority"
@@ -100,13 +100,10 @@ def getExcelDate(date):
     delta = dt - temp
     return float(delta.days) + (float(delta.seconds) / 86400)
 
+# cached, rate limited lookup through the shared geocode.GeoCoder
 def revGeoCode(latitude, longitude):
-
-    geolocator = Nominatim()
-    coords = str(latitude)+","+str(longitude)
-
-    location = geolocator.reverse(coords,timeout=10)
-    return location.address
+    from geocode import getGeoCoder
+    return getGeoCoder().reverse(latitude, longitude)
 
 ################ End Date Time Functions ################
 
@@ -188,6 +185,71 @@ def meterDist(point1, point2):
 
 ################ End Distance Functions ################
 
+################ Begin Vectorized Distance Functions ################
+
+# batched versions of the distance functions above. they take lat/lon values
+# (scalars or numpy arrays, broadcast against each other) instead of point
+# objects and return numpy arrays.
+
+KIL_RADIUS = 6373
+MILE_RADIUS = 3960
+
+def getLatLons(points):
+    # columnar points (see columnar.TruckPointColumns) already hold arrays
+    if hasattr(points, 'lats'):
+        return points.lats, points.lons
+
+    num = len(points)
+    lats = np.fromiter((getLat(point) for point in points), dtype=float, count=num)
+    lons = np.fromiter((getLon(point) for point in points), dtype=float, count=num)
+
+    return lats, lons
+
+# haversine form of findArc, well conditioned for the short (meter scale)
+# distances used by stop detection
+def findArcs(lats1, lons1, lats2, lons2):
+    phi1 = np.radians(lats1)
+    phi2 = np.radians(lats2)
+    dPhi = phi2 - phi1
+    dTheta = np.radians(lons2) - np.radians(lons1)
+
+    a = np.sin(dPhi / 2.0) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dTheta / 2.0) ** 2
+
+    return 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def kilDists(lats1, lons1, lats2, lons2):
+    return findArcs(lats1, lons1, lats2, lons2) * KIL_RADIUS
+
+def mileDists(lats1, lons1, lats2, lons2):
+    return findArcs(lats1, lons1, lats2, lons2) * MILE_RADIUS
+
+def meterDists(lats1, lons1, lats2, lons2):
+    return kilDists(lats1, lons1, lats2, lons2) * 1000
+
+# distances from a single point to each of the given points
+def kilDistsFrom(point, points):
+    lats, lons = getLatLons(points)
+    return kilDists(float(getLat(point)), float(getLon(point)), lats, lons)
+
+# symmetric n x n matrix of arcs between every pair of lat/lons
+def pairwiseArcs(lats, lons):
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+
+    return findArcs(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+
+def pairwiseKilDists(lats, lons):
+    return pairwiseArcs(lats, lons) * KIL_RADIUS
+
+# distances between consecutive lat/lons, i.e. the legs of a trace
+def legKilDists(lats, lons):
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+
+    return kilDists(lats[:-1], lons[:-1], lats[1:], lons[1:])
+
+################ End Vectorized Distance Functions ################
+
 ################ Begin Grid Functions ################
 
 def getMeters(coord):